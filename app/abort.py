@@ -0,0 +1,83 @@
+# app/abort.py
+"""
+Early-abort policies for inputs that are mostly garbage.
+
+A policy trips once enough rows have been validated and the share of
+failing rows is above its threshold:
+
+    invalid>90%@1000    more than 90% of rows invalid, after at least 1000 rows
+    BE04>50%@500        more than 50% of rows failing with BE04, after 500 rows
+
+Several policies are separated by commas (--abort-on on the CLI, or
+ABORT_POLICIES for both the CLI and the API); the first to trip wins.
+Without "@rows" a policy waits for ABORT_MIN_ROWS rows.
+"""
+import os
+import re
+from typing import Dict, List, Mapping, Optional
+
+ABORT_POLICIES = os.getenv('ABORT_POLICIES', '')
+ABORT_MIN_ROWS = int(os.getenv('ABORT_MIN_ROWS', '1000'))
+# API uploads are validated (and policies checked) this many rows at a time
+ABORT_CHECK_ROWS = int(os.getenv('ABORT_CHECK_ROWS', '1000'))
+
+_POLICY = re.compile(r'^\s*(\w+)\s*>\s*(\d+(?:\.\d+)?)\s*%?\s*(?:@\s*(\d+))?\s*$')
+
+
+class AbortPolicy:
+    def __init__(self, target: str, threshold: float, min_rows: int = None):
+        """`target` is 'invalid' or an error code; `threshold` a fraction (0.9 for 90%)."""
+        self.target = target
+        self.threshold = threshold
+        self.min_rows = ABORT_MIN_ROWS if min_rows is None else min_rows
+
+    def __repr__(self):
+        return f"{self.target}>{self.threshold * 100:g}%@{self.min_rows}"
+
+    def check(self, rows: int, invalid: int, error_codes: Mapping[str, int]) -> Optional[Dict]:
+        """The trip details if this policy trips at these counts, else None."""
+        if rows < self.min_rows or rows == 0:
+            return None
+        failing = invalid if self.target == 'invalid' else error_codes.get(self.target, 0)
+        rate = failing / rows
+        if rate <= self.threshold:
+            return None
+        return {
+            'policy': repr(self),
+            'target': self.target,
+            'threshold': self.threshold,
+            'rate': round(rate, 6),
+            'rows': rows,
+            'failing_rows': failing,
+        }
+
+
+def parse_policies(spec: str) -> List[AbortPolicy]:
+    """Parse a comma-separated policy spec; raises ValueError on a malformed entry."""
+    policies = []
+    for part in (spec or '').split(','):
+        if not part.strip():
+            continue
+        match = _POLICY.match(part)
+        if match is None:
+            raise ValueError(f"Invalid abort policy '{part.strip()}' (expected e.g. invalid>90%@1000 or BE04>50%)")
+        target, percent, min_rows = match.groups()
+        if float(percent) >= 100:
+            raise ValueError(f"Abort policy '{part.strip()}' can never trip (threshold must be below 100%)")
+        target = 'invalid' if target.lower() == 'invalid' else target.upper()
+        policies.append(AbortPolicy(target, float(percent) / 100, int(min_rows) if min_rows else None))
+    return policies
+
+
+def check_policies(policies: List[AbortPolicy], rows: int, invalid: int, error_codes: Mapping[str, int]) -> Optional[Dict]:
+    for policy in policies:
+        tripped = policy.check(rows, invalid, error_codes)
+        if tripped is not None:
+            return tripped
+    return None
+
+
+def describe(tripped: Dict) -> str:
+    what = 'invalid' if tripped['target'] == 'invalid' else f"failing {tripped['target']}"
+    return (f"{tripped['rate']:.1%} of {tripped['rows']} rows {what}, above the "
+            f"{tripped['threshold']:.1%} limit ({tripped['policy']})")
@@ -0,0 +1,324 @@
+# app/admission.py
+"""
+Admission control: per-API-key rate limits and concurrency quotas, and
+bounded queues that shed load once a class of traffic is saturated.
+
+Requests are split into two classes by path: "interactive" (/validate,
+/transfer) and "bulk" (/upload-*). Each request passes three checks:
+
+    1. the caller's token bucket for that class     429 + Retry-After
+    2. the caller's in-flight quota for that class  429 + Retry-After
+    3. a slot in the class's shared pool; when all slots are busy the
+       request waits in a bounded queue, and a full queue or a wait past
+       the class timeout sheds it                   503 + Retry-After
+
+Bulk slots are few, so a flood of uploads queues (then sheds) instead of
+taking the CPU and threads that keep /validate latency down.
+
+Callers are identified by API key (x-api-key) when it maps to a role, and
+by client address otherwise (role "anonymous"), so unknown keys can't mint
+fresh buckets. Quotas are per role and class, overridable with
+ADMISSION_QUOTAS as "<role>.<class>=<rate per second>/<burst>/<concurrency>":
+
+    ADMISSION_QUOTAS="user.bulk=0.2/5/1,anonymous.interactive=5/10/2"
+
+All state lives in this process: under gunicorn every worker enforces its
+own limits, so size quotas per worker. Set ADMISSION_ENABLED=0 to let
+everything through.
+"""
+import os
+import re
+import math
+import time
+import asyncio
+import hashlib
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.metrics import METRICS
+from app.security import get_role_from_api_key
+
+ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', '1') != '0'
+ADMISSION_QUOTAS = os.getenv('ADMISSION_QUOTAS', '')
+# Per-caller state kept at most for this many callers; idle ones are dropped first
+ADMISSION_MAX_CALLERS = int(os.getenv('ADMISSION_MAX_CALLERS', '10000'))
+
+# Path prefix -> traffic class; other paths are not admission-controlled
+ROUTE_CLASSES = (
+    ('/upload-', 'bulk'),
+    ('/validate', 'interactive'),
+    ('/transfer', 'interactive'),
+)
+
+# Shared pool per class: concurrent requests, queued requests, seconds a request may queue
+POOLS = {
+    'interactive': (int(os.getenv('ADMISSION_INTERACTIVE_SLOTS', '64')),
+                    int(os.getenv('ADMISSION_INTERACTIVE_QUEUE', '256')),
+                    float(os.getenv('ADMISSION_INTERACTIVE_WAIT', '1'))),
+    'bulk': (int(os.getenv('ADMISSION_BULK_SLOTS', '2')),
+             int(os.getenv('ADMISSION_BULK_QUEUE', '8')),
+             float(os.getenv('ADMISSION_BULK_WAIT', '10'))),
+}
+
+# (role, class) -> (requests per second, burst, concurrent requests per caller)
+DEFAULT_QUOTAS = {
+    ('admin', 'interactive'): (50.0, 100, 16),
+    ('auditor', 'interactive'): (20.0, 40, 8),
+    ('user', 'interactive'): (20.0, 40, 8),
+    ('anonymous', 'interactive'): (10.0, 20, 4),
+    ('admin', 'bulk'): (2.0, 20, 4),
+    ('auditor', 'bulk'): (1.0, 10, 2),
+    ('user', 'bulk'): (1.0, 10, 2),
+    ('anonymous', 'bulk'): (0.5, 10, 1),
+}
+
+_QUOTA = re.compile(r'^\s*(\w+)\.(\w+)\s*=\s*(\d+(?:\.\d+)?)\s*/\s*(\d+)\s*/\s*(\d+)\s*$')
+
+
+def parse_quotas(spec: str) -> Dict:
+    """DEFAULT_QUOTAS with the overrides in `spec`; raises ValueError on a malformed entry."""
+    quotas = dict(DEFAULT_QUOTAS)
+    for part in filter(str.strip, (spec or '').split(',')):
+        match = _QUOTA.match(part)
+        if not match or match.group(2) not in POOLS:
+            raise ValueError(f"Invalid admission quota {part.strip()!r}; expected e.g. 'user.bulk=1/10/2'")
+        role, cls, rate, burst, concurrency = match.groups()
+        quotas[(role, cls)] = (float(rate), int(burst), int(concurrency))
+    return quotas
+
+
+def traffic_class(path: str) -> Optional[str]:
+    for prefix, cls in ROUTE_CLASSES:
+        if path.startswith(prefix):
+            return cls
+    return None
+
+
+class Rejected(Exception):
+    def __init__(self, status_code: int, detail: str, retry_after: float, outcome: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.outcome = outcome
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`; starts full."""
+
+    def __init__(self, rate: float, burst: int, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.updated = clock()
+
+    def take(self) -> float:
+        """Take a token: 0 if one was available, else the seconds until one will be."""
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+
+class Pool:
+    """
+    `slots` concurrent holders and at most `queue` waiters, served first in
+    first out. Waiters may belong to different event loops (one per worker
+    thread or test client), so they are woken with call_soon_threadsafe.
+    """
+
+    def __init__(self, slots: int, queue: int, wait: float):
+        self.slots = slots
+        self.queue = queue
+        self.wait = wait
+        self.active = 0
+        self.waiters = deque()
+        self.service_time = 0.0  # moving average of seconds a slot is held
+        self._lock = threading.Lock()
+
+    def retry_after(self) -> float:
+        """Rough time until a newly queued request would get a slot."""
+        return self.service_time * (len(self.waiters) + 1) / max(1, self.slots)
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.active < self.slots and not self.waiters:
+                self.active += 1
+                return
+            if len(self.waiters) >= self.queue:
+                raise Rejected(503, "Server busy; request queue is full.", self.retry_after(), 'shed')
+            waiter = (loop, loop.create_future())
+            self.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter[1], self.wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._lock:
+                queued = waiter in self.waiters
+                if queued:
+                    self.waiters.remove(waiter)
+            if queued:
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                raise Rejected(503, f"Server busy; no capacity within {self.wait:g}s.", self.retry_after(), 'shed')
+            # The slot was handed over just as we gave up: keep it, or pass it on if cancelled
+            if isinstance(e, asyncio.CancelledError):
+                self.release()
+                raise
+
+    def release(self, held: float = None):
+        with self._lock:
+            if held is not None:
+                self.service_time = held if not self.service_time else 0.8 * self.service_time + 0.2 * held
+            if self.waiters:
+                # Hand the slot straight to the next waiter; `active` stays the same
+                loop, future = self.waiters.popleft()
+                loop.call_soon_threadsafe(_wake, future)
+            else:
+                self.active -= 1
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class _Caller:
+    __slots__ = ('role', 'buckets', 'in_flight', 'counts', 'last_seen')
+
+    def __init__(self, role):
+        self.role = role
+        self.buckets = {}
+        self.in_flight = {}
+        self.counts = {'requests': 0, 'admitted': 0, 'rate_limited': 0, 'over_quota': 0, 'shed': 0}
+        self.last_seen = time.time()
+
+
+class AdmissionController:
+    def __init__(self, quotas: Dict = None, pools: Dict = None, clock=time.monotonic,
+                 max_callers: int = ADMISSION_MAX_CALLERS):
+        self.quotas = DEFAULT_QUOTAS if quotas is None else quotas
+        self.pools = {cls: Pool(*limits) for cls, limits in (pools or POOLS).items()}
+        self.clock = clock
+        self.max_callers = max_callers
+        self._callers = {}
+        self._lock = threading.Lock()
+
+    def _quota(self, role, cls):
+        return self.quotas.get((role, cls)) or self.quotas[('anonymous', cls)]
+
+    def _caller(self, identity, role):
+        caller = self._callers.get(identity)
+        if caller is None:
+            if len(self._callers) >= self.max_callers:
+                self._prune()
+            caller = self._callers[identity] = _Caller(role)
+        caller.last_seen = time.time()
+        return caller
+
+    def _prune(self):
+        idle = sorted((c.last_seen, identity) for identity, c in self._callers.items() if not any(c.in_flight.values()))
+        for _, identity in idle[:max(1, len(idle) // 2)]:
+            del self._callers[identity]
+
+    def _reject(self, caller, cls, error):
+        caller.counts[error.outcome] += 1
+        METRICS.inc('bv_admission_total', 1, outcome=error.outcome, role=caller.role, traffic=cls)
+        return error
+
+    async def admit(self, identity: str, role: str, cls: str):
+        """Admit one request or raise Rejected. Pair every admit with release(identity, cls, held)."""
+        rate, burst, concurrency = self._quota(role, cls)
+        with self._lock:
+            caller = self._caller(identity, role)
+            caller.counts['requests'] += 1
+            bucket = caller.buckets.get(cls)
+            if bucket is None:
+                bucket = caller.buckets[cls] = TokenBucket(rate, burst, self.clock)
+            # Concurrency first: a request turned away here keeps the caller's rate budget
+            if caller.in_flight.get(cls, 0) >= concurrency:
+                pool = self.pools[cls]
+                raise self._reject(caller, cls, Rejected(
+                    429, f"Too many concurrent {cls} requests for this caller (max {concurrency}).",
+                    pool.service_time or 1, 'over_quota'))
+            wait = bucket.take()
+            if wait:
+                raise self._reject(caller, cls, Rejected(
+                    429, f"Rate limit exceeded ({rate:g} {cls} requests/s); retry later.", wait, 'rate_limited'))
+            caller.in_flight[cls] = caller.in_flight.get(cls, 0) + 1
+        try:
+            await self.pools[cls].acquire()
+        except BaseException as e:
+            with self._lock:
+                caller.in_flight[cls] -= 1
+                if isinstance(e, Rejected):
+                    self._reject(caller, cls, e)
+            raise
+        with self._lock:
+            caller.counts['admitted'] += 1
+        METRICS.inc('bv_admission_total', 1, outcome='admitted', role=role, traffic=cls)
+
+    def release(self, identity: str, cls: str, held: float = None):
+        self.pools[cls].release(held)
+        with self._lock:
+            caller = self._callers.get(identity)
+            if caller is not None:
+                caller.in_flight[cls] -= 1
+
+    def usage(self) -> Dict:
+        """Per-caller counters and in-flight requests, plus each pool's occupancy."""
+        with self._lock:
+            callers = {
+                identity: {'role': c.role, **c.counts, 'in_flight': dict(c.in_flight), 'last_seen': c.last_seen}
+                for identity, c in self._callers.items()
+            }
+        pools = {
+            cls: {'slots': p.slots, 'active': p.active, 'queued': len(p.waiters), 'service_time': round(p.service_time, 4)}
+            for cls, p in self.pools.items()
+        }
+        return {'enabled': ADMISSION_ENABLED, 'callers': callers, 'pools': pools}
+
+
+def identify(request: Request):
+    """(identity, role) for a request: a hashed API key if it has a role, else the client address."""
+    api_key = request.headers.get('x-api-key')
+    role = get_role_from_api_key(api_key) if api_key else None
+    if role:
+        return 'key:' + hashlib.sha256(api_key.encode()).hexdigest()[:12], role
+    host = request.client.host if request.client else 'unknown'
+    return f'ip:{host}', 'anonymous'
+
+
+class AdmissionMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app, controller: AdmissionController):
+        super().__init__(app)
+        self.controller = controller
+
+    async def dispatch(self, request: Request, call_next):
+        cls = traffic_class(request.url.path)
+        if cls is None or not ADMISSION_ENABLED:
+            return await call_next(request)
+        identity, role = identify(request)
+        try:
+            await self.controller.admit(identity, role, cls)
+        except Rejected as e:
+            return JSONResponse({'detail': e.detail, 'retry_after': e.retry_after}, status_code=e.status_code,
+                                headers={'Retry-After': str(e.retry_after)})
+        start = time.perf_counter()
+        try:
+            return await call_next(request)
+        finally:
+            self.controller.release(identity, cls, time.perf_counter() - start)
+
+
+# Shared by every app in this process; a malformed ADMISSION_QUOTAS fails at startup
+ADMISSION = AdmissionController(parse_quotas(ADMISSION_QUOTAS))
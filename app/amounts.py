@@ -0,0 +1,170 @@
+# app/amounts.py
+"""
+Exact amount parsing into int64 minor units (e.g. cents).
+
+Amounts are parsed once per column with a vectorized fixed-point path: the
+column becomes a numpy code-point matrix and each digit is weighted by its
+power of ten in minor units, so no value ever passes through a binary
+float. Inputs the fast path does not recognise (exponents, stray spacing)
+fall back to Decimal, row by row, which is rare. Cells longer than
+MAX_AMOUNT_CHARS are rejected up front: the matrix is as wide as the
+longest cell, so one huge value would otherwise cost memory and time for
+every row of its chunk.
+"""
+import os
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+# ISO 4217 minor-unit scales; anything not listed uses DEFAULT_SCALE
+CURRENCY_SCALES = {
+    'KES': 2, 'NGN': 2, 'USD': 2, 'EUR': 2, 'GBP': 2, 'CHF': 2, 'SEK': 2, 'PLN': 2,
+    'JPY': 0, 'KRW': 0, 'UGX': 0, 'RWF': 0,
+    'BHD': 3, 'KWD': 3, 'OMR': 3, 'TND': 3,
+}
+DEFAULT_SCALE = 2
+# Upper limit in major units, checked exactly against minor units
+MAX_AMOUNT = int(os.getenv('MAX_AMOUNT', '10000000'))
+
+# Longest amount text parsed at all; int64 minor units never need more than ~20
+MAX_AMOUNT_CHARS = int(os.getenv('MAX_AMOUNT_CHARS', '32'))
+
+_POW10 = [10 ** i for i in range(19)]
+
+
+def currency_scale(currency) -> int:
+    if not isinstance(currency, str):
+        return DEFAULT_SCALE
+    return CURRENCY_SCALES.get(currency.strip().upper(), DEFAULT_SCALE)
+
+
+def _too_long(value) -> bool:
+    if type(value) is str:
+        return len(value) > MAX_AMOUNT_CHARS
+    if value is None or isinstance(value, float):
+        return False
+    try:
+        return len(str(value)) > MAX_AMOUNT_CHARS
+    except ValueError:  # ints past sys.get_int_max_str_digits()
+        return True
+
+
+def parse_amount(value, scale: int = DEFAULT_SCALE) -> Tuple[int, bool]:
+    """Parse one amount into (minor_units, parsed_ok). Used for single records and fallbacks."""
+    if value is None or isinstance(value, bool) or (isinstance(value, float) and value != value):
+        return 0, False
+    if _too_long(value):
+        return 0, False
+    try:
+        # floats go through repr so 10.1 stays 10.1 rather than its binary expansion
+        amount = Decimal(repr(value) if isinstance(value, float) else str(value).strip())
+    except (InvalidOperation, ValueError):
+        return 0, False
+    if not amount.is_finite():
+        return 0, False
+    minor = amount.scaleb(scale)
+    if minor != minor.to_integral_value() or abs(minor) >= _POW10[18]:
+        # More precision than the currency allows, or out of int64 range
+        return 0, False
+    return int(minor), True
+
+
+def amount_within_limit(minor: int, scale: int) -> bool:
+    return 0 < minor <= MAX_AMOUNT * _POW10[scale]
+
+
+def parse_amount_column(amounts: pd.Series, currencies: pd.Series = None) -> Dict[str, np.ndarray]:
+    """
+    Vectorized parse of a whole amount column.
+
+    Returns numpy arrays aligned with `amounts`:
+      amount_minor  int64 minor units (0 when unparsable)
+      amount_scale  int8 decimal places used for each row
+      amount_valid  bool, the value parsed exactly at its currency scale
+      amount_ok     bool, parsed and within (0, MAX_AMOUNT]
+    """
+    n = len(amounts)
+    if currencies is None:
+        scale = np.full(n, DEFAULT_SCALE, dtype=np.int8)
+    else:
+        scale = np.fromiter((currency_scale(c) for c in currencies), dtype=np.int8, count=n)
+    minor = np.zeros(n, dtype=np.int64)
+    valid = np.zeros(n, dtype=bool)
+    if n == 0:
+        return {'amount_minor': minor, 'amount_scale': scale, 'amount_valid': valid, 'amount_ok': valid.copy()}
+
+    raw = amounts.to_numpy(dtype=object)
+    # Oversized cells are invalid (AM09) and left out of the matrix, which is
+    # as wide as its longest cell
+    try:
+        too_long = np.fromiter(map(len, raw), dtype=np.int64, count=n) > MAX_AMOUNT_CHARS
+    except TypeError:  # not all text (None, NaN, numbers)
+        too_long = np.fromiter(map(_too_long, raw), dtype=bool, count=n)
+    short = np.where(too_long, '', raw) if too_long.any() else raw
+    # Fixed-width code-point matrix: one row per amount, zero-padded on the right
+    text = np.asarray(short, dtype='U')
+    width = max(text.dtype.itemsize // 4, 1)
+    chars = text.view(np.uint32).reshape(n, width)
+
+    # Fast path covers [+-]digits[.digits] with at most 18 significant digits.
+    # Digits are folded column by column (Horner's rule) into one integer, then
+    # shifted by the currency scale minus the number of fractional digits seen.
+    first = chars[:, 0]
+    negative = first == ord('-')
+    start_col = (negative | (first == ord('+'))).astype(np.int64)
+    fast = np.ones(n, dtype=bool)
+    value = np.zeros(n, dtype=np.int64)
+    n_digits = np.zeros(n, dtype=np.int64)
+    int_digits = np.zeros(n, dtype=np.int64)
+    frac_digits = np.zeros(n, dtype=np.int64)
+    seen_dot = np.zeros(n, dtype=bool)
+    for col in range(width):
+        c = chars[:, col]
+        body = (col >= start_col) & (c != 0)
+        digit = body & (c >= ord('0')) & (c <= ord('9'))
+        dot = body & (c == ord('.'))
+        fast &= ~body | digit | (dot & ~seen_dot)
+        seen_dot |= dot
+        value = np.where(digit, value * 10 + (c.astype(np.int64) - ord('0')), value)
+        n_digits += digit
+        frac_digits += digit & seen_dot
+        int_digits += digit & ~seen_dot
+    fast &= (int_digits >= 1) & (n_digits <= 18)
+
+    shift = scale.astype(np.int64) - frac_digits
+    pow10 = np.asarray(_POW10, dtype=np.int64)
+    up = shift >= 0
+    # Keep value * 10**shift inside int64
+    fast &= n_digits + np.maximum(shift, 0) <= 18
+    down = np.clip(-shift, 0, 18)
+    # Fractional digits beyond the currency's minor unit must all be zero
+    fast &= up | (value % pow10[down] == 0)
+    values = np.where(up, value * pow10[np.clip(shift, 0, 18)], value // pow10[down])
+    values[negative] *= -1
+    minor[fast] = values[fast]
+    valid[fast] = True
+    length = (chars[:, 0] != 0) & ~too_long
+
+    # Rare slow path: forms the fast path does not cover (exponents, spaces, NaN)
+    for i in np.flatnonzero(~fast & length):
+        minor[i], valid[i] = parse_amount(raw[i], int(scale[i]))
+
+    limit = MAX_AMOUNT * np.power(np.int64(10), scale.astype(np.int64))
+    ok = valid & (minor > 0) & (minor <= limit)
+    return {
+        'amount_minor': minor,
+        'amount_scale': scale,
+        'amount_valid': valid,
+        'amount_ok': ok,
+    }
+
+
+def format_minor(minor: int, scale: int) -> str:
+    """Render minor units back to an exact decimal string."""
+    if scale == 0:
+        return str(minor)
+    sign = '-' if minor < 0 else ''
+    whole, frac = divmod(abs(minor), _POW10[scale])
+    return f"{sign}{whole}.{frac:0{scale}d}"
@@ -1,31 +1,46 @@
 from fastapi import FastAPI
 from pydantic import BaseModel
 from typing import Optional
+from decimal import Decimal
 from fastapi.staticfiles import StaticFiles
 from app.validators.account_validator import AccountValidator
 
-app = FastAPI()
+from app.admission import ADMISSION, AdmissionMiddleware
+from app.responses import FastJSONResponse
+
+app = FastAPI(default_response_class=FastJSONResponse)
+app.add_middleware(AdmissionMiddleware, controller=ADMISSION)
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
 class AccountData(BaseModel):
     account_number: str
     bank_code: str
-    amount: float
+    amount: Decimal
     reference_id: str
 
 import json
-from fastapi import Body
+from fastapi import Body, Request
+from app.records import AccountRecord, RecordError
 
-@app.post("/validate")
-async def validate_account_endpoint(account: AccountData):
+# The body is decoded into a slotted AccountRecord and the result encoded by
+# app.serialization, skipping pydantic and jsonable_encoder on the hot path;
+# AccountData only documents the body in the OpenAPI schema.
+@app.post("/validate", response_class=FastJSONResponse, openapi_extra={
+    "requestBody": {"required": True, "content": {"application/json": {"schema": AccountData.model_json_schema()}}},
+})
+async def validate_account_endpoint(request: Request, fail_fast: bool = False):
+    try:
+        account = AccountRecord.decode(await request.body())
+    except RecordError as e:
+        return FastJSONResponse({"detail": e.errors}, status_code=422)
     validator = AccountValidator()
-    result = await validator.validate(account.dict())
-    return result
+    result = await validator.validate(account.to_dict(), fail_fast=fail_fast)
+    return FastJSONResponse(result)
 
 class TransferData(BaseModel):
     account_number: str
     bank_code: str
-    amount: float
+    amount: Decimal
     reference_id: str
     recipient_name: str
 
@@ -0,0 +1,108 @@
+# app/chunking.py
+"""
+Adaptive chunk sizing for streaming ingestion.
+
+Every chunk pays fixed costs (frame build, vault append, output files,
+summary) on top of its per-row work, so bigger chunks are faster until the
+fixed part stops mattering, while smaller chunks keep back-pressure and
+memory tight. ChunkSizer hill-climbs the chunk size on observed rows/sec:
+it doubles while throughput still improves, backs off when it drops, and
+never exceeds the memory ceiling (estimated from observed bytes per row)
+or max_rows. Once a target rows/sec is met it stops growing.
+"""
+import os
+from collections import Counter
+from typing import Dict, List
+
+DEFAULT_CHUNK_ROWS = 1000
+MIN_CHUNK_ROWS = int(os.getenv('CHUNK_MIN_ROWS', '250'))
+MAX_CHUNK_ROWS = int(os.getenv('CHUNK_MAX_ROWS', '100000'))
+# Per-chunk memory ceiling (bytes of the chunk's frame)
+MAX_CHUNK_BYTES = int(os.getenv('CHUNK_MAX_BYTES', str(64 * 1024 * 1024)))
+# Throughput must improve by this much to keep growing
+GROWTH_GAIN = 1.05
+SHRINK_LOSS = 0.85
+
+
+class ChunkSizer:
+    def __init__(self, rows: int = None, max_bytes: int = None, target_rows_per_sec: float = None,
+                 start_rows: int = DEFAULT_CHUNK_ROWS, min_rows: int = MIN_CHUNK_ROWS, max_rows: int = MAX_CHUNK_ROWS):
+        # A fixed `rows` turns tuning off (it is still capped by max_bytes)
+        self.fixed = rows is not None
+        self.rows = rows or start_rows
+        self.max_bytes = max_bytes or MAX_CHUNK_BYTES
+        self.target_rows_per_sec = target_rows_per_sec
+        self.min_rows = min(min_rows, self.rows)
+        self.max_rows = max(max_rows, self.rows)
+        self.bytes_per_row = None
+        self.best_rate = None
+        self.settled = self.fixed
+        # The first chunk pays one-off costs (imports, caches); don't tune on it
+        self._warmed_up = False
+        self.sizes = Counter()
+        self.adjustments: List[Dict] = []
+
+    def ceiling(self) -> int:
+        """Largest chunk allowed by max_rows and the memory ceiling."""
+        if self.bytes_per_row:
+            return max(self.min_rows, min(self.max_rows, int(self.max_bytes / self.bytes_per_row)))
+        return self.max_rows
+
+    def next_rows(self) -> int:
+        return self.rows
+
+    def observe(self, rows: int, seconds: float, nbytes: int = 0, chunk: int = None):
+        """Feed back one finished chunk: its rows, processing seconds and frame bytes."""
+        if rows <= 0:
+            return
+        self.sizes[rows] += 1
+        if nbytes:
+            per_row = nbytes / rows
+            self.bytes_per_row = per_row if self.bytes_per_row is None else 0.8 * self.bytes_per_row + 0.2 * per_row
+        ceiling = self.ceiling()
+        if self.rows > ceiling:
+            self._resize(ceiling, chunk, 'memory ceiling')
+            return
+        # Only chunks read at the current size say anything about it (the last one may be short)
+        if self.settled or rows != self.rows or seconds <= 0:
+            return
+        if not self._warmed_up:
+            self._warmed_up = True
+            return
+        rate = rows / seconds
+        if self.best_rate is None or rate > self.best_rate * GROWTH_GAIN:
+            self.best_rate = rate if self.best_rate is None else max(rate, self.best_rate)
+            if self.target_rows_per_sec and rate >= self.target_rows_per_sec:
+                self.settled = True
+                self.adjustments.append({'chunk': chunk, 'rows': self.rows, 'reason': 'target met', 'rows_per_sec': round(rate, 1)})
+            elif self.rows >= ceiling:
+                self.settled = True
+            else:
+                self._resize(min(self.rows * 2, ceiling), chunk, 'throughput improving', rate)
+        elif rate < self.best_rate * SHRINK_LOSS:
+            # Bigger got slower (cache/GC pressure): step back and stay there
+            self.settled = True
+            self._resize(max(self.min_rows, self.rows // 2), chunk, 'throughput dropped', rate)
+        else:
+            self.settled = True
+            self.adjustments.append({'chunk': chunk, 'rows': self.rows, 'reason': 'converged', 'rows_per_sec': round(rate, 1)})
+
+    def _resize(self, rows: int, chunk, reason: str, rate: float = None):
+        if rows == self.rows:
+            return
+        self.rows = rows
+        entry = {'chunk': chunk, 'rows': rows, 'reason': reason}
+        if rate is not None:
+            entry['rows_per_sec'] = round(rate, 1)
+        self.adjustments.append(entry)
+
+    def report(self) -> Dict:
+        return {
+            'mode': 'fixed' if self.fixed else 'auto',
+            'final_rows': self.rows,
+            'max_bytes': self.max_bytes,
+            'bytes_per_row': round(self.bytes_per_row, 1) if self.bytes_per_row else None,
+            'target_rows_per_sec': self.target_rows_per_sec,
+            'sizes': {str(size): count for size, count in sorted(self.sizes.items())},
+            'adjustments': self.adjustments,
+        }
@@ -0,0 +1,205 @@
+# app/compression.py
+"""
+Transparent decompression for ingest inputs.
+
+open_input(path) returns a binary stream of the file's contents, inflated
+on the fly when the file is gzip, zstd, bz2 or a single-member zip. The
+format is detected from the leading magic bytes, not the file name.
+Nothing is staged on disk.
+
+Decompression runs on a background thread that stays up to
+INPUT_READAHEAD blocks ahead of the reader. zlib, bz2 and zstd release
+the GIL while they inflate, so this overlaps with parsing. BGZF files
+(bgzip: a gzip stream of independent members, each recording its own size)
+are inflated block-parallel on INPUT_DECOMPRESS_THREADS threads. Other
+gzip files, whether single-member or plain concatenated, are read in
+order because their member boundaries aren't known until inflated.
+"""
+import bz2
+import gzip
+import io
+import os
+import queue
+import struct
+import threading
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional
+
+try:
+    import zstandard
+except ImportError:  # optional: pip install zstandard
+    zstandard = None
+
+INPUT_BLOCK_BYTES = 1024 * 1024
+INPUT_READAHEAD = int(os.getenv('INPUT_READAHEAD', '8'))
+INPUT_DECOMPRESS_THREADS = int(os.getenv('INPUT_DECOMPRESS_THREADS', str(os.cpu_count() or 1)))
+
+_MAGIC = [
+    (b'\x1f\x8b', 'gzip'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+    (b'BZh', 'bz2'),
+    (b'PK\x03\x04', 'zip'),
+]
+# BGZF blocks handed to one pool task (~1MB of output)
+_BGZF_BATCH = 16
+_POLL_SECONDS = 0.1
+
+
+def detect_compression(path: str) -> Optional[str]:
+    """'gzip', 'zstd', 'bz2', 'zip', or None for a plain file."""
+    with open(path, 'rb') as f:
+        head = f.read(4)
+    for magic, kind in _MAGIC:
+        if head.startswith(magic):
+            return kind
+    return None
+
+
+def _zip_member(zf: zipfile.ZipFile) -> zipfile.ZipInfo:
+    members = [info for info in zf.infolist() if not info.is_dir() and not info.filename.startswith('__MACOSX/')]
+    if len(members) != 1:
+        names = ', '.join(info.filename for info in members[:10]) or 'none'
+        raise ValueError(f"Zip input must contain exactly one data file (found: {names})")
+    return members[0]
+
+
+# === Block sources (run on the decompression thread) ===
+def _stream_blocks(f) -> Iterator[bytes]:
+    while True:
+        block = f.read(INPUT_BLOCK_BYTES)
+        if not block:
+            return
+        yield block
+
+
+def _is_bgzf(path: str) -> bool:
+    with open(path, 'rb') as f:
+        head = f.read(18)
+    # FEXTRA set and the first extra subfield is 'BC' (block size)
+    return len(head) == 18 and head[3] & 4 and head[12:14] == b'BC'
+
+
+def _bgzf_members(f) -> Iterator[bytes]:
+    """Raw BGZF members, split using the BSIZE each header records."""
+    while True:
+        header = f.read(18)
+        if not header:
+            return
+        if len(header) < 18 or header[12:14] != b'BC':
+            raise ValueError("Corrupt BGZF block header")
+        bsize = struct.unpack('<H', header[16:18])[0]
+        yield header + f.read(bsize + 1 - 18)
+
+
+def _inflate(members) -> bytes:
+    return b''.join(zlib.decompress(member, 31) for member in members)
+
+
+def _bgzf_blocks(path: str, threads: int) -> Iterator[bytes]:
+    """Inflate BGZF batches on a pool, keeping up to 2x `threads` batches in flight, in order."""
+    with open(path, 'rb') as f, ThreadPoolExecutor(threads, thread_name_prefix='bv-inflate') as pool:
+        pending = []
+        batch = []
+        for member in _bgzf_members(f):
+            batch.append(member)
+            if len(batch) == _BGZF_BATCH:
+                pending.append(pool.submit(_inflate, batch))
+                batch = []
+                if len(pending) >= 2 * threads:
+                    yield pending.pop(0).result()
+        if batch:
+            pending.append(pool.submit(_inflate, batch))
+        for future in pending:
+            yield future.result()
+
+
+def _blocks(path: str, kind: str) -> Iterator[bytes]:
+    if kind == 'gzip' and INPUT_DECOMPRESS_THREADS > 1 and _is_bgzf(path):
+        yield from _bgzf_blocks(path, INPUT_DECOMPRESS_THREADS)
+    elif kind == 'gzip':
+        with gzip.open(path, 'rb') as f:
+            yield from _stream_blocks(f)
+    elif kind == 'bz2':
+        with bz2.open(path, 'rb') as f:
+            yield from _stream_blocks(f)
+    elif kind == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Reading .zst input needs the zstandard package (pip install zstandard)")
+        with open(path, 'rb') as raw, zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True) as f:
+            yield from _stream_blocks(f)
+    elif kind == 'zip':
+        with zipfile.ZipFile(path) as zf, zf.open(_zip_member(zf)) as f:
+            yield from _stream_blocks(f)
+    else:
+        raise ValueError(f"Unsupported compression: {kind}")
+
+
+# === Read-ahead stream ===
+class _ReadAhead(io.RawIOBase):
+    """Raw stream over blocks produced on a background thread, through a bounded queue."""
+    _EOF = object()
+
+    def __init__(self, blocks: Iterator[bytes], depth: int = INPUT_READAHEAD):
+        self._queue = queue.Queue(maxsize=max(1, depth))
+        self._stop = threading.Event()
+        self._buf = memoryview(b'')
+        self._done = False
+        self._thread = threading.Thread(target=self._produce, args=(blocks,), name='bv-decompress', daemon=True)
+        self._thread.start()
+
+    def _put(self, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self, blocks):
+        try:
+            for block in blocks:
+                if not self._put(block):
+                    return
+            self._put(self._EOF)
+        except BaseException as exc:
+            self._put(exc)
+        finally:
+            blocks.close()
+
+    def readable(self):
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buf:
+            if self._done:
+                return 0
+            item = self._queue.get()
+            if item is self._EOF:
+                self._done = True
+                return 0
+            if isinstance(item, BaseException):
+                self._done = True
+                raise item
+            self._buf = memoryview(item)
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            # Unblock the producer if the reader stopped early
+            self._stop.set()
+            self._thread.join()
+        super().close()
+
+
+def open_input(path: str):
+    """Binary stream of `path`'s (decompressed) contents; use as a context manager."""
+    kind = detect_compression(path)
+    if kind is None:
+        return open(path, 'rb')
+    return io.BufferedReader(_ReadAhead(_blocks(path, kind)), buffer_size=INPUT_BLOCK_BYTES)
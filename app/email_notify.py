@@ -1,21 +1,258 @@
-import yagmail
+# app/email_notify.py
+"""
+Email notifications, sent off the caller's critical path.
+
+NOTIFIER queues notifications for a small pool of worker threads. Each
+worker keeps its SMTP connection open between sends (checked with NOOP and
+reopened when the server dropped it). A run's files are zipped by streaming
+them through the compressor in the worker, and the zip is attached only if
+it fits within EMAIL_MAX_ATTACHMENT_BYTES; otherwise the email carries a
+download link instead.
+
+Works against any SMTP server; for local testing point it at the mailhog
+service from docker-compose (EMAIL_HOST=localhost EMAIL_PORT=1025).
+"""
 import os
+import queue
+import smtplib
+import logging
+import threading
+import time
+import zipfile
+from concurrent.futures import Future
+from email.message import EmailMessage
+from typing import Dict, Iterable, List
+
 from dotenv import load_dotenv
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+EMAIL_MAX_ATTACHMENT_BYTES = int(os.getenv('EMAIL_MAX_ATTACHMENT_BYTES', str(10 * 1024 * 1024)))
+EMAIL_WORKERS = int(os.getenv('EMAIL_WORKERS', '1'))
+EMAIL_RETRIES = int(os.getenv('EMAIL_RETRIES', '3'))
+# Where the emailed download link points when the artifact is too big to attach
+EMAIL_ARTIFACT_URL = os.getenv('EMAIL_ARTIFACT_URL', 'http://localhost:8000/runs/{run_id}/artifact.zip')
+# Reuse an idle connection without a NOOP round trip for this long
+_IDLE_CHECK_SECONDS = 30
+
+
+def smtp_settings() -> Dict:
+    """SMTP settings from the environment (EMAIL_USER/EMAIL_PASS alone mean Gmail, as before)."""
+    user = os.getenv('EMAIL_USER') or None
+    password = os.getenv('EMAIL_PASS') or None
+    host = os.getenv('EMAIL_HOST') or None
+    if not host:
+        if not (user and password):
+            raise RuntimeError('Set EMAIL_HOST (and EMAIL_PORT), or EMAIL_USER and EMAIL_PASS, to send email.')
+        host = 'smtp.gmail.com'
+    return {
+        'host': host,
+        'port': int(os.getenv('EMAIL_PORT') or 587),
+        'user': user,
+        'password': password,
+        'sender': os.getenv('EMAIL_FROM') or user or 'bulk-validator@localhost',
+    }
+
+
+class SMTPConnection:
+    """One reusable SMTP connection; reconnects when the server has dropped it."""
+    def __init__(self, settings: Dict = None):
+        self.settings = settings
+        self.conn = None
+        self.last_used = 0.0
+        self.opened = 0
+
+    def _open(self):
+        settings = self.settings = self.settings or smtp_settings()
+        if settings['port'] == 465:
+            conn = smtplib.SMTP_SSL(settings['host'], settings['port'], timeout=30)
+        else:
+            conn = smtplib.SMTP(settings['host'], settings['port'], timeout=30)
+            conn.ehlo()
+            if conn.has_extn('starttls'):
+                conn.starttls()
+                conn.ehlo()
+        if settings['user'] and settings['password']:
+            conn.login(settings['user'], settings['password'])
+        self.conn = conn
+        self.opened += 1
+
+    def _alive(self) -> bool:
+        if self.conn is None:
+            return False
+        if time.monotonic() - self.last_used < _IDLE_CHECK_SECONDS:
+            return True
+        try:
+            return self.conn.noop()[0] == 250
+        except smtplib.SMTPException:
+            return False
+        except OSError:
+            return False
+
+    def send(self, message: EmailMessage):
+        if not self._alive():
+            self.close()
+            self._open()
+        if 'From' not in message:
+            message['From'] = self.settings['sender']
+        try:
+            self.conn.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            # Dropped between the liveness check and the send: one fresh try
+            self.close()
+            self._open()
+            self.conn.send_message(message)
+        self.last_used = time.monotonic()
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.conn = None
+
+
+# === Artifacts ===
+def build_artifact(paths: Iterable[str], zip_path: str, root: str = 'output') -> Dict:
+    """
+    Stream `paths` into one deflated zip (no file is read into memory whole).
+    Directories are added recursively; missing files are skipped.
+    """
+    files = 0
+    with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+        for path in paths:
+            if os.path.isdir(path):
+                # A directory keeps its own name and layout inside the zip
+                base = os.path.dirname(os.path.normpath(path))
+                walked = [os.path.join(d, name) for d, _, names in os.walk(path) for name in sorted(names)]
+            elif os.path.exists(path):
+                base = root if not os.path.relpath(path, root).startswith('..') else os.path.dirname(path)
+                walked = [path]
+            else:
+                continue
+            for file_path in walked:
+                zf.write(file_path, arcname=os.path.relpath(file_path, base))
+                files += 1
+    return {'path': zip_path, 'files': files, 'bytes': os.path.getsize(zip_path)}
+
+
+def build_message(recipient: str, subject: str, body: str, attachments: List[str] = None) -> EmailMessage:
+    message = EmailMessage()
+    message['To'] = recipient
+    message['Subject'] = subject
+    message.set_content(body)
+    for path in attachments or []:
+        with open(path, 'rb') as f:
+            message.add_attachment(f.read(), maintype='application', subtype='octet-stream', filename=os.path.basename(path))
+    return message
+
+
+# === Background queue ===
+class Notifier:
+    def __init__(self, workers: int = EMAIL_WORKERS, max_queue: int = 100, settings: Dict = None):
+        self.workers = workers
+        self.settings = settings
+        self.jobs = queue.Queue(maxsize=max_queue)
+        self.threads = []
+        self.connections = []
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self.threads:
+                return
+            for n in range(self.workers):
+                conn = SMTPConnection(self.settings)
+                thread = threading.Thread(target=self._work, args=(conn,), name=f'email-{n}', daemon=True)
+                self.connections.append(conn)
+                self.threads.append(thread)
+                thread.start()
+
+    def _work(self, conn: SMTPConnection):
+        while True:
+            job, future = self.jobs.get()
+            try:
+                if job is None:
+                    conn.close()
+                    return
+                future.set_result(self._deliver(conn, job))
+            except Exception as e:
+                logger.error(f"Email to {job.get('recipient')} failed: {e}")
+                future.set_exception(e)
+            finally:
+                self.jobs.task_done()
+
+    def _deliver(self, conn: SMTPConnection, job: Dict) -> Dict:
+        attachments = list(job.get('attachments') or [])
+        body = job['body']
+        outcome = {'recipient': job['recipient'], 'artifact': None}
+        if job.get('artifact_paths'):
+            artifact = build_artifact(job['artifact_paths'], job['artifact_zip'])
+            outcome['artifact'] = artifact
+            if artifact['bytes'] <= job.get('max_bytes', EMAIL_MAX_ATTACHMENT_BYTES):
+                attachments.append(artifact['path'])
+            else:
+                url = EMAIL_ARTIFACT_URL.format(run_id=job.get('run_id', ''))
+                body += f"\n\nThe results ({artifact['bytes'] / 1e6:.1f} MB) are too large to attach. Download them here:\n{url}\n"
+                outcome['link'] = url
+        message = build_message(job['recipient'], job['subject'], body, attachments)
+        for attempt in range(1, EMAIL_RETRIES + 1):
+            try:
+                conn.send(message)
+                break
+            except (smtplib.SMTPException, OSError):
+                conn.close()
+                if attempt == EMAIL_RETRIES:
+                    raise
+                time.sleep(min(2 ** attempt, 30))
+        logger.info(f"Email sent to {job['recipient']}")
+        return outcome
+
+    def submit(self, recipient: str, subject: str, body: str, attachments: List[str] = None,
+               artifact_paths: List[str] = None, artifact_zip: str = None, run_id: str = None,
+               max_bytes: int = None) -> Future:
+        """Queue an email; returns a Future for its outcome. Blocks only when the queue is full."""
+        self._start()
+        future = Future()
+        job = {
+            'recipient': recipient, 'subject': subject, 'body': body, 'attachments': attachments,
+            'artifact_paths': artifact_paths, 'artifact_zip': artifact_zip, 'run_id': run_id,
+            'max_bytes': EMAIL_MAX_ATTACHMENT_BYTES if max_bytes is None else max_bytes,
+        }
+        self.jobs.put((job, future))
+        return future
+
+    def flush(self, timeout: float = None) -> bool:
+        """Wait until every queued email is handled. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.jobs.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def close(self, timeout: float = None):
+        """Flush, then close every pooled connection."""
+        self.flush(timeout)
+        with self._lock:
+            threads, self.threads = self.threads, []
+        for _ in threads:
+            self.jobs.put((None, Future()))
+        for thread in threads:
+            thread.join(timeout)
+        self.connections = []
+
+
+NOTIFIER = Notifier()
+
+
 def send_validation_report_email(recipient, subject, body, attachments=None):
     """
     Send an email with the validation summary and optional attachments.
-    Attachments can be a list of file paths.
+    Attachments can be a list of file paths. Waits for delivery; use
+    NOTIFIER.submit() to send in the background.
     """
-    yag_user = os.getenv('EMAIL_USER')
-    yag_pass = os.getenv('EMAIL_PASS')
-    if not yag_user or not yag_pass:
-        raise RuntimeError('EMAIL_USER and EMAIL_PASS environment variables must be set.')
-    yag = yagmail.SMTP(yag_user, yag_pass)
-    yag.send(
-        to=recipient,
-        subject=subject,
-        contents=body,
-        attachments=attachments or []
-    )
+    smtp_settings()  # fail fast when email isn't configured
+    return NOTIFIER.submit(recipient, subject, body, attachments=attachments).result()
@@ -0,0 +1,173 @@
+# app/fingerprints.py
+"""
+Row fingerprint cache for incremental re-validation.
+
+Each normalized row is hashed (its canonical account, bank code, amount and
+reference - exactly what the rules read) and its result is stored under
+(rule set version, row hash). When a corrected file is resubmitted, rows
+that did not change reuse their stored status and errors and only new or
+changed rows are validated. A new rule set version (see
+AccountValidator.ruleset) makes every older entry unreachable; prune()
+deletes them.
+
+Results that passed the format rules also depend on the bank API check, so
+they are only reused for FINGERPRINT_BANK_CHECK_TTL seconds. Processing
+errors are never stored. The store holds hashes and error lists only, never
+account numbers or references.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, List
+
+from app.normalize import NORMALIZED_COLUMNS
+
+FINGERPRINT_PATH = os.getenv('FINGERPRINT_PATH', 'output/fingerprints.sqlite3')
+FINGERPRINT_CACHE = os.getenv('FINGERPRINT_CACHE', '1') != '0'
+# Page cache per connection, in KiB
+FINGERPRINT_CACHE_KB = int(os.getenv('FINGERPRINT_CACHE_KB', '65536'))
+BANK_CHECK_TTL = float(os.getenv('FINGERPRINT_BANK_CHECK_TTL', '86400'))
+# SQLite's default limit on bound parameters is 999
+_LOOKUP_BATCH = 900
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rulesets (
+    id INTEGER PRIMARY KEY,
+    ruleset TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS error_lists (
+    id INTEGER PRIMARY KEY,
+    errors TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS results (
+    row_hash BLOB PRIMARY KEY,
+    ruleset_id INTEGER NOT NULL,
+    errors_id INTEGER NOT NULL,
+    bank_checked INTEGER NOT NULL,
+    created_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+_local = threading.local()
+
+
+def connect(path: str = None) -> sqlite3.Connection:
+    """This thread's connection to the store, reopened after a fork or a path change."""
+    path = path or FINGERPRINT_PATH
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.pid == os.getpid() and _local.path == path:
+        return conn
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    # Row hashes are random keys: keep the hot part of the index in memory
+    conn.execute(f'PRAGMA cache_size=-{FINGERPRINT_CACHE_KB}')
+    conn.execute(f'PRAGMA mmap_size={FINGERPRINT_CACHE_KB * 1024}')
+    conn.executescript(_SCHEMA)
+    _local.conn, _local.pid, _local.path = conn, os.getpid(), path
+    # Interned ids are never reassigned, so they can be cached per connection
+    _local.ruleset_ids, _local.error_ids, _local.error_lists = {}, {'[]': 0}, {0: []}
+    return conn
+
+
+def row_hashes(records: List[Dict]) -> List[bytes]:
+    """One 16-byte hash per normalized record (see app.normalize)."""
+    return [
+        hashlib.blake2b('\x1f'.join([str(record[col]) for col in NORMALIZED_COLUMNS]).encode(), digest_size=16).digest()
+        for record in records
+    ]
+
+
+def _intern(conn, table: str, column: str, value: str) -> int:
+    conn.execute(f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)", (value,))
+    return conn.execute(f"SELECT id FROM {table} WHERE {column} = ?", (value,)).fetchone()[0]
+
+
+def _ruleset_id(conn, ruleset: str) -> int:
+    if ruleset not in _local.ruleset_ids:
+        _local.ruleset_ids[ruleset] = _intern(conn, 'rulesets', 'ruleset', ruleset)
+    return _local.ruleset_ids[ruleset]
+
+
+def _encode(errors: List[Dict], memo: Dict) -> str:
+    # A chunk has few distinct error lists; encode each once
+    if not errors:
+        return '[]'
+    key = tuple(tuple(err.items()) for err in errors)
+    text = memo.get(key)
+    if text is None:
+        text = memo[key] = json.dumps(errors)
+    return text
+
+
+def _error_list(conn, errors_id: int) -> List[Dict]:
+    cached = _local.error_lists.get(errors_id)
+    if cached is None:
+        row = conn.execute("SELECT errors FROM error_lists WHERE id = ?", (errors_id,)).fetchone()
+        # Rows sharing an error list share one decoded list (results are read-only)
+        cached = _local.error_lists[errors_id] = json.loads(row[0])
+    return cached
+
+
+def lookup(hashes: List[bytes], ruleset: str, path: str = None) -> Dict[bytes, Dict]:
+    """Stored {'status', 'errors'} for the hashes that have a reusable result."""
+    conn = connect(path)
+    ruleset_id = _ruleset_id(conn, ruleset)
+    wanted = list(set(hashes))
+    fresh_after = time.time() - BANK_CHECK_TTL
+    found = {}
+    for i in range(0, len(wanted), _LOOKUP_BATCH):
+        batch = wanted[i:i + _LOOKUP_BATCH]
+        rows = conn.execute(
+            f"SELECT row_hash, errors_id FROM results WHERE ruleset_id = ? "
+            f"AND (bank_checked = 0 OR created_at >= ?) AND row_hash IN ({','.join('?' * len(batch))})",
+            (ruleset_id, fresh_after, *batch),
+        ).fetchall()
+        for row_hash, errors_id in rows:
+            errors = _error_list(conn, errors_id)
+            found[row_hash] = {'status': 'Invalid' if errors else 'Valid', 'errors': errors}
+    return found
+
+
+def store(hashes: List[bytes], results: List[Dict], ruleset: str, path: str = None):
+    """Save freshly validated results; processing errors are skipped."""
+    now = time.time()
+    memo = {}
+    pending = []
+    for row_hash, result in zip(hashes, results):
+        errors = result['errors']
+        types = [err.get('type') for err in errors] if errors else ()
+        if 'processing_error' in types:
+            continue
+        # The bank API is only asked once every format rule passed
+        bank_checked = result['status'] == 'Valid' or 'bank_api_error' in types
+        pending.append((row_hash, _encode(errors, memo), int(bank_checked)))
+    if not pending:
+        return
+    conn = connect(path)
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        ruleset_id = _ruleset_id(conn, ruleset)
+        error_ids = _local.error_ids
+        for text in set(memo.values()) - error_ids.keys():
+            error_ids[text] = _intern(conn, 'error_lists', 'errors', text)
+        # Inserting in key order keeps B-tree page writes local
+        rows = sorted((row_hash, ruleset_id, error_ids[text], bank_checked, now) for row_hash, text, bank_checked in pending)
+        conn.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)", rows)
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+
+def prune(ruleset: str, path: str = None) -> int:
+    """Delete entries from other rule set versions and expired bank checks. Returns rows deleted."""
+    conn = connect(path)
+    cursor = conn.execute(
+        "DELETE FROM results WHERE ruleset_id != ? OR (bank_checked = 1 AND created_at < ?)",
+        (_ruleset_id(conn, ruleset), time.time() - BANK_CHECK_TTL),
+    )
+    return cursor.rowcount
@@ -0,0 +1,103 @@
+# app/job_store.py
+"""
+Job and settings store shared by every API worker and CLI run.
+
+SQLite in WAL mode: readers never block the single writer, and concurrent
+writers from other processes wait up to JOB_STORE_TIMEOUT seconds instead
+of failing. Each process (and thread) opens its own connection lazily, so
+connections are never shared across a fork.
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Dict, Optional
+
+JOB_STORE_PATH = os.getenv('JOB_STORE_PATH', 'output/jobs.sqlite3')
+JOB_STORE_TIMEOUT = float(os.getenv('JOB_STORE_TIMEOUT', '30'))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    worker_pid INTEGER,
+    summary TEXT,
+    files TEXT,
+    detail TEXT
+);
+CREATE TABLE IF NOT EXISTS settings (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+_local = threading.local()
+
+
+def connect(path: str = None) -> sqlite3.Connection:
+    """This thread's connection to the store, reopened after a fork or a path change."""
+    path = path or JOB_STORE_PATH
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.pid == os.getpid() and _local.path == path:
+        return conn
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path, timeout=JOB_STORE_TIMEOUT, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(_SCHEMA)
+    _local.conn, _local.pid, _local.path = conn, os.getpid(), path
+    return conn
+
+
+def record_job(job_id: str, kind: str, status: str = 'running', summary: Dict = None,
+               files: Dict = None, detail: str = None, path: str = None):
+    """Insert or update a job. Fields left as None keep their stored value."""
+    now = time.time()
+    connect(path).execute(
+        """
+        INSERT INTO jobs (job_id, kind, status, created_at, updated_at, worker_pid, summary, files, detail)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(job_id) DO UPDATE SET
+            status = excluded.status,
+            updated_at = excluded.updated_at,
+            worker_pid = excluded.worker_pid,
+            summary = COALESCE(excluded.summary, jobs.summary),
+            files = COALESCE(excluded.files, jobs.files),
+            detail = COALESCE(excluded.detail, jobs.detail)
+        """,
+        (
+            job_id, kind, status, now, now, os.getpid(),
+            json.dumps(summary) if summary is not None else None,
+            json.dumps(files) if files is not None else None,
+            detail,
+        ),
+    )
+
+
+def get_job(job_id: str, path: str = None) -> Optional[Dict]:
+    row = connect(path).execute(
+        "SELECT job_id, kind, status, created_at, updated_at, worker_pid, summary, files, detail FROM jobs WHERE job_id = ?",
+        (job_id,),
+    ).fetchone()
+    if row is None:
+        return None
+    job = dict(zip(('job_id', 'kind', 'status', 'created_at', 'updated_at', 'worker_pid', 'summary', 'files', 'detail'), row))
+    job['summary'] = json.loads(job['summary']) if job['summary'] else None
+    job['files'] = json.loads(job['files']) if job['files'] else {}
+    return job
+
+
+def get_setting(name: str, default: str = None, path: str = None) -> Optional[str]:
+    row = connect(path).execute("SELECT value FROM settings WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else default
+
+
+def set_setting(name: str, value: str, path: str = None):
+    connect(path).execute(
+        "INSERT INTO settings (name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+        (name, value),
+    )
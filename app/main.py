@@ -1,22 +1,21 @@
 from fastapi import FastAPI, UploadFile, File, Request, HTTPException
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
 import pandas as pd
 import asyncio
 import os
-import uuid
 import logging
 import traceback
 from typing import Dict
-from concurrent.futures import ThreadPoolExecutor
-import concurrent
 
 # === Logging Configuration ===
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+from app.responses import FastJSONResponse
+
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # Ensure the output directory exists
 os.makedirs('output', exist_ok=True)
@@ -34,6 +33,10 @@ class LimitUploadSizeMiddleware(BaseHTTPMiddleware):
 
 app.add_middleware(LimitUploadSizeMiddleware)
 
+# === Admission Control (rate limits, quotas, load shedding) ===
+from app.admission import ADMISSION, AdmissionMiddleware
+app.add_middleware(AdmissionMiddleware, controller=ADMISSION)
+
 # === CORS Middleware ===
 app.add_middleware(
     CORSMiddleware,
@@ -43,7 +46,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-from .validators.account_validator import AccountValidator
+from .validators.account_validator import AccountValidator, RULES
+from .metrics import METRICS
+from .normalize import normalize_records
+from .profiling import SamplingProfiler, api_profiling_enabled, format_rule_stats
 
 # === Helper async validator ===
 async def validate_account(account_data: Dict) -> dict:
@@ -57,16 +63,21 @@ async def root():
         "message": "Welcome to the Bulk Validator API",
         "endpoints": {
             "/upload-csv": "POST endpoint for uploading CSV files",
+            "/upload-xlsx": "POST endpoint for validating Excel (.xlsx) workbooks",
             "/download/{filename}": "GET endpoint for downloading processed files"
         }
     }
 
-<<<<<<< HEAD
 # === Health Check Endpoint ===
 @app.get("/health")
 async def health():
     return {"status": "ok"}
-=======
+
+# === Metrics Endpoint (Prometheus text format) ===
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(METRICS.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 @app.post("/upload-csv")
 async def upload_csv(file: UploadFile = File(...)):
     if not file.filename.endswith('.csv'):
@@ -95,179 +106,100 @@ async def upload_csv(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
 
 @app.get("/download-report")
-async def download_report():
+async def download_report(request: Request):
     file_path = "output/report.csv"
     if os.path.exists(file_path):
-        return FileResponse(file_path, media_type="text/csv", filename="report.csv")
+        return downloads.file_response(request, file_path, filename="report.csv")
     else:
         raise HTTPException(status_code=404, detail="Report not found")
->>>>>>> 712d468fcd2dfc328a93acfc9751f42a6b479770
 
 # === Helper: Common validation and output logic ===
-REQUIRED_COLUMNS = ['account_number', 'bank_code', 'amount', 'reference_id']
-
-import hashlib
+from app.schema import REQUIRED_COLUMNS, SchemaError, project
+from app.xlsx_reader import iter_xlsx_records, xlsx_header
+import io
 
-def tokenize_value(value, prefix):
-    # Simple deterministic tokenization using hash (not reversible, but unique per value)
-    h = hashlib.sha256(str(value).encode()).hexdigest()[:8]
-    return f"{prefix}-{h}"
+from app import token_vault, job_store, fingerprints, downloads
+from app.summary_reports import FINISHED, FORMATS, REPORTS
+from app.abort import ABORT_POLICIES, parse_policies, describe as describe_abort
 
-# In-memory mapping for reference (not exposed)
-TOKEN_MAP = {}
+# Abort policies for API uploads (ABORT_POLICIES); a malformed spec fails at startup
+UPLOAD_ABORT_POLICIES = parse_policies(ABORT_POLICIES)
 
-from app.reporting import error_breakdown_by_field, per_bank_stats, write_outputs
+# Chunk stages live in the web-free core, shared with the batch CLI
+from bulk_validator.core.chunks import prepare_chunk, summarize_chunk, validate_chunk, write_chunk
+# Re-exported for callers that still import it from app.main
+from bulk_validator.core.chunks import validate_accounts_parallel  # noqa: F401
 
-# === Parallel Validation Logic ===
-async def validate_accounts_parallel(df):
-    """Process accounts concurrently with 8 workers"""
-    validator = AccountValidator()
-    
-    async def process_row(row):
-        try:
-            account_data = {
-                'account_number': str(row['account_number']),
-                'bank_code': str(row['bank_code']),
-                'amount': float(row['amount']),
-                'reference_id': str(row['reference_id'])
-            }
-            return await validator.validate(account_data)
-        except Exception as e:
-            logger.error(f"Validation error: {str(e)}")
-            return {
-                "status": "Invalid",
-                "errors": [{"type": "processing_error", "code": "PE01", "message": str(e)}],
-                "account_number": str(row['account_number']),
-                "bank_code": str(row['bank_code']),
-                "amount": row['amount'],
-                "reference_id": str(row['reference_id'])
-            }
-
-    # Process in parallel
-    loop = asyncio.get_event_loop()
-    tasks = [process_row(row) for _, row in df.iterrows()]
-    return await asyncio.gather(*tasks)
+# Profiles sample every thread in this worker, so while profiling is on
+# uploads run one at a time and each profile only holds its own upload
+_PROFILE_LOCK = asyncio.Lock()
 
 # === Unified validation and output logic (importable) ===
 async def validate_and_output(records, source_type="csv", output_formats=['csv', 'json', 'xlsx']):
-    import pandas as pd
-    import uuid
-    import os
-    logger.debug(f"Validating {len(records)} records from {source_type}")
-    df = pd.DataFrame(records)
-    missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
-    if missing_columns:
-        logger.error(f"Missing required columns: {', '.join(missing_columns)}")
-        return {"detail": f"Input must contain these columns: {', '.join(REQUIRED_COLUMNS)}", "missing_columns": missing_columns}
-    # Tokenize sensitive columns
-    df['account_token'] = df['account_number'].apply(lambda x: tokenize_value(x, 'ACC'))
-    df['reference_token'] = df['reference_id'].apply(lambda x: tokenize_value(x, 'REF'))
-    # Store mapping (not exposed)
-    for _, row in df.iterrows():
-        TOKEN_MAP[row['account_token']] = row['account_number']
-        TOKEN_MAP[row['reference_token']] = row['reference_id']
-    # Write token map to output/token_map.json (encrypted)
-    import json
-    import time
-    from uuid import uuid4
-    from dotenv import load_dotenv
-    from cryptography.fernet import Fernet
-    import base64
-    load_dotenv()
-    os.makedirs('output', exist_ok=True)
-    token_map_path = 'output/token_map.json'
-    batch_id = str(uuid4())
-    timestamp = int(time.time())
-    # Encrypt only the tokens, not the batch metadata
-    key = os.getenv('TOKEN_MAP_KEY')
-    if not key:
-        raise RuntimeError('TOKEN_MAP_KEY environment variable must be set for encryption.')
-    fernet = Fernet(key.encode())
-    account_tokens = {k: v for k, v in TOKEN_MAP.items() if k.startswith('ACC-')}
-    reference_tokens = {k: v for k, v in TOKEN_MAP.items() if k.startswith('REF-')}
-    tokens_dict = {'account_tokens': account_tokens, 'reference_tokens': reference_tokens}
-    encrypted_tokens = fernet.encrypt(json.dumps(tokens_dict).encode()).decode()
-    batch_entry = {
-        'batch_id': batch_id,
-        'timestamp': timestamp,
-        'tokens': encrypted_tokens
-    }
-    # Load previous batches (plaintext)
-    all_batches = []
-    if os.path.exists(token_map_path):
-        with open(token_map_path, 'r') as f:
-            try:
-                loaded = json.load(f)
-                if isinstance(loaded, dict):
-                    all_batches = [loaded]
-                elif isinstance(loaded, list):
-                    all_batches = loaded
-                else:
-                    all_batches = []
-            except Exception:
-                all_batches = []
-    all_batches.append(batch_entry)
-    with open(token_map_path, 'w') as f:
-        json.dump(all_batches, f, indent=2)
-    # Validate accounts
-    try:
-        results = await validate_accounts_parallel(df)
-    except Exception as e:
-        logger.error(f"Parallel processing error: {str(e)}")
-        return JSONResponse(
-            {"detail": "Validation system error"},
-            status_code=500
-        )
-    df['status'] = [result['status'] for result in results]
-    df['errors'] = [result['errors'] for result in results]
-    output_cols = ['account_token', 'bank_code', 'amount', 'reference_token', 'status', 'errors']
-    valid_df = df[df['status'] == 'Valid'][output_cols].copy()
-    invalid_df = df[df['status'] == 'Invalid'][output_cols].copy()
-    total_accounts = len(df)
-    valid_accounts = len(valid_df)
-    invalid_accounts = len(invalid_df)
-    logger.info(f"Validation completed for {total_accounts} accounts")
-    logger.info(f"Valid accounts: {valid_accounts}")
-    logger.info(f"Invalid accounts: {invalid_accounts}")
-    error_breakdown = error_breakdown_by_field(invalid_df)
-    per_bank = per_bank_stats(df)
-    summary = {
-        "total_accounts": total_accounts,
-        "valid_accounts": valid_accounts,
-        "invalid_accounts": invalid_accounts,
-        "invalid_error_types": error_breakdown,
-        "per_bank_stats": per_bank
-    }
-    base_filename = f"accounts_{uuid.uuid4().hex}"
-    output_paths = write_outputs(valid_df, invalid_df, summary, base_filename, formats=output_formats)
-    return {
-        "validation_summary": summary,
-        "files": output_paths,
-        "tokenization_notice": "Sensitive fields (account_number, reference_id) have been tokenized in all outputs. Real values are never logged or exposed via API."
-    }
+    # Opt-in per-upload profiling (toggled by an admin via /admin/profiling)
+    if not api_profiling_enabled():
+        return await _validate_and_output(records, source_type, output_formats)
+    async with _PROFILE_LOCK:
+        return await _validate_and_output(records, source_type, output_formats, profile=True)
 
-from fastapi.testclient import TestClient
-from app.main import app
-
-client = TestClient(app)
+async def _validate_and_output(records, source_type, output_formats, profile=False):
+    profiler = SamplingProfiler().start() if profile else None
+    validator = AccountValidator(collect_timings=True if profiler else None)
+    chunk = prepare_chunk(records, source_type)
+    job_store.record_job(chunk["job_id"], kind=f"upload_{source_type}")
+    chunk = await validate_chunk(chunk, validator=validator, policies=UPLOAD_ABORT_POLICIES)
+    if "aborted" in chunk:
+        # Garbage upload: report what was seen up to the trip and write nothing
+        if profiler is not None:
+            profiler.stop()
+        summary = summarize_chunk(chunk)["summary"]
+        detail = f"Validation aborted: {describe_abort(chunk['aborted'])}"
+        logger.warning(f"Upload {chunk['job_id']}: {detail}")
+        METRICS.inc("bv_aborted_runs_total", 1, source="api")
+        job_store.record_job(chunk["job_id"], kind=f"upload_{source_type}", status="aborted",
+                             summary=summary, detail=detail)
+        REPORTS.submit(chunk["job_id"])
+        return JSONResponse({
+            "detail": detail,
+            "aborted": chunk["aborted"],
+            "validation_summary": summary,
+            "job_id": chunk["job_id"],
+        }, status_code=422)
+    chunk = write_chunk(summarize_chunk(chunk), output_formats)
+    result = chunk["result"]
+    if profiler is not None:
+        profiler.stop()
+        if isinstance(result, dict) and "files" in result:
+            result["files"].update(profiler.write(f"output/{chunk['base_filename']}", rules=format_rule_stats(validator.rule_stats)))
+    # Any worker can answer /jobs/{job_id} for this upload
+    if isinstance(result, dict) and "validation_summary" in result:
+        job_store.record_job(chunk["job_id"], kind=f"upload_{source_type}", status="done",
+                             summary=result["validation_summary"], files=result["files"])
+        result["job_id"] = chunk["job_id"]
+        # Summary report, rendered from the aggregate in the background
+        REPORTS.submit(chunk["job_id"])
+    else:
+        detail = result.get("detail") if isinstance(result, dict) else "Validation system error"
+        job_store.record_job(chunk["job_id"], kind=f"upload_{source_type}", status="failed", detail=detail)
+    if "status_code" in chunk:
+        return JSONResponse(result, status_code=chunk["status_code"])
+    # Returned as a response so FastAPI skips jsonable_encoder
+    return FastJSONResponse(result)
 
-<<<<<<< HEAD
 # === Route: Upload XML ===
 import xml.etree.ElementTree as ET
 @app.post("/upload-xml")
 async def upload_xml(file: UploadFile = File(...)):
     try:
         xml_content = await file.read()
-        root = ET.fromstring(xml_content)
-        records = []
-        for elem in root.findall('.//record'):
-            record = {col: elem.findtext(col, default='') for col in REQUIRED_COLUMNS}
-            # Convert amount to float if possible
-            try:
-                record['amount'] = float(record['amount'])
-            except Exception:
-                record['amount'] = 0.0
-            records.append(record)
+        with METRICS.stage("parse"):
+            root = ET.fromstring(xml_content)
+            records = []
+            for elem in root.findall('.//record'):
+                # Amounts stay as text; normalization parses them exactly and flags bad ones (AM09)
+                record = {col: elem.findtext(col, default='') for col in REQUIRED_COLUMNS}
+                records.append(record)
+        METRICS.inc("bv_stage_rows_total", len(records), stage="parse")
         return await validate_and_output(records, source_type="xml")
     except Exception as e:
         logger.error(f"Error processing XML: {str(e)}")
@@ -277,54 +209,156 @@ async def upload_xml(file: UploadFile = File(...)):
             "error": str(e)
         }, status_code=500)
 
-# === Route: Download CSV ===
+# === Route: Upload XLSX ===
+@app.post("/upload-xlsx")
+async def upload_xlsx(file: UploadFile = File(...)):
+    if not file.filename.lower().endswith('.xlsx'):
+        raise HTTPException(status_code=400, detail="Only .xlsx workbooks are allowed.")
+    content = io.BytesIO(await file.read())
+    try:
+        columns = project(xlsx_header(content))
+    except SchemaError as e:
+        return JSONResponse({"detail": str(e), "missing_columns": e.missing}, status_code=400)
+    except Exception as e:
+        logger.error(f"Error reading workbook: {str(e)}")
+        return JSONResponse({"detail": "Error processing XLSX", "error": str(e)}, status_code=400)
+    try:
+        with METRICS.stage("parse"):
+            records = list(iter_xlsx_records(content, columns))
+        METRICS.inc("bv_stage_rows_total", len(records), stage="parse")
+        return await validate_and_output(records, source_type="xlsx")
+    except Exception as e:
+        logger.error(f"Error processing XLSX: {str(e)}")
+        logger.error(f"Stack trace: {traceback.format_exc()}")
+        return JSONResponse({
+            "detail": "Error processing XLSX",
+            "error": str(e)
+        }, status_code=500)
+
+# === Route: Download an output file by name ===
 @app.get("/download/{filename}")
-async def download_file(filename: str):
-    path = f"./{filename}"
-    if os.path.exists(path):
-        return FileResponse(path, filename=filename)
+async def download_file(filename: str, request: Request):
+    # Only files directly in the output directory; the name can't climb out of it
+    path = os.path.join(downloads.OUTPUT_DIR, os.path.basename(filename))
+    if os.path.isfile(path):
+        return downloads.file_response(request, path)
     return JSONResponse({"detail": "File not found."}, status_code=404)
 
+# === Routes: Downloads by run (batch run id or upload job id) ===
+@app.get("/runs/{run_id}/files")
+async def list_run_files(run_id: str):
+    files = downloads.run_files(run_id)
+    if files is None:
+        return JSONResponse({"detail": "Run not found."}, status_code=404)
+    return {
+        "run_id": run_id,
+        "files": [
+            {"name": name, "bytes": os.path.getsize(path), "url": f"/runs/{run_id}/files/{name}"}
+            for name, path in files.items()
+        ],
+        "bundle": f"/runs/{run_id}/bundle.zip",
+        "reports": {fmt: f"/runs/{run_id}/report.{fmt}" for fmt in FORMATS},
+    }
+
+@app.get("/runs/{run_id}/files/{name:path}")
+async def download_run_file(run_id: str, name: str, request: Request):
+    path = (downloads.run_files(run_id) or {}).get(name)
+    if path is None:
+        return JSONResponse({"detail": "File not found."}, status_code=404)
+    return downloads.file_response(request, path)
+
+@app.get("/runs/{run_id}/bundle.zip")
+async def download_run_bundle(run_id: str):
+    files = downloads.run_files(run_id, include_artifact=False)
+    if not files:
+        return JSONResponse({"detail": "Run not found."}, status_code=404)
+    return downloads.bundle_response(run_id, files)
+
+# HTML/PDF summary from the run's aggregate; cached after the first render
+@app.get("/runs/{run_id}/report.{fmt}")
+async def download_run_summary(run_id: str, fmt: str, request: Request):
+    if fmt not in FORMATS:
+        return JSONResponse({"detail": f"Report format must be one of: {', '.join(FORMATS)}."}, status_code=404)
+    job = job_store.get_job(run_id)
+    if job is None:
+        return JSONResponse({"detail": "Run not found."}, status_code=404)
+    if job["status"] not in FINISHED:
+        return JSONResponse({"detail": f"Run is {job['status']}; the report is available once it finishes."}, status_code=409)
+    paths = await asyncio.wrap_future(REPORTS.submit(run_id))
+    return downloads.file_response(request, paths[fmt], filename=f"run_{run_id}_summary.{fmt}")
+
+# Linked from notification emails too big to attach
+@app.get("/runs/{run_id}/artifact.zip")
+async def download_run_artifact(run_id: str, request: Request):
+    path = os.path.join(downloads.OUTPUT_DIR, f"run_{run_id}_artifact.zip")
+    if run_id.isalnum() and os.path.exists(path):
+        return downloads.file_response(request, path, filename=f"run_{run_id}.zip")
+    return JSONResponse({"detail": "Artifact not found."}, status_code=404)
+
+# === Route: Job status (shared by all workers) ===
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_store.get_job(job_id)
+    if job is None:
+        return JSONResponse({"detail": "Job not found."}, status_code=404)
+    return job
+
 # === Secure Admin Token Lookup Endpoint ===
-from fastapi import Query, Header, Depends
-from fastapi.responses import JSONResponse
+from fastapi import Query, Depends
 from app.security import require_role
 
+# === Admin-only profiling toggle (requires ALLOW_PROFILING=1) ===
+from app.profiling import PROFILING_ALLOWED, set_api_profiling
+
+@app.post("/admin/profiling")
+async def toggle_profiling(enabled: bool = Query(...), role: str = Depends(require_role("admin"))):
+    if not PROFILING_ALLOWED:
+        return JSONResponse({"detail": "Profiling is not allowed on this deployment. Set ALLOW_PROFILING=1 to opt in."}, status_code=403)
+    set_api_profiling(enabled)
+    logger.info(f"API profiling {'enabled' if enabled else 'disabled'}")
+    return {"profiling": api_profiling_enabled()}
+
+# Per-caller admission counters for this worker
+@app.get("/admin/usage")
+async def admission_usage(role: str = Depends(require_role("admin"))):
+    return ADMISSION.usage()
+
 @app.post("/lookup-token")
 async def lookup_token(token: str = Query(...), role: str = Depends(require_role("admin", "auditor"))):
-    import os
-    import json
-    from dotenv import load_dotenv
-    load_dotenv()
-    # Load token map (only 'tokens' field is encrypted)
-    token_map_path = 'output/token_map.json'
-    if not os.path.exists(token_map_path):
+    if not os.path.exists(token_vault.TOKEN_MAP_PATH):
         return JSONResponse({"detail": "Token map not found."}, status_code=404)
-    with open(token_map_path, 'r') as f:
-        token_map = json.load(f)
-    from cryptography.fernet import Fernet
-    key = os.getenv('TOKEN_MAP_KEY')
-    if not key:
+    if not os.getenv('TOKEN_MAP_KEY'):
         return JSONResponse({"detail": "TOKEN_MAP_KEY environment variable must be set for encryption/decryption."}, status_code=500)
-    fernet = Fernet(key)
-    for batch in token_map.get('batches', []):
-        encrypted_tokens = batch.get('tokens')
-        if not encrypted_tokens:
-            continue
-        try:
-            tokens_dict = json.loads(fernet.decrypt(encrypted_tokens.encode()).decode())
-        except Exception:
-            continue
-        if token.startswith('ACC-') and token in tokens_dict.get('account_tokens', {}):
-            return {"token": token, "real_value": tokens_dict['account_tokens'][token], "batch_id": batch['batch_id'], "timestamp": batch['timestamp']}
-        if token.startswith('REF-') and token in tokens_dict.get('reference_tokens', {}):
-            return {"token": token, "real_value": tokens_dict['reference_tokens'][token], "batch_id": batch['batch_id'], "timestamp": batch['timestamp']}
+    real_value, batch = token_vault.lookup_token(token)
+    if batch is not None:
+        return {"token": token, "real_value": real_value, "batch_id": batch['batch_id'], "timestamp": batch['timestamp']}
     return JSONResponse({"detail": "Token not found."}, status_code=404)
-=======
-def test_upload_csv():
-    with open("seed_accounts.csv", "rb") as file:
-        response = client.post("/upload-csv", files={"file": ("seed_accounts.csv", file, "text/csv")})
-    assert response.status_code == 200
-    assert response.json()["message"] == "File 'seed_accounts.csv' uploaded and processed successfully."
-    assert response.json()["rows"] == 10000
->>>>>>> 712d468fcd2dfc328a93acfc9751f42a6b479770
+
+# === Worker preloading (production serve mode) ===
+def warmup():
+    """
+    Load what the first request would otherwise pay for: the rule schedule,
+    bank registry, normalization path, xlsx writer and vault key material.
+    Run in the gunicorn master before forking so workers share the pages.
+    """
+    import openpyxl  # noqa: F401  (pandas imports it lazily on the first xlsx write)
+    from app.bank_strategies import BANK_VALIDATORS
+    from app.token_crypto import load_keyring
+    normalize_records(pd.DataFrame([{"account_number": "0123456789", "bank_code": "044", "amount": "1.00", "reference_id": "WARMUP"}]))
+    if os.getenv('TOKEN_MAP_KEY'):
+        load_keyring()
+    job_store.connect()
+    if fingerprints.FINGERPRINT_CACHE:
+        fingerprints.prune(AccountValidator().ruleset)
+    logger.info(f"Preloaded {len(RULES.order)} rules and {len(BANK_VALIDATORS)} bank validators")
+
+def after_fork():
+    """Reset per-process state inherited from the preloading master."""
+    import random
+    # Otherwise every worker replays the same mock bank API outcomes
+    random.seed()
+    METRICS.reset()
+
+if os.getenv('BV_WARMUP') == '1':
+    # Set by `run.py serve` for uvicorn workers, which import the app themselves
+    warmup()
@@ -0,0 +1,185 @@
+# app/metrics.py
+"""
+Lightweight in-process metrics for the validation hot path.
+
+Counters, gauges and fixed-bucket histograms, exposed in the Prometheus
+text format on /metrics and as a JSON snapshot for CLI run reports.
+Set METRICS_ENABLED=0 to turn everything into a no-op.
+"""
+import os
+import time
+import threading
+from bisect import bisect_left
+from typing import Dict
+
+# Seconds; tuned for per-chunk stage latencies
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _NoopTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopTimer()
+
+
+class _StageTimer:
+    __slots__ = ("registry", "name", "rows", "start")
+
+    def __init__(self, registry, name, rows):
+        self.registry = registry
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.record_stage(self.name, time.perf_counter() - self.start, self.rows)
+        return False
+
+
+class MetricsRegistry:
+    def __init__(self, enabled=True, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            hist[0][bisect_left(self.buckets, value)] += 1
+            hist[1] += value
+            hist[2] += 1
+
+    def stage(self, name, rows=0):
+        """Time a block as one observation of pipeline stage `name`."""
+        if not self.enabled:
+            return _NOOP
+        return _StageTimer(self, name, rows)
+
+    def record_stage(self, name, seconds, rows=0):
+        self.observe("bv_stage_seconds", seconds, stage=name)
+        if rows:
+            self.inc("bv_stage_rows_total", rows, stage=name)
+
+    def record_rules(self, rule_stats: Dict):
+        """Fold per-rule [evaluations, seconds, failures] counts from AccountValidator."""
+        if not self.enabled:
+            return
+        for rule, (evaluations, seconds, failures) in rule_stats.items():
+            self.inc("bv_rule_evaluations_total", evaluations, rule=rule)
+            self.inc("bv_rule_seconds_total", seconds, rule=rule)
+            self.inc("bv_rule_failures_total", failures, rule=rule)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+        self.started_at = time.time()
+
+    # === Exposition ===
+    @staticmethod
+    def _fmt_labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {k: (list(v[0]), v[1], v[2]) for k, v in self._histograms.items()}
+        lines = []
+        seen = set()
+        for (name, labels), value in sorted(counters.items()):
+            if name not in seen:
+                lines.append(f"# TYPE {name} counter")
+                seen.add(name)
+            lines.append(f"{name}{self._fmt_labels(labels)} {value}")
+        for (name, labels), value in sorted(gauges.items()):
+            if name not in seen:
+                lines.append(f"# TYPE {name} gauge")
+                seen.add(name)
+            lines.append(f"{name}{self._fmt_labels(labels)} {value}")
+        for (name, labels), (counts, total, count) in sorted(histograms.items()):
+            if name not in seen:
+                lines.append(f"# TYPE {name} histogram")
+                seen.add(name)
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{self._fmt_labels(labels, [('le', le)])} {cumulative}")
+            lines.append(f"{name}_sum{self._fmt_labels(labels)} {total}")
+            lines.append(f"{name}_count{self._fmt_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict:
+        """Machine-readable summary: per-stage latency and rows/sec, per-rule cost, gauges."""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {k: (v[1], v[2]) for k, v in self._histograms.items()}
+        stages = {}
+        for (name, labels), (total, count) in histograms.items():
+            if name != "bv_stage_seconds":
+                continue
+            stage = dict(labels)["stage"]
+            rows = counters.get(("bv_stage_rows_total", labels), 0)
+            stages[stage] = {
+                "calls": count,
+                "seconds": round(total, 6),
+                "mean_seconds": round(total / count, 6) if count else 0.0,
+                "rows": rows,
+                "rows_per_sec": round(rows / total, 1) if rows and total else None,
+            }
+        rules = {}
+        for (name, labels), value in counters.items():
+            if name.startswith("bv_rule_"):
+                field = name[len("bv_rule_"):-len("_total")]
+                rules.setdefault(dict(labels)["rule"], {})[field] = round(value, 6) if field == "seconds" else value
+        return {
+            "uptime_seconds": round(time.time() - self.started_at, 3),
+            "stages": stages,
+            "rules": rules,
+            "gauges": {
+                name + self._fmt_labels(labels): value for (name, labels), value in gauges.items()
+            },
+        }
+
+
+METRICS = MetricsRegistry(enabled=os.getenv("METRICS_ENABLED", "1") != "0")
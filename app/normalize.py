@@ -0,0 +1,101 @@
+# app/normalize.py
+"""
+Normalization pre-pass: parse account fields once per chunk, column-wise.
+
+Every downstream rule reads the precomputed fields instead of re-stripping,
+re-uppercasing and re-classifying the same strings:
+  account_number   canonical account (stripped; IBANs uppercased)
+  account_kind     'iban' | 'numeric' | 'alnum' | 'invalid_charset' | 'empty'
+  account_length   length of the canonical account
+  amount_minor     exact amount in int64 minor units (see app.amounts)
+  amount_ok        amount parsed exactly and within limits
+The raw `amount` value is passed through untouched.
+"""
+import re
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from app.amounts import parse_amount_column, parse_amount, amount_within_limit, currency_scale
+
+IBAN_REGEX = r"^[A-Z]{2}[0-9]{2}[A-Z0-9]{11,30}$"
+IBAN_PATTERN = re.compile(IBAN_REGEX)
+
+NORMALIZED_COLUMNS = [
+    'account_number', 'bank_code', 'amount', 'reference_id', 'account_kind', 'account_length',
+    'amount_minor', 'amount_scale', 'amount_ok',
+]
+
+
+def _text(series: pd.Series) -> pd.Series:
+    # Missing cells become '' so they fail the same checks as empty strings
+    return series.astype(object).where(series.notna(), '').astype(str).str.strip()
+
+
+def normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Normalize a whole chunk in one vectorized pass."""
+    account = _text(df['account_number'])
+    upper = account.str.upper()
+    is_iban = upper.str.match(IBAN_REGEX)
+    kind = np.select(
+        [account == '', is_iban, account.str.isdigit(), account.str.isalnum()],
+        ['empty', 'iban', 'numeric', 'alnum'],
+        default='invalid_charset',
+    )
+    amounts = parse_amount_column(df['amount'], df['currency'] if 'currency' in df.columns else None)
+    return pd.DataFrame({
+        'account_number': upper.where(is_iban, account),
+        'bank_code': _text(df['bank_code']),
+        'amount': df['amount'],
+        'reference_id': _text(df['reference_id']),
+        'account_kind': kind,
+        'account_length': account.str.len().astype('int64'),
+        'amount_minor': amounts['amount_minor'],
+        'amount_scale': amounts['amount_scale'],
+        'amount_ok': amounts['amount_ok'],
+    }, index=df.index)
+
+
+def normalize_records(df: pd.DataFrame) -> List[Dict]:
+    """normalize_frame() as a list of plain dicts, ready for per-row rules."""
+    return normalize_frame(df)[NORMALIZED_COLUMNS].to_dict(orient='records')
+
+
+def classify_account(account: str) -> str:
+    if not account:
+        return 'empty'
+    if IBAN_PATTERN.match(account.upper()):
+        return 'iban'
+    if account.isdigit():
+        return 'numeric'
+    if account.isalnum():
+        return 'alnum'
+    return 'invalid_charset'
+
+
+def _text_value(value) -> str:
+    if value is None or (isinstance(value, float) and value != value):
+        return ''
+    return str(value).strip()
+
+
+def normalize_record(record: Dict) -> Dict:
+    """Single-record equivalent of normalize_frame() for the real-time API."""
+    account = _text_value(record.get('account_number'))
+    kind = classify_account(account)
+    if kind == 'iban':
+        account = account.upper()
+    scale = currency_scale(record.get('currency'))
+    minor, parsed = parse_amount(record.get('amount'), scale)
+    return {
+        'account_number': account,
+        'bank_code': _text_value(record.get('bank_code')),
+        'amount': record.get('amount'),
+        'reference_id': _text_value(record.get('reference_id')),
+        'account_kind': kind,
+        'account_length': len(account),
+        'amount_minor': minor,
+        'amount_scale': scale,
+        'amount_ok': parsed and amount_within_limit(minor, scale),
+    }
@@ -0,0 +1,255 @@
+# app/partitioning.py
+"""
+Per-bank partitioned outputs for batch runs.
+
+Validated rows are routed to one partition per (bank_code, status) as
+chunks stream through, in a Hive-style layout:
+
+    <root>/bank_code=044/status=valid/part-00000.csv   (or .parquet)
+
+Two modes:
+  sorted  each partition is sorted by (reference_token, account_token,
+          amount) and exact duplicates are dropped. Rows are buffered up to
+          a memory budget; beyond it, sorted runs are spilled to disk and
+          k-way merged at the end (external merge sort), so any run size
+          finishes in one pass over the data plus one merge.
+  append  rows are appended to each partition as they arrive (input order,
+          no dedup) - the cheapest option.
+
+Parquet output needs pyarrow (pip install pyarrow); CSV needs nothing extra.
+"""
+import os
+import csv
+import heapq
+import json
+import shutil
+from collections import OrderedDict
+from operator import itemgetter
+from typing import Dict, List
+from urllib.parse import quote
+
+PARTITION_COLUMNS = ['account_token', 'bank_code', 'amount', 'reference_token', 'status', 'errors']
+# Parquet parts leave out the partition keys: Hive readers take them from the path
+PARQUET_COLUMNS = [0, 2, 3, 5]
+SORT_KEY = itemgetter(3, 0, 2)  # reference_token, account_token, amount
+DEFAULT_MEMORY_ROWS = int(os.getenv('PARTITION_MEMORY_ROWS', '200000'))
+# Most runs merged at once; more are merged in rounds
+MAX_FAN_IN = 64
+# Append mode keeps at most this many partition files open
+MAX_OPEN_SINKS = 64
+PARQUET_BATCH_ROWS = 50000
+
+
+def partition_dir(root: str, bank_code: str, status: str) -> str:
+    # Escape like Hive so odd bank codes ('../x', '') can't leave the dataset
+    bank = quote(bank_code, safe='') if bank_code else '__HIVE_DEFAULT_PARTITION__'
+    return os.path.join(root, f"bank_code={bank}", f"status={status.lower()}")
+
+
+def _frame_rows(df) -> List[List[str]]:
+    """Output rows as lists of strings in PARTITION_COLUMNS order (errors as JSON)."""
+    out = df[PARTITION_COLUMNS].copy()
+    out['errors'] = [json.dumps(errors) for errors in out['errors']]
+    out = out.astype(object).where(out.notna(), '')
+    return out.astype(str).values.tolist()
+
+
+class _CsvSink:
+    def __init__(self, path: str, mode: str = 'w'):
+        exists = mode == 'a' and os.path.exists(path)
+        self.file = open(path, mode, newline='')
+        self.writer = csv.writer(self.file)
+        if not exists:
+            self.writer.writerow(PARTITION_COLUMNS)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetSink:
+    def __init__(self, path: str):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.pa = pa
+        self.schema = pa.schema([(PARTITION_COLUMNS[i], pa.string()) for i in PARQUET_COLUMNS])
+        self.writer = pq.ParquetWriter(path, self.schema)
+        self.pending = []
+
+    def write(self, rows):
+        self.pending.extend(rows)
+        if len(self.pending) >= PARQUET_BATCH_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if self.pending:
+            columns = list(zip(*self.pending))
+            self.writer.write_table(self.pa.Table.from_arrays(
+                [self.pa.array(columns[i], self.pa.string()) for i in PARQUET_COLUMNS], schema=self.schema
+            ))
+            self.pending = []
+
+    def close(self):
+        self._flush()
+        self.writer.close()
+
+
+def _dedupe(rows):
+    """Drop rows identical to the previous one (input must be sorted)."""
+    previous = None
+    for row in rows:
+        if row != previous:
+            yield row
+        previous = row
+
+
+class BankPartitionWriter:
+    def __init__(self, root: str, mode: str = 'sorted', fmt: str = 'csv', memory_rows: int = DEFAULT_MEMORY_ROWS):
+        if mode not in ('sorted', 'append'):
+            raise ValueError(f"Unknown partition mode: {mode}")
+        if fmt not in ('csv', 'parquet'):
+            raise ValueError(f"Unknown partition format: {fmt}")
+        if fmt == 'parquet':
+            try:
+                import pyarrow.parquet  # noqa: F401
+            except ImportError:
+                raise RuntimeError("Parquet output needs pyarrow: pip install pyarrow")
+        self.root = root
+        self.mode = mode
+        self.fmt = fmt
+        self.memory_rows = memory_rows
+        self.buffers: Dict[tuple, List] = {}
+        self.buffered = 0
+        self.runs: Dict[tuple, List[str]] = {}
+        self.rows_in: Dict[tuple, int] = {}
+        self.sinks = OrderedDict()
+        self.parts: Dict[tuple, int] = {}
+        self._spill_dir = os.path.join(root, '_spill')
+        self._spill_seq = 0
+        os.makedirs(root, exist_ok=True)
+
+    # === Streaming ===
+    def add(self, df):
+        """Route one chunk's output rows (valid and invalid, with status) to their partitions."""
+        if df is None or len(df) == 0:
+            return
+        rows = _frame_rows(df)
+        routed: Dict[tuple, List] = {}
+        for row in rows:
+            routed.setdefault((row[1], row[4]), []).append(row)
+        for key, part_rows in routed.items():
+            self.rows_in[key] = self.rows_in.get(key, 0) + len(part_rows)
+            if self.mode == 'append':
+                self._append(key, part_rows)
+            else:
+                self.buffers.setdefault(key, []).extend(part_rows)
+                self.buffered += len(part_rows)
+        if self.buffered > self.memory_rows:
+            self._spill_all()
+
+    def _append(self, key, rows):
+        if self.fmt == 'parquet':
+            # Parquet files can't be appended to: one part per chunk and partition
+            sink = self._open_final(key, part=self.parts.get(key, 0))
+            self.parts[key] = self.parts.get(key, 0) + 1
+            sink.write(rows)
+            sink.close()
+            return
+        sink = self.sinks.get(key)
+        if sink is None:
+            if len(self.sinks) >= MAX_OPEN_SINKS:
+                _, oldest = self.sinks.popitem(last=False)
+                oldest.close()
+            sink = self.sinks[key] = self._open_final(key, part=0, mode='a')
+        else:
+            self.sinks.move_to_end(key)
+        sink.write(rows)
+
+    def _open_final(self, key, part: int = 0, mode: str = 'w'):
+        directory = partition_dir(self.root, *key)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"part-{part:05d}.{self.fmt}")
+        return _ParquetSink(path) if self.fmt == 'parquet' else _CsvSink(path, mode)
+
+    # === External merge sort ===
+    def _write_run(self, rows) -> str:
+        os.makedirs(self._spill_dir, exist_ok=True)
+        path = os.path.join(self._spill_dir, f"run-{self._spill_seq:06d}.csv")
+        self._spill_seq += 1
+        with open(path, 'w', newline='') as f:
+            csv.writer(f).writerows(rows)
+        return path
+
+    def _spill_all(self):
+        for key, rows in self.buffers.items():
+            rows.sort(key=SORT_KEY)
+            self.runs.setdefault(key, []).append(self._write_run(_dedupe(rows)))
+        self.buffers = {}
+        self.buffered = 0
+
+    def _merge(self, runs: List[str]):
+        files = [open(path, newline='') for path in runs]
+        try:
+            yield from _dedupe(heapq.merge(*[csv.reader(f) for f in files], key=SORT_KEY))
+        finally:
+            for f in files:
+                f.close()
+
+    def _reduce_runs(self, runs: List[str]) -> List[str]:
+        # Merge in rounds so no more than MAX_FAN_IN files are open at once
+        while len(runs) > MAX_FAN_IN:
+            merged = []
+            for i in range(0, len(runs), MAX_FAN_IN):
+                group = runs[i:i + MAX_FAN_IN]
+                merged.append(self._write_run(self._merge(group)))
+                for path in group:
+                    os.remove(path)
+            runs = merged
+        return runs
+
+    # === Finish ===
+    def close(self) -> Dict:
+        """Flush every partition and return the manifest {bank_code: {status: {...}}}."""
+        manifest = {}
+        if self.mode == 'append':
+            for sink in self.sinks.values():
+                sink.close()
+            self.sinks.clear()
+            for key, rows in self.rows_in.items():
+                manifest.setdefault(key[0], {})[key[1].lower()] = {
+                    'path': partition_dir(self.root, *key), 'rows': rows, 'duplicates_dropped': 0,
+                }
+            return manifest
+        for key in sorted(set(self.buffers) | set(self.runs)):
+            buffer = self.buffers.pop(key, [])
+            runs = self.runs.pop(key, [])
+            if runs:
+                # Didn't fit in memory: spill the rest and merge the sorted runs
+                if buffer:
+                    buffer.sort(key=SORT_KEY)
+                    runs.append(self._write_run(_dedupe(buffer)))
+                rows = self._merge(self._reduce_runs(runs))
+            else:
+                buffer.sort(key=SORT_KEY)
+                rows = _dedupe(buffer)
+            sink = self._open_final(key)
+            written = 0
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= 10000:
+                    sink.write(batch)
+                    written += len(batch)
+                    batch = []
+            sink.write(batch)
+            written += len(batch)
+            sink.close()
+            manifest.setdefault(key[0], {})[key[1].lower()] = {
+                'path': partition_dir(self.root, *key),
+                'rows': written,
+                'duplicates_dropped': self.rows_in.get(key, 0) - written,
+            }
+        shutil.rmtree(self._spill_dir, ignore_errors=True)
+        return manifest
@@ -0,0 +1,266 @@
+# app/pipeline.py
+"""
+Threaded stage pipeline with bounded queues.
+
+A source iterator feeds a chain of stages; each stage runs on its own
+worker thread(s) and hands items to the next through a queue of fixed
+depth, so a slow stage applies backpressure instead of letting chunks pile
+up in memory. Items leave every single-worker stage in source order, even
+after a multi-worker stage.
+
+Every stage records how long it was busy, starved (waiting for input) and
+blocked (waiting for room downstream). utilization = busy / wall time per
+worker; the busiest stage is the bottleneck.
+"""
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List
+
+from app.metrics import METRICS
+
+_DONE = object()
+# Sequence number of the item the current worker thread is processing
+_current = threading.local()
+# How often blocked workers re-check for a failure elsewhere in the pipeline
+_POLL_SECONDS = 0.1
+
+
+class Stage:
+    def __init__(self, name: str, fn: Callable, workers: int = 1):
+        if workers < 1:
+            raise ValueError(f"Stage '{name}' needs at least one worker")
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.items = 0
+        self.busy = 0.0
+        self.starved = 0.0
+        self.blocked = 0.0
+        self._lock = threading.Lock()
+
+    def _account(self, busy=0.0, starved=0.0, blocked=0.0, items=0):
+        with self._lock:
+            self.busy += busy
+            self.starved += starved
+            self.blocked += blocked
+            self.items += items
+
+
+class Pipeline:
+    """
+    Run `source` through `stages`; the last stage's outputs are returned by run().
+
+    depth is the capacity of each queue between stages (>= 1). The source is
+    read on its own thread and reported as the "read" stage.
+    """
+    def __init__(self, stages: List[Stage], depth: int = 2):
+        if depth < 1:
+            raise ValueError("Pipeline depth must be at least 1")
+        self.stages = stages
+        self.depth = depth
+        self.reader = Stage("read", None)
+        # One queue in front of each stage, plus the output queue run() drains
+        self.queues = [queue.Queue(maxsize=depth) for _ in range(len(stages) + 1)]
+        self.max_depth = [0] * len(self.queues)
+        self.wall_seconds = 0.0
+        self._failed = threading.Event()
+        self._cancel_lock = threading.Lock()
+        self._error = None
+        self.cancelled = False
+        # Items from this sequence number on are dropped after cancel()
+        self._cutoff = None
+
+    # === Queue helpers ===
+    def _put(self, index, item, stage):
+        start = time.perf_counter()
+        q = self.queues[index]
+        while True:
+            try:
+                q.put(item, timeout=_POLL_SECONDS)
+                break
+            except queue.Full:
+                if self._failed.is_set():
+                    raise _Aborted()
+        size = q.qsize()
+        if size > self.max_depth[index]:
+            self.max_depth[index] = size
+        METRICS.set_gauge("bv_queue_depth", size, queue=self._queue_name(index))
+        stage._account(blocked=time.perf_counter() - start)
+
+    def _queue_name(self, index):
+        return f"into_{self.stages[index].name}" if index < len(self.stages) else "output"
+
+    def _get(self, index, stage):
+        start = time.perf_counter()
+        q = self.queues[index]
+        while True:
+            try:
+                item = q.get(timeout=_POLL_SECONDS)
+                break
+            except queue.Empty:
+                if self._failed.is_set():
+                    raise _Aborted()
+        stage._account(starved=time.perf_counter() - start)
+        return item
+
+    def cancel(self):
+        """
+        Stop the run early without an error. Called from a stage, the item
+        being processed and every item after it are dropped before the next
+        stage; items ahead of it still finish. The reader stops pulling from
+        the source and closes it, and run() returns normally once the items
+        ahead have drained. Called from outside a stage, everything not yet
+        returned by run() is dropped.
+        """
+        seq = getattr(_current, 'seq', None)
+        seq = -1 if seq is None else seq
+        with self._cancel_lock:
+            self._cutoff = seq if self._cutoff is None else min(self._cutoff, seq)
+            self.cancelled = True
+
+    def _dropped(self, seq):
+        cutoff = self._cutoff
+        return cutoff is not None and seq >= cutoff
+
+    def _fail(self, exc):
+        if not self._failed.is_set():
+            self._error = exc
+            self._failed.set()
+
+    # === Workers ===
+    def _read(self, source):
+        try:
+            iterator = iter(source)
+            seq = 0
+            while not self.cancelled:
+                start = time.perf_counter()
+                item = next(iterator, _DONE)
+                if item is _DONE or self.cancelled:
+                    break
+                self.reader._account(busy=time.perf_counter() - start, items=1)
+                self._put(0, (seq, item), self.reader)
+                seq += 1
+            if self.cancelled:
+                # Release the source's files (and decompressor threads) now
+                close = getattr(iterator, 'close', None)
+                if close is not None:
+                    close()
+            self._finish(0, self.reader)
+        except _Aborted:
+            pass
+        except BaseException as exc:
+            self._fail(exc)
+
+    def _finish(self, index, stage):
+        """Tell every consumer of queue `index` that no more input is coming."""
+        consumers = self.stages[index].workers if index < len(self.stages) else 1
+        for _ in range(consumers):
+            self._put(index, (None, _DONE), stage)
+
+    def _work(self, index, stage, remaining):
+        try:
+            # A single worker restores source order after a multi-worker stage
+            pending, next_seq = {}, 0
+            while True:
+                seq, item = self._get(index, stage)
+                if item is _DONE:
+                    break
+                if stage.workers == 1:
+                    pending[seq] = item
+                    while next_seq in pending:
+                        self._process(index, stage, next_seq, pending.pop(next_seq))
+                        next_seq += 1
+                else:
+                    self._process(index, stage, seq, item)
+            # The last worker of a stage to finish closes the next stage's input
+            with remaining[1]:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                self._finish(index + 1, stage)
+        except _Aborted:
+            pass
+        except BaseException as exc:
+            self._fail(exc)
+
+    def _process(self, index, stage, seq, item):
+        if self._dropped(seq):
+            return
+        start = time.perf_counter()
+        _current.seq = seq
+        try:
+            result = stage.fn(item)
+        finally:
+            _current.seq = None
+        stage._account(busy=time.perf_counter() - start, items=1)
+        if not self._dropped(seq):
+            self._put(index + 1, (seq, result), stage)
+
+    def run(self, source: Iterable) -> Iterable:
+        """Start all workers and yield the last stage's outputs as they complete."""
+        threads = [threading.Thread(target=self._read, args=(source,), name="bv-read", daemon=True)]
+        for index, stage in enumerate(self.stages):
+            remaining = [stage.workers, threading.Lock()]
+            for n in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._work, args=(index, stage, remaining),
+                    name=f"bv-{stage.name}-{n}", daemon=True
+                ))
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                try:
+                    seq, item = self.queues[-1].get(timeout=_POLL_SECONDS)
+                except queue.Empty:
+                    if self._failed.is_set():
+                        break
+                    continue
+                if item is _DONE or self._failed.is_set():
+                    break
+                if not self._dropped(seq):
+                    yield item
+        finally:
+            # Unblocks any worker still waiting (consumer stopped early, or a stage failed)
+            self._failed.set()
+            for thread in threads:
+                thread.join()
+            self.wall_seconds = time.perf_counter() - start
+            self._publish()
+        if self._error is not None:
+            raise self._error
+
+    # === Reporting ===
+    def utilization(self) -> Dict:
+        """Per-stage busy/starved/blocked seconds and utilization, plus the bottleneck."""
+        wall = self.wall_seconds or 1e-9
+        stages = {}
+        for stage in [self.reader] + self.stages:
+            stages[stage.name] = {
+                "workers": stage.workers,
+                "items": stage.items,
+                "busy_seconds": round(stage.busy, 6),
+                "starved_seconds": round(stage.starved, 6),
+                "blocked_seconds": round(stage.blocked, 6),
+                "utilization": round(min(stage.busy / (wall * stage.workers), 1.0), 4),
+            }
+        bottleneck = max(stages, key=lambda name: stages[name]["utilization"]) if stages else None
+        return {
+            "depth": self.depth,
+            "wall_seconds": round(self.wall_seconds, 6),
+            "stages": stages,
+            "max_queue_depth": {
+                self._queue_name(i): size for i, size in enumerate(self.max_depth)
+            },
+            "bottleneck": bottleneck,
+        }
+
+    def _publish(self):
+        for name, stats in self.utilization()["stages"].items():
+            METRICS.set_gauge("bv_stage_utilization", stats["utilization"], stage=name)
+
+
+class _Aborted(Exception):
+    """Raised inside a worker when another stage has failed or the run was cancelled."""
@@ -0,0 +1,182 @@
+# app/profiling.py
+"""
+Built-in sampling profiler for batch runs and API uploads.
+
+A background thread samples every Python thread's stack at a fixed interval
+and writes flamegraph-ready output next to the run outputs:
+  <base>_profile.collapsed         collapsed stacks (flamegraph.pl / speedscope)
+  <base>_profile.speedscope.json   speedscope sampled profile
+  <base>_profile.json              top functions plus per-rule timings
+
+Samples cover the whole process, not one run: on the API every upload
+shares the event loop thread, so app.main profiles uploads one at a time.
+"""
+import os
+import sys
+import json
+import time
+import threading
+from collections import Counter
+from typing import Dict
+
+from app import job_store
+
+# API profiling is opt-in per deployment, then toggled at runtime by an admin.
+# The toggle lives in the job store so it reaches every API worker.
+PROFILING_ALLOWED = os.getenv("ALLOW_PROFILING", "0") == "1"
+
+
+def api_profiling_enabled() -> bool:
+    return PROFILING_ALLOWED and job_store.get_setting("api_profiling") == "1"
+
+
+def set_api_profiling(enabled: bool):
+    job_store.set_setting("api_profiling", "1" if enabled else "0")
+
+
+_CWD = os.getcwd()
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(_CWD):
+        filename = os.path.relpath(filename, _CWD)
+    elif not filename.startswith("<"):
+        # Library frames: keep package/module.py so labels stay short
+        filename = os.path.join(os.path.basename(os.path.dirname(filename)), os.path.basename(filename))
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    # Recorded in the summary so a profile is never read as per-request
+    SCOPE = "process"
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="bv-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(f"thread:{names.get(thread_id, thread_id)}")
+                stack.reverse()
+                self.stacks[tuple(stack)] += 1
+            self.samples += 1
+
+    # === Output formats ===
+    def collapsed(self) -> str:
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def speedscope(self, name: str) -> Dict:
+        frames, index = [], {}
+        samples, weights = [], []
+        for stack, count in self.stacks.most_common():
+            ids = []
+            for label in stack:
+                if label not in index:
+                    index[label] = len(frames)
+                    frames.append({"name": label})
+                ids.append(index[label])
+            samples.append(ids)
+            weights.append(count * self.interval)
+        total = sum(weights)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "bulk-validator",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": total,
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
+
+    def top_functions(self, limit: int = 25):
+        self_counts, total_counts = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            self_counts[stack[-1]] += count
+            for label in set(stack):
+                total_counts[label] += count
+        return [
+            {
+                "function": label,
+                "self_seconds": round(self_counts[label] * self.interval, 4),
+                "total_seconds": round(total_counts[label] * self.interval, 4),
+            }
+            for label, _ in self_counts.most_common(limit)
+        ]
+
+    def write(self, base_path: str, rules: Dict = None) -> Dict:
+        """Write all profile artifacts for `base_path` (e.g. output/run_<id>) and return their paths."""
+        name = os.path.basename(base_path)
+        paths = {
+            "profile_collapsed": f"{base_path}_profile.collapsed",
+            "profile_speedscope": f"{base_path}_profile.speedscope.json",
+            "profile_summary": f"{base_path}_profile.json",
+        }
+        with open(paths["profile_collapsed"], "w") as f:
+            f.write(self.collapsed())
+        with open(paths["profile_speedscope"], "w") as f:
+            json.dump(self.speedscope(name), f)
+        with open(paths["profile_summary"], "w") as f:
+            json.dump({
+                "scope": self.SCOPE,
+                "threads": sorted({stack[0] for stack in self.stacks}),
+                "interval_seconds": self.interval,
+                "duration_seconds": round(self.duration, 3),
+                "samples": self.samples,
+                "top_functions": self.top_functions(),
+                "rules": rules or {},
+            }, f, indent=2)
+        return paths
+
+
+def format_rule_stats(rule_stats: Dict) -> Dict:
+    """Turn AccountValidator.rule_stats ([evaluations, seconds, failures]) into a report dict."""
+    out = {}
+    for rule, (evaluations, seconds, failures) in sorted(rule_stats.items(), key=lambda kv: -kv[1][1]):
+        out[rule] = {
+            "evaluations": evaluations,
+            "seconds": round(seconds, 6),
+            "failures": failures,
+            "mean_us": round(seconds / evaluations * 1e6, 2) if evaluations else 0.0,
+        }
+    return out
@@ -0,0 +1,84 @@
+# app/records.py
+"""
+Compact typed records for single-account API requests.
+
+AccountRecord is a __slots__ class checked by hand instead of a pydantic
+model: decoding a /validate body is then one JSON parse plus a few type
+checks (see benchmarks/bench_serialization.py). Amounts are kept as sent,
+number or text; app.amounts parses them exactly and unparsable ones fail
+with AM09, as they do in uploads.
+"""
+from typing import Dict, List
+
+from app.serialization import loads
+
+
+class RecordError(ValueError):
+    """A request body that doesn't fit the record; `errors` is in FastAPI's 422 format."""
+
+    def __init__(self, errors: List[Dict]):
+        super().__init__('; '.join(f"{e['loc'][-1]}: {e['msg']}" for e in errors))
+        self.errors = errors
+
+
+def _error(field, msg, kind):
+    return {'loc': ['body', field] if field else ['body'], 'msg': msg, 'type': kind}
+
+
+class AccountRecord:
+    __slots__ = ('account_number', 'bank_code', 'amount', 'reference_id', 'currency')
+
+    REQUIRED = ('account_number', 'bank_code', 'amount', 'reference_id')
+
+    def __init__(self, account_number: str, bank_code: str, amount, reference_id: str, currency: str = None):
+        self.account_number = account_number
+        self.bank_code = bank_code
+        self.amount = amount
+        self.reference_id = reference_id
+        self.currency = currency
+
+    def __repr__(self):
+        return f"AccountRecord(bank_code={self.bank_code!r}, reference_id={self.reference_id!r})"
+
+    @classmethod
+    def from_dict(cls, data) -> 'AccountRecord':
+        """Check types and build a record; raises RecordError listing every problem."""
+        if not isinstance(data, dict):
+            raise RecordError([_error(None, 'Input should be a JSON object', 'model_type')])
+        errors = []
+        for field in cls.REQUIRED:
+            value = data.get(field)
+            if value is None:
+                errors.append(_error(field, 'Field required', 'missing'))
+            elif field == 'amount':
+                if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+                    errors.append(_error(field, 'Input should be a number or a numeric string', 'decimal_type'))
+            elif not isinstance(value, str):
+                errors.append(_error(field, 'Input should be a valid string', 'string_type'))
+        currency = data.get('currency')
+        if currency is not None and not isinstance(currency, str):
+            errors.append(_error('currency', 'Input should be a valid string', 'string_type'))
+        if errors:
+            raise RecordError(errors)
+        return cls(data['account_number'], data['bank_code'], data['amount'], data['reference_id'], currency)
+
+    @classmethod
+    def decode(cls, body: bytes) -> 'AccountRecord':
+        """Parse a JSON request body into a record."""
+        try:
+            data = loads(body)
+        except ValueError as e:
+            raise RecordError([_error(None, f'Invalid JSON: {e}', 'json_invalid')])
+        return cls.from_dict(data)
+
+    def to_dict(self) -> Dict:
+        """The plain dict AccountValidator.validate takes (currency only when given)."""
+        data = {
+            'account_number': self.account_number,
+            'bank_code': self.bank_code,
+            'amount': self.amount,
+            'reference_id': self.reference_id,
+        }
+        if self.currency is not None:
+            data['currency'] = self.currency
+        return data
@@ -1,8 +1,11 @@
 import pandas as pd
+import csv
 import json
 from collections import Counter, defaultdict
 from typing import List, Dict
 
+from app.abort import check_policies
+
 def error_breakdown_by_field(invalid_df: pd.DataFrame) -> Dict:
     field_counter = defaultdict(int)
     error_examples = defaultdict(list)
@@ -20,6 +23,13 @@ def error_breakdown_by_field(invalid_df: pd.DataFrame) -> Dict:
         for field, count in field_counter.items()
     }
 
+def error_code_counts(invalid_df: pd.DataFrame) -> Dict:
+    """Rows failing each error code (a row counts once per code)."""
+    counts = Counter()
+    for err_list in invalid_df['errors']:
+        counts.update({err.get('code', 'unknown') for err in err_list})
+    return dict(counts)
+
 def per_bank_stats(df: pd.DataFrame) -> Dict:
     stats = {}
     for bank, group in df.groupby('bank_code'):
@@ -38,6 +48,77 @@ def per_bank_stats(df: pd.DataFrame) -> Dict:
         }
     return stats
 
+class RunAggregator:
+    """
+    Folds per-chunk validation summaries into one run-level summary.
+
+    State is bounded by the number of distinct banks and error types, not by
+    the number of rows or chunks, so a run can stream any file size.
+    With abort `policies` (app.abort) every added chunk is checked against
+    them; `aborted` holds the first trip, after which the run should stop.
+    """
+    def __init__(self, max_examples: int = 3, policies: List = None):
+        self.max_examples = max_examples
+        self.policies = policies or []
+        self.aborted = None
+        self.chunks = 0
+        self.total = 0
+        self.valid = 0
+        self.invalid = 0
+        self.reused = 0
+        self.error_types = {}
+        self.error_codes = Counter()
+        self.per_bank = {}
+
+    def add(self, summary: Dict):
+        self.chunks += 1
+        self.total += summary.get('total_accounts', 0)
+        self.valid += summary.get('valid_accounts', 0)
+        self.invalid += summary.get('invalid_accounts', 0)
+        self.reused += summary.get('reused_results', 0)
+        for field, info in summary.get('invalid_error_types', {}).items():
+            entry = self.error_types.setdefault(field, {'count': 0, 'examples': []})
+            entry['count'] += info.get('count', 0)
+            room = self.max_examples - len(entry['examples'])
+            if room > 0:
+                entry['examples'].extend(info.get('examples', [])[:room])
+        for bank, stats in summary.get('per_bank_stats', {}).items():
+            entry = self.per_bank.setdefault(bank, {'total': 0, 'valid': 0, 'invalid': 0, 'error_types': Counter()})
+            entry['total'] += int(stats.get('total', 0))
+            entry['valid'] += int(stats.get('valid', 0))
+            entry['invalid'] += int(stats.get('invalid', 0))
+            entry['error_types'].update(stats.get('error_types', {}))
+        self.error_codes.update(summary.get('invalid_error_codes', {}))
+        if self.policies and self.aborted is None:
+            self.aborted = check_policies(self.policies, self.total, self.invalid, self.error_codes)
+
+    def summary(self) -> Dict:
+        return {
+            'chunks': self.chunks,
+            'total_accounts': self.total,
+            'valid_accounts': self.valid,
+            'invalid_accounts': self.invalid,
+            'reused_results': self.reused,
+            'invalid_error_types': {
+                field: {'count': entry['count'], 'examples': list(entry['examples'])}
+                for field, entry in self.error_types.items()
+            },
+            'invalid_error_codes': dict(self.error_codes),
+            'per_bank_stats': {
+                bank: {**entry, 'error_types': dict(entry['error_types'])}
+                for bank, entry in self.per_bank.items()
+            },
+        }
+
+def run_output_files(report_path: str):
+    """Every chunk output file listed in a run's chunk report, in chunk order."""
+    files = {}
+    with open(report_path, newline='') as f:
+        for row in csv.DictReader(f):
+            for path in json.loads(row['files'] or '{}').values():
+                files[path] = None
+    return list(files)
+
 def write_outputs(valid_df, invalid_df, summary, base_filename, formats=['csv','json','xlsx']):
     paths = {}
     if 'csv' in formats:
@@ -50,8 +131,8 @@ def write_outputs(valid_df, invalid_df, summary, base_filename, formats=['csv','
     if 'json' in formats:
         valid_path = f'output/{base_filename}_valid.json'
         invalid_path = f'output/{base_filename}_invalid.json'
-        valid_df.to_json(valid_path, orient='records', indent=2)
-        invalid_df.to_json(invalid_path, orient='records', indent=2)
+        valid_df.to_json(valid_path, orient='records')
+        invalid_df.to_json(invalid_path, orient='records')
         paths['valid_json'] = valid_path
         paths['invalid_json'] = invalid_path
     if 'xlsx' in formats:
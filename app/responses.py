@@ -0,0 +1,11 @@
+# app/responses.py
+from fastapi.responses import JSONResponse
+
+from app.serialization import dumps
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with app.serialization. Return it directly to skip FastAPI's jsonable_encoder."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
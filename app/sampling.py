@@ -0,0 +1,185 @@
+# app/sampling.py
+"""
+Statistical pre-scan: validate a uniform random sample of an input and
+estimate how much of the whole file is invalid, before committing to a
+full run.
+
+Two samplers:
+  - byte offsets (large CSVs): seek to random offsets and take the line
+    under each one. A line is hit in proportion to its length, so each is
+    weighted by 1/length, which also gives the row-count estimate. Only the
+    sampled lines are read, so the cost doesn't grow with the file.
+  - reservoir (JSON, XML and small CSVs): one pass over the streaming
+    reader, keeping a uniform sample of fixed size (Algorithm L).
+
+Rates come with Wilson score intervals; weighted samples use an effective
+sample size in place of n.
+"""
+import csv
+import io
+import math
+import os
+import random
+from statistics import NormalDist
+from typing import Dict, Iterable, List, Tuple
+
+SCAN_SAMPLE_ROWS = int(os.getenv('SCAN_SAMPLE_ROWS', '20000'))
+SCAN_CONFIDENCE = float(os.getenv('SCAN_CONFIDENCE', '0.95'))
+# CSVs up to this size are read whole; seeking only pays off beyond it
+SCAN_SEEK_BYTES = int(os.getenv('SCAN_SEEK_BYTES', str(32 * 1024 * 1024)))
+# Bytes read either side of an offset to find its line (doubled for longer lines)
+_WINDOW = 512
+
+
+# === Samplers ===
+_END = object()
+
+
+def reservoir_sample(records: Iterable, k: int, rng: random.Random = None) -> Tuple[List, int]:
+    """Uniform sample of `k` items from a stream of unknown length; returns (sample, items seen)."""
+    rng = rng or random.Random()
+    it = iter(records)
+    sample = []
+    for item in it:
+        sample.append(item)
+        if len(sample) == k:
+            break
+    seen = len(sample)
+    if seen < k:
+        return sample, seen
+    # Algorithm L: jump straight to the next item that replaces one in the reservoir
+    w = math.exp(math.log(_uniform(rng)) / k)
+    while True:
+        skip = int(math.log(_uniform(rng)) / math.log(1 - w))
+        for _ in range(skip):
+            if next(it, _END) is _END:
+                return sample, seen
+            seen += 1
+        item = next(it, _END)
+        if item is _END:
+            return sample, seen
+        seen += 1
+        sample[rng.randrange(k)] = item
+        w *= math.exp(math.log(_uniform(rng)) / k)
+
+
+def _uniform(rng: random.Random) -> float:
+    """Uniform on (0, 1); random() can return exactly 0."""
+    u = rng.random()
+    while u == 0.0:
+        u = rng.random()
+    return u
+
+
+def _line_at(f, offset: int, start: int, size: int) -> bytes:
+    """The line (with its newline) covering byte `offset`; data starts at `start`."""
+    window = _WINDOW
+    while True:
+        lo = max(start, offset - window)
+        f.seek(lo)
+        buf = f.read(min(size, offset + window) - lo)
+        rel = offset - lo
+        line_start = buf.rfind(b'\n', 0, rel) + 1
+        line_end = buf.find(b'\n', rel)
+        found_start = line_start > 0 or lo == start
+        found_end = line_end >= 0 or lo + len(buf) == size
+        if found_start and found_end:
+            end = line_end + 1 if line_end >= 0 else len(buf)
+            return buf[line_start:end]
+        window *= 2
+
+
+def csv_offset_sample(path: str, k: int, rng: random.Random = None, columns: List[str] = None) -> Dict:
+    """
+    Sample `k` data lines of a CSV by byte offset.
+    Returns {'df', 'weights', 'estimated_rows', 'rejected'}; lines that are
+    part of a quoted multi-line field, or don't split into the header's field
+    count, are redrawn and counted as rejected.
+    """
+    rng = rng or random.Random()
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        header_line = f.readline()
+        start = f.tell()
+        header = next(csv.reader([header_line.decode('utf-8-sig')]), [])
+        lines, weights, rejected = [], [], 0
+        while len(lines) < k and start < size and rejected <= 2 * k:
+            offsets = sorted(rng.randrange(start, size) for _ in range(k - len(lines)))
+            for offset in offsets:
+                line = _line_at(f, offset, start, size)
+                fields = next(csv.reader([line.decode('utf-8', errors='replace')]), [])
+                # An odd quote count means the line opens or closes a quoted newline
+                if len(fields) != len(header) or line.count(b'"') % 2:
+                    rejected += 1
+                    continue
+                lines.append(line if line.endswith(b'\n') else line + b'\n')
+                weights.append(1 / len(line))
+    # Parse the sampled lines exactly as the full run's reader would
+    body = header_line + b''.join(lines)
+    dtype = str if columns is None else {col: str for col in columns}
+    import pandas as pd  # loaded on first use, so importing this module stays cheap
+    df = pd.read_csv(io.BytesIO(body), usecols=columns, dtype=dtype)
+    mean_weight = sum(weights) / len(weights) if weights else 0
+    return {
+        'df': df,
+        'weights': weights,
+        # Under length-biased sampling E[1/len] = rows / data bytes
+        'estimated_rows': round((size - start) * mean_weight),
+        'rejected': rejected,
+    }
+
+
+# === Estimates ===
+def wilson_interval(p: float, n: float, confidence: float = SCAN_CONFIDENCE) -> Tuple[float, float]:
+    """Wilson score interval for a proportion `p` observed over `n` (possibly effective) trials."""
+    if n <= 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    denom = 1 + z * z / n
+    centre = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return max(0.0, centre - half), min(1.0, centre + half)
+
+
+def _rate(hits: List[bool], weights: List[float], confidence: float) -> Dict:
+    total = sum(weights)
+    p = sum(w for hit, w in zip(hits, weights) if hit) / total if total else 0.0
+    # Effective n from the ratio estimator's linearized variance, which (unlike
+    # Kish's n) accounts for weights that correlate with the outcome; Kish when p is 0 or 1
+    spread = sum(w * w * (hit - p) ** 2 for hit, w in zip(hits, weights))
+    if spread and 0 < p < 1:
+        n_eff = p * (1 - p) * total * total / spread
+    else:
+        n_eff = total * total / sum(w * w for w in weights) if total else 0
+    low, high = wilson_interval(p, n_eff, confidence)
+    return {'rate': round(p, 6), 'ci_low': round(low, 6), 'ci_high': round(high, 6), 'sample': len(hits)}
+
+
+def estimate(banks: List[str], results: List[Dict], weights: List[float] = None,
+             estimated_rows: int = None, confidence: float = SCAN_CONFIDENCE) -> Dict:
+    """Invalid rate overall, per error code and per bank (share of rows and invalid rate within it)."""
+    weights = weights or [1.0] * len(results)
+    invalid = [result['status'] != 'Valid' for result in results]
+    codes = [{err.get('code') for err in result['errors']} for result in results]
+    overall = _rate(invalid, weights, confidence)
+    by_code = {}
+    for code in sorted(set().union(*codes)) if codes else []:
+        by_code[code] = _rate([code in row for row in codes], weights, confidence)
+    by_bank = {}
+    for bank in sorted(set(banks)):
+        rows = [i for i, b in enumerate(banks) if b == bank]
+        by_bank[bank] = {
+            'share': _rate([b == bank for b in banks], weights, confidence),
+            'invalid': _rate([invalid[i] for i in rows], [weights[i] for i in rows], confidence),
+        }
+    report = {
+        'confidence': confidence,
+        'sample_rows': len(results),
+        'estimated_rows': estimated_rows,
+        'invalid': overall,
+        'by_error_code': by_code,
+        'by_bank': by_bank,
+    }
+    if estimated_rows is not None:
+        report['estimated_invalid_rows'] = round(overall['rate'] * estimated_rows)
+    return report
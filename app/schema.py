@@ -0,0 +1,77 @@
+# app/schema.py
+"""
+Pre-flight schema sniffing for batch ingest.
+
+Reads only the CSV header, the first JSON object, the first XML <record> or
+the first worksheet row to learn which columns an input has, fails before
+any chunk is processed if a required column is missing, and tells the
+readers which columns to keep.
+Everything else in a wide export is never parsed into the frame.
+"""
+import csv
+import io
+import xml.etree.ElementTree as ET
+from typing import Dict, List
+
+import ijson
+
+from app.compression import open_input
+
+REQUIRED_COLUMNS = ['account_number', 'bank_code', 'amount', 'reference_id']
+# Used when present (currency sets the amount's minor-unit scale)
+OPTIONAL_COLUMNS = ['currency']
+
+# Every projected column is read as text: account numbers and bank codes keep
+# their leading zeros, and amounts are parsed exactly by app.amounts
+COLUMN_DTYPES = {col: str for col in REQUIRED_COLUMNS + OPTIONAL_COLUMNS}
+
+
+class SchemaError(ValueError):
+    def __init__(self, missing: List[str], found: List[str]):
+        self.missing = missing
+        self.found = found
+        super().__init__(
+            f"Input must contain these columns: {', '.join(REQUIRED_COLUMNS)} "
+            f"(missing: {', '.join(missing)})"
+        )
+
+
+def sniff_columns(path: str, ext: str) -> List[str]:
+    """Column names from the first record of `path`, without reading the rest."""
+    if ext == 'csv':
+        with open_input(path) as raw, io.TextIOWrapper(raw, encoding='utf-8-sig', newline='') as f:
+            header = next(csv.reader(f), [])
+        return header
+    if ext == 'json':
+        with open_input(path) as f:
+            first = next(ijson.items(f, 'item'), None)
+        return list(first.keys()) if isinstance(first, dict) else []
+    if ext == 'xlsx':
+        from app.xlsx_reader import xlsx_header  # openpyxl is only loaded for workbooks
+        return xlsx_header(path)
+    if ext == 'xml':
+        with open_input(path) as f:
+            for _, elem in ET.iterparse(f, events=('end',)):
+                if elem.tag == 'record':
+                    return [child.tag for child in elem]
+        return []
+    raise ValueError(f'Unsupported file type: {ext}')
+
+
+def project(found: List[str]) -> List[str]:
+    """Fail on missing required columns; return the columns to read, in canonical order."""
+    missing = [col for col in REQUIRED_COLUMNS if col not in found]
+    if missing:
+        raise SchemaError(missing, list(found))
+    return REQUIRED_COLUMNS + [col for col in OPTIONAL_COLUMNS if col in found]
+
+
+def preflight(path: str, ext: str) -> Dict:
+    """Sniff `path` and return {'columns': found, 'projected': columns to read, 'ignored': the rest}."""
+    found = sniff_columns(path, ext)
+    projected = project(found)
+    return {
+        'columns': found,
+        'projected': projected,
+        'ignored': [col for col in found if col not in projected],
+    }
@@ -0,0 +1,104 @@
+# app/serialization.py
+"""
+JSON encoding for API responses, vault lines and token segments.
+
+Uses orjson (in requirements.txt), then msgspec, and falls back to the
+standard library (compact separators, no ASCII escaping) when neither is
+installed, so output is the same JSON whichever backend wrote it. Set
+JSON_BACKEND=json to force the standard library, e.g. to rule the backend
+out while debugging.
+
+dumps() returns UTF-8 bytes, ready for a socket, a cipher or a binary file;
+loads() takes bytes or str. Decimals are written as strings so amounts
+keep their exact text, and non-str dict keys (numeric bank codes, NaN) are
+spelled the way the standard library spells them. Nothing here imports the web stack; the API's
+response class is app.responses.FastJSONResponse.
+"""
+import os
+import json
+from decimal import Decimal
+
+JSON_BACKEND = os.getenv('JSON_BACKEND', 'auto')
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return str(obj)
+    to_dict = getattr(obj, 'to_dict', None)
+    if to_dict is not None:
+        return to_dict()
+    if hasattr(obj, 'item'):  # numpy scalars from pandas aggregates
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _key(key):
+    if isinstance(key, str):
+        return key
+    if hasattr(key, 'item'):  # numpy scalars from pandas groupby keys
+        key = key.item()
+    if key is not None and not isinstance(key, (int, float)):
+        raise TypeError(f"keys must be str, int, float, bool or None, not {type(key).__name__}")
+    # 'null', 'true', '44', 'NaN', 'Infinity': the standard library's key text
+    return json.dumps(key)
+
+
+def _str_keys(obj):
+    if isinstance(obj, dict):
+        return {_key(k): _str_keys(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_str_keys(v) for v in obj]
+    return obj
+
+
+def _with_str_keys(encode):
+    def dumps(obj):
+        try:
+            return encode(obj)
+        except TypeError:
+            # Rare: a dict with non-str keys; rewrite the keys and try once more
+            return encode(_str_keys(obj))
+    return dumps
+
+
+def _stdlib():
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=_default).encode
+    return 'json', _with_str_keys(lambda obj: encode(obj).encode()), json.loads
+
+
+def _select(name):
+    if name in ('auto', 'orjson'):
+        try:
+            import orjson
+        except ImportError:  # optional: pip install orjson
+            if name == 'orjson':
+                raise
+        else:
+            return 'orjson', _with_str_keys(lambda obj: orjson.dumps(obj, default=_default)), orjson.loads
+    if name in ('auto', 'msgspec'):
+        try:
+            import msgspec
+        except ImportError:  # optional: pip install msgspec
+            if name == 'msgspec':
+                raise
+        else:
+            encoder = msgspec.json.Encoder(enc_hook=_default, decimal_format='string')
+            decode = msgspec.json.decode
+
+            def loads(data):
+                # Raise ValueError like the other backends
+                try:
+                    return decode(data)
+                except msgspec.DecodeError as e:
+                    raise ValueError(str(e)) from None
+            return 'msgspec', _with_str_keys(encoder.encode), loads
+    if name not in ('auto', 'json'):
+        raise ValueError(f"JSON_BACKEND must be auto, orjson, msgspec or json, got {name!r}")
+    return _stdlib()
+
+
+BACKEND, dumps, loads = _select(JSON_BACKEND)
+
+
+def dumps_text(obj) -> str:
+    return dumps(obj).decode()
@@ -0,0 +1,268 @@
+# app/summary_reports.py
+"""
+HTML and PDF summary reports for finished runs.
+
+A report is built from the run-level aggregate only: the totals, per-bank
+stats and error-code/type counts stored with the job, plus the throughput
+figures from a batch run's report. Row-level outputs are never read, so a
+report costs the same for a hundred rows or a hundred million.
+
+REPORTS renders on a background thread once a run finishes and caches the
+files under REPORT_DIR by run id. A finished run's aggregate doesn't change,
+so later requests are served from the cache.
+"""
+import html
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+
+from app import job_store
+from app.abort import describe as describe_abort
+from app.validators.account_validator import SEPA_ERROR_CODES
+
+REPORT_DIR = os.getenv('REPORT_DIR', 'output/reports')
+REPORT_WORKERS = int(os.getenv('REPORT_WORKERS', '1'))
+# Per-bank table rows (busiest banks first); the rest are summed into one line
+REPORT_TOP_BANKS = int(os.getenv('REPORT_TOP_BANKS', '50'))
+
+FORMATS = ('html', 'pdf')
+FINISHED = ('done', 'aborted')
+
+
+def report_path(run_id: str, fmt: str) -> str:
+    return os.path.join(REPORT_DIR, f"run_{run_id}_summary.{fmt}")
+
+
+def cached_reports(run_id: str) -> Optional[Dict[str, str]]:
+    """{format: path} when every format is already rendered, else None."""
+    paths = {fmt: report_path(run_id, fmt) for fmt in FORMATS}
+    return paths if all(os.path.exists(path) for path in paths.values()) else None
+
+
+# === Context (aggregate only) ===
+def _pct(part, whole) -> str:
+    return f"{part / whole:.1%}" if whole else "-"
+
+
+def report_context(job: Dict) -> Dict:
+    """Everything a report shows, taken from the job's stored aggregate and its run report."""
+    summary = job.get('summary') or {}
+    total = summary.get('total_accounts', 0)
+    run = {}
+    run_report = (job.get('files') or {}).get('run_report')
+    if run_report and os.path.exists(run_report):
+        with open(run_report) as f:
+            run = json.load(f)
+    elapsed = run.get('elapsed_seconds')
+    if elapsed is None:
+        elapsed = round(job['updated_at'] - job['created_at'], 3)
+    rows_per_sec = run.get('rows_per_sec') or (round(total / elapsed, 1) if elapsed else None)
+
+    banks = sorted(
+        summary.get('per_bank_stats', {}).items(),
+        key=lambda item: (-item[1].get('total', 0), item[0]),
+    )
+    bank_rows = []
+    for bank, stats in banks[:REPORT_TOP_BANKS]:
+        error_types = stats.get('error_types') or {}
+        top_error = max(error_types, key=error_types.get) if error_types else '-'
+        bank_rows.append([
+            bank, stats.get('total', 0), stats.get('valid', 0), stats.get('invalid', 0),
+            _pct(stats.get('invalid', 0), stats.get('total', 0)), top_error,
+        ])
+    rest = banks[REPORT_TOP_BANKS:]
+    if rest:
+        rest_total = sum(stats.get('total', 0) for _, stats in rest)
+        rest_invalid = sum(stats.get('invalid', 0) for _, stats in rest)
+        bank_rows.append([
+            f"{len(rest)} more banks", rest_total, rest_total - rest_invalid, rest_invalid,
+            _pct(rest_invalid, rest_total), '-',
+        ])
+
+    codes = sorted(summary.get('invalid_error_codes', {}).items(), key=lambda item: (-item[1], item[0]))
+    error_types = sorted(summary.get('invalid_error_types', {}).items(), key=lambda item: (-item[1]['count'], item[0]))
+    return {
+        'run_id': job['job_id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'input': run.get('input'),
+        'finished_at': time.strftime('%Y-%m-%d %H:%M:%S UTC', time.gmtime(job['updated_at'])),
+        'aborted': run.get('aborted') or (job.get('detail') if job['status'] == 'aborted' else None),
+        'totals': [
+            ['Records', total],
+            ['Valid', summary.get('valid_accounts', 0)],
+            ['Invalid', summary.get('invalid_accounts', 0)],
+            ['Invalid rate', _pct(summary.get('invalid_accounts', 0), total)],
+            ['Reused results', summary.get('reused_results', 0)],
+        ],
+        'throughput': [
+            ['Elapsed', f"{elapsed:.2f} s" if elapsed is not None else '-'],
+            ['Rows/sec', f"{rows_per_sec:,.0f}" if rows_per_sec else '-'],
+            ['Chunks', run.get('chunks', summary.get('chunks', 1))],
+            ['Bottleneck stage', (run.get('pipeline') or {}).get('bottleneck') or '-'],
+        ],
+        'error_codes': [
+            [code, SEPA_ERROR_CODES.get(code, ''), count, _pct(count, total)] for code, count in codes
+        ],
+        'error_types': [
+            [field, entry['count'], '; '.join(entry.get('examples', []))] for field, entry in error_types
+        ],
+        'banks': bank_rows,
+    }
+
+
+# === Renderers ===
+SECTIONS = [
+    ('Totals', 'totals', ['', '']),
+    ('Throughput', 'throughput', ['', '']),
+    ('Error codes', 'error_codes', ['Code', 'Meaning', 'Rows', '% of records']),
+    ('Error types', 'error_types', ['Check', 'Count', 'Examples']),
+    ('Per bank', 'banks', ['Bank', 'Records', 'Valid', 'Invalid', 'Invalid rate', 'Top error']),
+]
+
+
+def _fmt(value) -> str:
+    return f"{value:,}" if isinstance(value, int) else str(value)
+
+
+def _abort_text(aborted) -> str:
+    return f"Aborted: {describe_abort(aborted)}" if isinstance(aborted, dict) else str(aborted)
+
+
+def render_html(context: Dict) -> str:
+    esc = lambda value: html.escape(_fmt(value))
+    parts = [
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\">",
+        f"<title>Validation report {esc(context['run_id'])}</title>",
+        "<style>body{font-family:sans-serif;margin:2em;color:#222}table{border-collapse:collapse;margin-bottom:1.5em}"
+        "th,td{border:1px solid #ccc;padding:4px 8px;text-align:left}th{background:#f0f0f0}"
+        ".aborted{color:#a00;font-weight:bold}</style></head><body>",
+        "<h1>Bulk Validation Report</h1>",
+        f"<p>Run <code>{esc(context['run_id'])}</code> ({esc(context['kind'])}), {esc(context['status'])}, "
+        f"finished {esc(context['finished_at'])}</p>",
+    ]
+    if context['input']:
+        parts.append(f"<p>Input: <code>{esc(context['input'])}</code></p>")
+    if context['aborted']:
+        parts.append(f"<p class=\"aborted\">{esc(_abort_text(context['aborted']))}</p>")
+    for title, key, header in SECTIONS:
+        rows = context[key]
+        if not rows:
+            continue
+        parts.append(f"<h2>{title}</h2><table>")
+        if any(header):
+            parts.append("<tr>" + "".join(f"<th>{esc(h)}</th>" for h in header) + "</tr>")
+        for row in rows:
+            parts.append("<tr>" + "".join(f"<td>{esc(cell)}</td>" for cell in row) + "</tr>")
+        parts.append("</table>")
+    parts.append("</body></html>")
+    return "\n".join(parts)
+
+
+def render_pdf(context: Dict, path: str):
+    # reportlab is only needed once a report is rendered
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    styles = getSampleStyleSheet()
+    cell = styles['BodyText']
+    esc = lambda value: html.escape(_fmt(value))
+    story = [
+        Paragraph("Bulk Validation Report", styles['Title']),
+        Paragraph(f"Run {esc(context['run_id'])} ({esc(context['kind'])}), {esc(context['status'])}, "
+                  f"finished {esc(context['finished_at'])}", cell),
+    ]
+    if context['input']:
+        story.append(Paragraph(f"Input: {esc(context['input'])}", cell))
+    if context['aborted']:
+        story.append(Paragraph(f"<font color='red'>{esc(_abort_text(context['aborted']))}</font>", cell))
+    for title, key, header in SECTIONS:
+        rows = context[key]
+        if not rows:
+            continue
+        data = [[Paragraph(esc(value), cell) for value in row] for row in rows]
+        if any(header):
+            data.insert(0, [Paragraph(f"<b>{esc(h)}</b>", cell) for h in header])
+        table = Table(data, repeatRows=1 if any(header) else 0, hAlign='LEFT')
+        table.setStyle(TableStyle([
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ] + ([('BACKGROUND', (0, 0), (-1, 0), colors.whitesmoke)] if any(header) else [])))
+        story += [Spacer(1, 10), Paragraph(title, styles['Heading2']), table]
+    SimpleDocTemplate(path, pagesize=A4, title=f"Validation report {context['run_id']}").build(story)
+
+
+def render_reports(run_id: str) -> Dict[str, str]:
+    """Render (or re-render) every format for a finished run; {format: path}."""
+    job = job_store.get_job(run_id)
+    if job is None:
+        raise LookupError(f"Run {run_id} not found")
+    if job['status'] not in FINISHED:
+        raise ValueError(f"Run {run_id} is {job['status']}")
+    context = report_context(job)
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    paths = {}
+    for fmt in FORMATS:
+        path = report_path(run_id, fmt)
+        # Written aside and renamed, so a reader (or another worker) never sees half a file
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            if fmt == 'html':
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    f.write(render_html(context))
+            else:
+                render_pdf(context, tmp)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        paths[fmt] = path
+    return paths
+
+
+# === Background renderer ===
+class ReportRenderer:
+    """Renders reports off the request/run path; a run already being rendered isn't queued twice."""
+
+    def __init__(self, workers: int = REPORT_WORKERS):
+        self.workers = workers
+        self._pool = None
+        self._pid = None
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _executor(self) -> ThreadPoolExecutor:
+        # Threads don't survive a fork: a preloaded worker starts its own pool
+        if self._pool is None or self._pid != os.getpid():
+            self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix='bv-report')
+            self._pid = os.getpid()
+            self._pending = {}
+        return self._pool
+
+    def submit(self, run_id: str) -> Future:
+        """Future for {format: path}; already resolved when the reports are cached."""
+        cached = cached_reports(run_id)
+        if cached is not None:
+            future = Future()
+            future.set_result(cached)
+            return future
+        with self._lock:
+            future = self._pending.get(run_id)
+            if future is None:
+                future = self._executor().submit(render_reports, run_id)
+                self._pending[run_id] = future
+        future.add_done_callback(lambda done: self._forget(run_id, done))
+        return future
+
+    def _forget(self, run_id: str, future: Future):
+        with self._lock:
+            if self._pending.get(run_id) is future:
+                del self._pending[run_id]
+
+
+REPORTS = ReportRenderer()
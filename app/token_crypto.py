@@ -0,0 +1,126 @@
+# app/token_crypto.py
+"""
+Key material and encryption for the token vault.
+
+TOKEN_MAP_KEY holds one or more comma-separated Fernet keys, newest first.
+Keys are parsed once and cached; the first key encrypts and every key can
+decrypt, so rotating a key in means prepending it (see token_vault.rotate_vault).
+
+Batches are sealed as AES-GCM segments: a chunk's tokens are split into
+SEGMENTS buckets by token hash, and each bucket is encrypted on its own, so
+a lookup decrypts one small segment instead of the whole batch. The
+AES-256 key for each Fernet key is derived with HKDF and identified by a
+short key id stored next to the ciphertext.
+"""
+import os
+import zlib
+import base64
+import hashlib
+from functools import lru_cache
+from typing import Dict
+
+from cryptography.fernet import Fernet, MultiFernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+from app.serialization import dumps, loads
+
+SEGMENTS = int(os.getenv('TOKEN_VAULT_SEGMENTS', '16'))
+NONCE_BYTES = 12
+_HKDF_INFO = b'bulk-validator token vault aes-gcm'
+
+
+def key_id(key: str) -> str:
+    return hashlib.sha256(key.encode()).hexdigest()[:8]
+
+
+def _derive_aead_key(key: str) -> bytes:
+    hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=_HKDF_INFO)
+    return hkdf.derive(base64.urlsafe_b64decode(key.encode()))
+
+
+class Keyring:
+    """Fernet keys for one TOKEN_MAP_KEY value, plus the AES-GCM keys derived from them."""
+    def __init__(self, keys):
+        if not keys:
+            raise ValueError('At least one Fernet key is required')
+        self.fernet = MultiFernet([Fernet(key.encode()) for key in keys])
+        self.primary_kid = key_id(keys[0])
+        self.aead = {key_id(key): AESGCM(_derive_aead_key(key)) for key in keys}
+
+    def cipher(self, kid: str) -> AESGCM:
+        cipher = self.aead.get(kid)
+        if cipher is None:
+            raise KeyError(f'No key with id {kid} in TOKEN_MAP_KEY')
+        return cipher
+
+
+@lru_cache(maxsize=8)
+def _keyring(raw: str) -> Keyring:
+    return Keyring([key.strip() for key in raw.split(',') if key.strip()])
+
+
+def load_keyring(raw: str = None) -> Keyring:
+    """Keyring for `raw` (default: TOKEN_MAP_KEY); parsed once per distinct value."""
+    raw = raw or os.getenv('TOKEN_MAP_KEY')
+    if not raw:
+        raise RuntimeError('TOKEN_MAP_KEY environment variable must be set for encryption.')
+    return _keyring(raw)
+
+
+def segment_of(token: str, segments: int = SEGMENTS) -> int:
+    return zlib.crc32(token.encode()) % segments
+
+
+def _aad(batch_id: str, field: str, segment) -> bytes:
+    # Binds each segment to its batch and position so segments can't be swapped
+    return f'{batch_id}:{field}:{segment}'.encode()
+
+
+def seal_segments(batch_id: str, fields: Dict[str, Dict], keyring: Keyring = None,
+                  segments: int = SEGMENTS) -> Dict:
+    """Encrypt {field: {token: value}} into {'kid', 'segments': {field: {segment: blob}}}."""
+    keyring = keyring or load_keyring()
+    cipher = keyring.cipher(keyring.primary_kid)
+    sealed = {}
+    crc32 = zlib.crc32
+    for field, tokens in fields.items():
+        # Same bucketing as segment_of(), inlined: this loop runs once per token
+        buckets = [{} for _ in range(segments)]
+        for token, value in tokens.items():
+            buckets[crc32(token.encode()) % segments][token] = value
+        sealed[field] = {}
+        for segment, bucket in enumerate(buckets):
+            if not bucket:
+                continue
+            nonce = os.urandom(NONCE_BYTES)
+            ciphertext = cipher.encrypt(nonce, dumps(bucket), _aad(batch_id, field, segment))
+            sealed[field][str(segment)] = base64.b64encode(nonce + ciphertext).decode()
+    return {'kid': keyring.primary_kid, 'n_segments': segments, 'segments': sealed}
+
+
+def open_segment(entry: Dict, field: str, segment, keyring: Keyring = None) -> Dict:
+    """Decrypt one segment of a sealed batch; {} if the batch has no such segment."""
+    blob = entry['segments'].get(field, {}).get(str(segment))
+    if blob is None:
+        return {}
+    keyring = keyring or load_keyring()
+    raw = base64.b64decode(blob)
+    plaintext = keyring.cipher(entry['kid']).decrypt(
+        raw[:NONCE_BYTES], raw[NONCE_BYTES:], _aad(entry['batch_id'], field, segment)
+    )
+    return loads(plaintext)
+
+
+def open_segments(entry: Dict, keyring: Keyring = None, fields=None) -> Dict:
+    """Decrypt every segment of a sealed batch (or only of `fields`) into {field: {token: value}}."""
+    keyring = keyring or load_keyring()
+    out = {}
+    for field, segments in entry['segments'].items():
+        if fields is not None and field not in fields:
+            continue
+        out[field] = {}
+        for segment in segments:
+            out[field].update(open_segment(entry, field, segment, keyring))
+    return out
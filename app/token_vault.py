@@ -0,0 +1,163 @@
+# app/token_vault.py
+"""
+Append-only, encrypted token vault.
+
+Each validated chunk appends one line to the vault (NDJSON): batch metadata
+in plaintext plus that chunk's token -> real value map, encrypted. Writers
+never read the existing file, so memory per chunk is bounded by the chunk
+and the vault can grow without slowing ingest down. Readers stream it line
+by line; legacy token_map.json files (a single JSON list) are still read.
+
+New batches are sealed as AES-GCM segments (see app.token_crypto) so a
+lookup only decrypts the segment holding its token. Batches written as one
+Fernet blob ("tokens") are still read; set TOKEN_VAULT_CIPHER=fernet to keep
+writing them.
+"""
+import os
+import json
+import time
+from contextlib import contextmanager
+from uuid import uuid4
+from typing import Dict, Iterator
+
+from dotenv import load_dotenv
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, run a single writer
+    fcntl = None
+
+from app.serialization import dumps, loads
+from app.token_crypto import load_keyring, seal_segments, open_segment, open_segments, segment_of
+
+load_dotenv()
+
+TOKEN_MAP_PATH = os.getenv('TOKEN_MAP_PATH', 'output/token_map.jsonl')
+# 'aesgcm' (segmented, default) or 'fernet' (one blob per batch)
+VAULT_CIPHER = os.getenv('TOKEN_VAULT_CIPHER', 'aesgcm')
+
+
+@contextmanager
+def _vault_lock(path: str):
+    """
+    Exclusive cross-process lock for appending to or rewriting the vault.
+
+    A separate lock file is used so rotate_vault() can swap the vault file
+    without stranding writers that are waiting on the old one.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(f"{path}.lock", 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _seal(entry: Dict, tokens_dict: Dict, keyring, cipher: str) -> Dict:
+    if cipher == 'fernet':
+        entry['tokens'] = keyring.fernet.encrypt(dumps(tokens_dict)).decode()
+    else:
+        entry['cipher'] = 'aesgcm'
+        entry.update(seal_segments(entry['batch_id'], tokens_dict, keyring))
+    return entry
+
+
+def write_batch(account_tokens: Dict, reference_tokens: Dict, path: str = None) -> Dict:
+    """Encrypt one chunk's tokens and append them as a new batch. Returns the batch metadata."""
+    path = path or TOKEN_MAP_PATH
+    tokens_dict = {'account_tokens': account_tokens, 'reference_tokens': reference_tokens}
+    entry = _seal({'batch_id': str(uuid4()), 'timestamp': int(time.time())}, tokens_dict, load_keyring(), VAULT_CIPHER)
+    line = dumps(entry) + b'\n'
+    # Several API workers or CLI runs may append at once; whole lines only
+    with _vault_lock(path):
+        with open(path, 'ab') as f:
+            f.write(line)
+    return {'batch_id': entry['batch_id'], 'timestamp': entry['timestamp']}
+
+
+def iter_batch_lines(path: str = None) -> Iterator[str]:
+    """Stream batch entries as raw JSON text, one per batch, without parsing them."""
+    path = path or TOKEN_MAP_PATH
+    with open(path, 'r') as f:
+        head = f.read(1)
+        while head and head.isspace():
+            head = f.read(1)
+        if head == '[':
+            # Legacy format: one JSON list rewritten on every chunk
+            f.seek(0)
+            for entry in json.load(f):
+                yield json.dumps(entry)
+            return
+        f.seek(0)
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def iter_batches(path: str = None) -> Iterator[Dict]:
+    """Stream batch entries from an NDJSON vault or a legacy JSON token map."""
+    for line in iter_batch_lines(path):
+        yield loads(line)
+
+
+def decrypt_batch(entry: Dict, keyring=None, fields=None) -> Dict:
+    """
+    Decrypt a batch into {'account_tokens': {...}, 'reference_tokens': {...}}.
+
+    With `fields`, segmented batches only decrypt those fields (Fernet
+    batches are one blob, so they are always decrypted whole).
+    """
+    keyring = keyring or load_keyring()
+    if entry.get('cipher') == 'aesgcm':
+        return open_segments(entry, keyring, fields)
+    tokens_dict = loads(keyring.fernet.decrypt(entry['tokens'].encode()))
+    if fields is not None:
+        tokens_dict = {field: tokens for field, tokens in tokens_dict.items() if field in fields}
+    return tokens_dict
+
+
+def lookup_token(token: str, path: str = None):
+    """Find the real value for a token. Returns (real_value, batch_entry) or (None, None)."""
+    keyring = load_keyring()
+    field = 'account_tokens' if token.startswith('ACC-') else 'reference_tokens'
+    for entry in iter_batches(path):
+        try:
+            if entry.get('cipher') == 'aesgcm':
+                # Only the segment that can hold this token is decrypted
+                tokens = open_segment(entry, field, segment_of(token, entry['n_segments']), keyring)
+            elif entry.get('tokens'):
+                tokens = decrypt_batch(entry, keyring).get(field, {})
+            else:
+                continue
+        except Exception:
+            continue
+        if token in tokens:
+            return tokens[token], entry
+    return None, None
+
+
+def rotate_vault(path: str = None) -> int:
+    """
+    Re-encrypt every batch with the primary (first) key in TOKEN_MAP_KEY.
+
+    Writes a new file next to the vault and swaps it in atomically. Returns
+    the number of batches rewritten. Writers wait on the vault lock while it
+    runs; keep the old key listed until it has finished.
+    """
+    path = path or TOKEN_MAP_PATH
+    keyring = load_keyring()
+    tmp_path = f"{path}.rotate"
+    count = 0
+    with _vault_lock(path):
+        with open(tmp_path, 'wb') as out:
+            for entry in iter_batches(path):
+                tokens_dict = decrypt_batch(entry, keyring)
+                rotated = _seal({'batch_id': entry['batch_id'], 'timestamp': entry['timestamp']}, tokens_dict, keyring, VAULT_CIPHER)
+                out.write(dumps(rotated) + b'\n')
+                count += 1
+        os.replace(tmp_path, path)
+    return count
@@ -1,12 +1,12 @@
 # app/validators/account_validator.py
 
-import re
-<<<<<<< HEAD
+import random
+from time import perf_counter
 from typing import Dict
 from app.bank_strategies import BANK_VALIDATORS
-=======
-import random
-from typing import Dict, List
+from app.metrics import METRICS
+from app.validators.rules import Rule, RuleEngine, record_rule_timing, code_fingerprint
+from app.normalize import normalize_record
 
 # SEPA error codes
 SEPA_ERROR_CODES = {
@@ -18,110 +18,135 @@ SEPA_ERROR_CODES = {
     "RR01": "Regulatory restriction",
     "RF01": "Invalid reference ID"
 }
->>>>>>> 712d468fcd2dfc328a93acfc9751f42a6b479770
+
+# Bump when results change in a way the rule code can't show (e.g. new bank data
+# loaded at runtime); code changes to rules and registries are picked up on their own
+RULESET_VERSION = "1"
+
+# Realistic bank codes
+VALID_BANK_CODES = ["001", "002", "003", "044", "058", "070", "232", "082", "214", "215"]
+_VALID_BANK_CODE_SET = frozenset(VALID_BANK_CODES)
+
+def iban_checksum_ok(iban: str) -> bool:
+    """MOD-97 check for an uppercase IBAN already classified by app.normalize"""
+    rearranged = iban[4:] + iban[:4]
+    # Letters become 10..35, digits stay as they are
+    return int(''.join(str(int(c, 36)) for c in rearranged)) % 97 == 1
+
+def luhn_ok(account: str) -> bool:
+    """Validate account number checksum using Luhn algorithm"""
+    digits = [int(d) for d in account]
+    sum_ = sum(digits[-1::-2]) + sum(sum(divmod(d*2,10)) for d in digits[-2::-2])
+    return sum_ % 10 == 0
+
+def _is_local(ctx) -> bool:
+    return ctx["account_kind"] != "iban"
+
+# === Rule registry ===
+# Rules only read the precomputed fields from app.normalize (canonical
+# account_number, account_kind, account_length, amount_ok).
+# Declaration order is the order errors are reported in.
+RULES = RuleEngine([
+    # Banks with their own account algorithm check it first (IBANs included);
+    # the generic account format rules still run once it passes, and are
+    # skipped when it fails so the bank's error is the one reported
+    Rule(
+        name="bank_account_format",
+        code="AC01",
+        message=lambda ctx: f"Account number failed validation for bank {ctx['bank_code']}",
+        check=lambda ctx: not BANK_VALIDATORS[ctx["bank_code"]](ctx["account_number"]),
+        inputs=("account_number", "bank_code"),
+        applies=lambda ctx: ctx["bank_code"] in BANK_VALIDATORS,
+        cost=2,
+    ),
+    Rule(
+        name="iban_format_or_checksum",
+        code="AC01",
+        message=SEPA_ERROR_CODES["AC01"],
+        check=lambda ctx: not iban_checksum_ok(ctx["account_number"]),
+        applies=lambda ctx: ctx["account_kind"] == "iban",
+        requires=("bank_account_format",),
+        cost=5,
+    ),
+    Rule(
+        name="length_error",
+        code="AC01",
+        message=SEPA_ERROR_CODES["AC01"],
+        check=lambda ctx: not (8 <= ctx["account_length"] <= 12),
+        inputs=("account_length",),
+        applies=_is_local,
+        requires=("bank_account_format",),
+        cost=1,
+    ),
+    Rule(
+        name="alphanumeric_format",
+        code="AC01",
+        message=SEPA_ERROR_CODES["AC01"],
+        check=lambda ctx: ctx["account_kind"] == "invalid_charset",
+        inputs=("account_kind",),
+        applies=_is_local,
+        requires=("bank_account_format",),
+        cost=1,
+    ),
+    Rule(
+        name="bank_code_validation",
+        code="BE04",
+        message=SEPA_ERROR_CODES["BE04"],
+        check=lambda ctx: ctx["bank_code"] not in _VALID_BANK_CODE_SET,
+        inputs=("bank_code",),
+        applies=_is_local,
+        cost=1,
+    ),
+    Rule(
+        name="luhn_checksum",
+        code="AC01",
+        message=SEPA_ERROR_CODES["AC01"],
+        check=lambda ctx: not luhn_ok(ctx["account_number"]),
+        applies=lambda ctx: ctx["account_kind"] == "numeric" and ctx["account_length"] == 10,
+        requires=("bank_account_format", "alphanumeric_format"),
+        cost=3,
+    ),
+    Rule(
+        name="amount_validation",
+        code="AM09",
+        message=SEPA_ERROR_CODES["AM09"],
+        # Parsed exactly into minor units and range-checked by app.amounts
+        check=lambda ctx: not ctx["amount_ok"],
+        inputs=("amount_ok",),
+        cost=1,
+    ),
+    Rule(
+        name="reference_id_validation",
+        code="RF01",
+        message=SEPA_ERROR_CODES["RF01"],
+        check=lambda ctx: not ctx["reference_id"],
+        inputs=("reference_id",),
+        cost=1,
+    ),
+])
 
 class AccountValidator:
-    def __init__(self):
-        # Realistic bank codes
-        self.valid_bank_codes = ["001", "002", "003", "044", "058", "070", "232", "082", "214", "215"]
-        self.validation_rules = [
-            {
-                "name": "iban_format_or_checksum",
-                "rule": lambda x: self._looks_like_iban(x) and not self._validate_iban(x),
-                "message": SEPA_ERROR_CODES["AC01"],
-                "code": "AC01"
-            },
-            {
-                "name": "length_error",
-                "rule": lambda x: not self._looks_like_iban(x) and not (8 <= len(x) <= 12),
-                "message": SEPA_ERROR_CODES["AC01"],
-                "code": "AC01"
-            },
-            {
-                "name": "alphanumeric_format",
-                "rule": lambda x: not self._looks_like_iban(x) and not x.isalnum(),
-                "message": SEPA_ERROR_CODES["AC01"],
-                "code": "AC01"
-            },
-            {
-                "name": "bank_code_validation",
-                "rule": lambda x, bank_code: not self._looks_like_iban(x) and bank_code not in self.valid_bank_codes,
-                "message": SEPA_ERROR_CODES["BE04"],
-                "code": "BE04"
-            },
-            {
-                "name": "luhn_checksum",
-                "rule": lambda x: not self._looks_like_iban(x) and (x.isdigit() and len(x) == 10 and not self._validate_checksum(x)),
-                "message": SEPA_ERROR_CODES["AC01"],
-                "code": "AC01"
-            },
-            {
-                "name": "amount_validation",
-                "rule": lambda x, amount: not self._validate_amount(amount),
-                "message": SEPA_ERROR_CODES["AM09"],
-                "code": "AM09"
-            },
-            {
-                "name": "reference_id_validation",
-                "rule": lambda x, amount, reference_id: not reference_id,
-                "message": SEPA_ERROR_CODES["RF01"],
-                "code": "RF01"
-            }
-        ]
-
-    def _looks_like_iban(self, account: str) -> bool:
-        # IBAN: 2 letters (country), 2 digits (check), rest alphanumeric, length 15-34
-        return bool(re.match(r"^[A-Z]{2}[0-9]{2}[A-Z0-9]{11,30}$", account.upper()))
-
-    def _validate_iban(self, iban: str) -> bool:
-        # Remove spaces and uppercase
-        iban = iban.replace(' ', '').upper()
-        # Basic format check
-        if not re.match(r"^[A-Z]{2}[0-9]{2}[A-Z0-9]{11,30}$", iban):
-            return False
-        # Country-specific length check (optional, here just 15-34)
-        if not (15 <= len(iban) <= 34):
-            return False
-        # Rearrange
-        rearranged = iban[4:] + iban[:4]
-        # Convert letters to numbers (A=10, B=11, ..., Z=35)
-        numerized = ''
-        for c in rearranged:
-            if c.isdigit():
-                numerized += c
-            else:
-                numerized += str(ord(c) - 55)
-        # MOD-97
-        try:
-            return int(numerized) % 97 == 1
-        except Exception:
-            return False
-
-    def _validate_bank_code(self, bank_code: str) -> bool:
-        """Validate bank code format and existence"""
-        return bank_code in self.valid_bank_codes
-
-    def _validate_checksum(self, account: str) -> bool:
-        """Validate account number checksum using Luhn algorithm"""
-        try:
-            # Only validate checksum for numeric accounts
-            if not account.isdigit():
-                return False
-            
-            digits = [int(d) for d in account]
-            sum_ = sum(digits[-1::-2]) + sum(sum(divmod(d*2,10)) for d in digits[-2::-2])
-            return sum_ % 10 == 0
-        except ValueError:
-            return False
-
-    def _validate_amount(self, amount: float) -> bool:
-        """Validate transaction amount"""
-        return amount > 0 and amount <= 10000000  # Max 10M limit
+    def __init__(self, collect_timings=None, engine=None):
+        self.valid_bank_codes = VALID_BANK_CODES
+        self.engine = engine or RULES
+        # Per-rule [evaluations, seconds, failures]; collected while metrics are enabled unless overridden
+        self.collect_timings = collect_timings
+        self.rule_stats = {}
+        self._ruleset = None
+
+    @property
+    def ruleset(self) -> str:
+        """Version of everything that decides a result; cached results are keyed by it."""
+        if self._ruleset is None:
+            self._ruleset = f"{RULESET_VERSION}-" + code_fingerprint(
+                self.engine.fingerprint(), self.valid_bank_codes, self.mock_bank_api_check
+            )
+        return self._ruleset
 
     async def mock_bank_api_check(self, account: str, bank_code: str) -> Dict:
         """Simulates real bank API checks with probabilistic errors"""
         # 5% chance of closed account
-        if random.random() < 0.05:  
+        if random.random() < 0.05:
             return {"valid": False, "code": "AC04", "message": SEPA_ERROR_CODES["AC04"]}
         # 2% chance regulatory block
         elif account.startswith("X") and random.random() < 0.02:
@@ -131,27 +156,34 @@ class AccountValidator:
             return {"valid": False, "code": "AC06", "message": SEPA_ERROR_CODES["AC06"]}
         return {"valid": True}
 
-    async def validate(self, account_data: Dict) -> Dict:
+    async def validate(self, account_data: Dict, fail_fast: bool = False) -> Dict:
         """
         Validate account details
-        
+
         Args:
             account_data: Dictionary containing account details
                 - account_number: str
                 - bank_code: str
                 - amount: float
                 - reference_id: str
-                
+              or a record already produced by app.normalize (has account_kind)
+            fail_fast: stop at the first failing rule (for callers that only
+                need Valid/Invalid)
+
         Returns:
             Dict with validation results
         """
-        account = account_data.get('account_number', '').strip()
-        bank_code = account_data.get('bank_code', '')
-        amount = account_data.get('amount', 0)
-        reference_id = account_data.get('reference_id', '')
-        
+        normalized = 'account_kind' in account_data
+        ctx = account_data if normalized else normalize_record(account_data)
+        account = ctx['account_number']
+        bank_code = ctx['bank_code']
+        amount = ctx['amount']
+        reference_id = ctx['reference_id']
+        # Explicit None amount/reference_id checks read the values as sent
+        raw = ctx if normalized else account_data
+
         # Basic validation
-        if not account or not bank_code or amount is None or reference_id is None:
+        if not account or not bank_code or raw.get('amount', 0) is None or raw.get('reference_id', '') is None:
             return {
                 "status": "Invalid",
                 "errors": [
@@ -162,59 +194,17 @@ class AccountValidator:
                 ]
             }
 
-        # --- Per-bank custom validation ---
-        if bank_code in BANK_VALIDATORS:
-            is_valid = BANK_VALIDATORS[bank_code](account)
-            if not is_valid:
-                return {
-                    "status": "Invalid",
-                    "errors": [{
-                        "type": f"bank_{bank_code}_account_validation",
-                        "message": f"Account number failed validation for bank {bank_code}"
-                    }],
-                    "account_number": account,
-                    "bank_code": bank_code,
-                    "amount": amount,
-                    "reference_id": reference_id
-                }
-            # If valid, continue to other rules (amount, reference)
-
-        # Detailed validation
-        validation_errors = []
-        for rule in self.validation_rules:
-            # Each rule may require different args
-            if rule["name"] == "bank_code_validation":
-                if rule["rule"](account, bank_code):
-                    validation_errors.append({
-                        "type": rule["name"],
-                        "code": rule["code"],
-                        "message": rule["message"]
-                    })
-            elif rule["name"] == "amount_validation":
-                if rule["rule"](account, amount):
-                    validation_errors.append({
-                        "type": rule["name"],
-                        "code": rule["code"],
-                        "message": rule["message"]
-                    })
-            elif rule["name"] == "reference_id_validation":
-                if rule["rule"](account, amount, reference_id):
-                    validation_errors.append({
-                        "type": rule["name"],
-                        "code": rule["code"],
-                        "message": rule["message"]
-                    })
-            else:
-                if rule["rule"](account):
-                    validation_errors.append({
-                        "type": rule["name"],
-                        "code": rule["code"],
-                        "message": rule["message"]
-                    })
+        timed = METRICS.enabled if self.collect_timings is None else self.collect_timings
+        failed = self.engine.evaluate(ctx, fail_fast=fail_fast, stats=self.rule_stats if timed else None)
+        validation_errors = [rule.error(ctx) for rule in failed]
 
         # Simulate bank API checks for existing accounts
         if not validation_errors:  # Only check if format is valid
+            if timed:
+                start = perf_counter()
             bank_api_result = await self.mock_bank_api_check(account, bank_code)
+            if timed:
+                record_rule_timing(self.rule_stats, "bank_api_check", perf_counter() - start, not bank_api_result["valid"])
             if not bank_api_result["valid"]:
                 validation_errors.append({
                     "type": "bank_api_error",
@@ -229,4 +219,4 @@ class AccountValidator:
             "bank_code": bank_code,
             "amount": amount,
             "reference_id": reference_id
-        }
\ No newline at end of file
+        }
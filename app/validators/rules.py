@@ -0,0 +1,222 @@
+# app/validators/rules.py
+"""
+Rule registry and scheduling engine for account validation.
+
+Every Rule declares the fields it reads, a relative cost, when it applies,
+and which rules must have passed before it is worth running (requires). The
+engine runs applicable rules cheapest-and-most-rejecting first, skips rules
+that can no longer apply, can stop at the first failure (fail_fast), and
+re-ranks rules from the failure rates it observes at runtime. One engine is shared by every validator and
+thread: counters and the schedule only change under the engine's lock, and
+each evaluation runs against the schedule it started with.
+"""
+import hashlib
+import threading
+import types
+from time import perf_counter
+from typing import Dict, List
+
+
+class Rule:
+    __slots__ = ("name", "code", "message", "check", "inputs", "cost", "requires", "applies", "index")
+
+    def __init__(self, name, code, message, check, inputs=("account_number",), cost=1.0,
+                 requires=(), applies=None):
+        self.name = name
+        self.code = code
+        self.message = message  # str, or callable(ctx) -> str
+        self.check = check  # callable(ctx) -> True when the record FAILS the rule
+        self.inputs = tuple(inputs)
+        self.cost = float(cost)
+        self.requires = frozenset(requires)
+        self.applies = applies  # callable(ctx) -> bool, None means always
+        self.index = None
+
+    def error(self, ctx: Dict) -> Dict:
+        message = self.message(ctx) if callable(self.message) else self.message
+        return {"type": self.name, "code": self.code, "message": message}
+
+    def describe(self) -> Dict:
+        return {
+            "name": self.name,
+            "code": self.code,
+            "inputs": list(self.inputs),
+            "cost": self.cost,
+            "requires": sorted(self.requires),
+        }
+
+
+def record_rule_timing(stats: Dict, name: str, seconds: float, failed: bool):
+    """Accumulate [evaluations, seconds, failures] for one rule evaluation."""
+    entry = stats.get(name)
+    if entry is None:
+        entry = stats[name] = [0, 0.0, 0]
+    entry[0] += 1
+    entry[1] += seconds
+    entry[2] += bool(failed)
+
+
+def _digest_value(h, value, seen):
+    """Feed a callable's code, or a registry's contents, into the hash `h`."""
+    if isinstance(value, types.FunctionType):
+        if id(value) in seen:
+            return
+        seen.add(id(value))
+        _digest_code(h, value.__code__, value.__globals__, seen)
+        for cell in value.__closure__ or ():
+            _digest_value(h, cell.cell_contents, seen)
+    elif isinstance(value, types.MethodType):
+        _digest_value(h, value.__func__, seen)
+    elif isinstance(value, dict):
+        for key in sorted(value, key=repr):
+            h.update(repr(key).encode())
+            _digest_value(h, value[key], seen)
+    elif isinstance(value, (set, frozenset)):
+        h.update(repr(sorted(value, key=repr)).encode())
+    elif isinstance(value, (list, tuple, str, int, float, bool, type(None))):
+        h.update(repr(value).encode())
+
+
+def _digest_code(h, code, globals_, seen):
+    h.update(code.co_code)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _digest_code(h, const, globals_, seen)
+        else:
+            h.update(repr(const).encode())
+    # Helpers and registries the code looks up (luhn_ok, BANK_VALIDATORS, ...)
+    for name in code.co_names:
+        h.update(name.encode())
+        if name in globals_:
+            _digest_value(h, globals_[name], seen)
+
+
+def code_fingerprint(*values) -> str:
+    """Hex digest of callables (and the module globals they use) or plain data."""
+    h = hashlib.blake2b(digest_size=16)
+    seen = set()
+    for value in values:
+        _digest_value(h, value, seen)
+    return h.hexdigest()
+
+
+class RuleEngine:
+    def __init__(self, rules=(), reorder_every: int = 1000):
+        self.rules: List[Rule] = []
+        self.by_name: Dict[str, Rule] = {}
+        self.evaluations: Dict[str, int] = {}
+        self.failures: Dict[str, int] = {}
+        self.reorder_every = reorder_every
+        self._since_reorder = 0
+        self._order: List[Rule] = []
+        self._lock = threading.Lock()
+        for rule in rules:
+            self.register(rule)
+
+    def register(self, rule: Rule) -> Rule:
+        with self._lock:
+            if rule.name in self.by_name:
+                raise ValueError(f"Rule '{rule.name}' is already registered")
+            unknown = rule.requires - set(self.by_name)
+            if unknown:
+                raise ValueError(f"Rule '{rule.name}' refers to unregistered rules: {sorted(unknown)}")
+            rule.index = len(self.rules)
+            self.rules.append(rule)
+            self.by_name[rule.name] = rule
+            self.evaluations[rule.name] = 0
+            self.failures[rule.name] = 0
+            self._reorder()
+        return rule
+
+    def rejection_rate(self, name: str) -> float:
+        # Laplace-smoothed so unseen rules start at 0.5 and are ranked by cost alone
+        return (self.failures[name] + 1) / (self.evaluations[name] + 2)
+
+    def _score(self, rule: Rule) -> float:
+        # Expected cost paid per rejection: cheap rules that reject often go first
+        return rule.cost / self.rejection_rate(rule.name)
+
+    def _reorder(self):
+        # Caller holds self._lock; builds a new list so running evaluations keep theirs
+        ranked = sorted(self.rules, key=lambda r: (self._score(r), r.index))
+        order, placed = [], set()
+
+        def place(rule):
+            if rule.name in placed:
+                return
+            placed.add(rule.name)
+            for required in sorted(rule.requires):
+                place(self.by_name[required])
+            order.append(rule)
+
+        for rule in ranked:
+            place(rule)
+        self._order = order
+        self._since_reorder = 0
+
+    @property
+    def order(self) -> List[str]:
+        return [rule.name for rule in self._order]
+
+    def evaluate(self, ctx: Dict, fail_fast: bool = False, stats: Dict = None) -> List[Rule]:
+        """
+        Run the applicable rules against one prepared record context.
+
+        Returns the failed rules, in registration order (or in run order when
+        fail_fast stops after the first failure). Pass `stats` to collect
+        per-rule timings.
+        """
+        failed, failed_names, ran = [], set(), []
+        for rule in self._order:  # a snapshot: _reorder swaps in a new list
+            if rule.applies is not None and not rule.applies(ctx):
+                continue
+            if rule.requires and not rule.requires.isdisjoint(failed_names):
+                continue
+            if stats is not None:
+                start = perf_counter()
+                bad = rule.check(ctx)
+                record_rule_timing(stats, rule.name, perf_counter() - start, bad)
+            else:
+                bad = rule.check(ctx)
+            ran.append(rule.name)
+            if bad:
+                failed.append(rule)
+                failed_names.add(rule.name)
+                if fail_fast:
+                    break
+        with self._lock:
+            for name in ran:
+                self.evaluations[name] += 1
+            for name in failed_names:
+                self.failures[name] += 1
+            self._since_reorder += 1
+            if self._since_reorder >= self.reorder_every:
+                self._reorder()
+        if not fail_fast:
+            failed.sort(key=lambda r: r.index)
+        return failed
+
+    def fingerprint(self) -> str:
+        """
+        Changes whenever a rule is added, removed or redeclared, or the code
+        behind its checks changes (including helpers and registries such as
+        the bank code set). Scheduling order does not affect it.
+        """
+        parts = []
+        for rule in self.rules:
+            parts.append(rule.describe())
+            parts.extend([rule.check, rule.applies, rule.message])
+        return code_fingerprint(*parts)
+
+    def stats(self) -> Dict:
+        """Current schedule and observed selectivity, in run order."""
+        with self._lock:
+            return {
+                rule.name: {
+                    "cost": rule.cost,
+                    "evaluations": self.evaluations[rule.name],
+                    "failures": self.failures[rule.name],
+                    "rejection_rate": round(self.rejection_rate(rule.name), 4),
+                }
+                for rule in self._order
+            }
@@ -0,0 +1,69 @@
+# app/xlsx_reader.py
+"""
+Streaming reader for Excel (.xlsx) submissions.
+
+Rows come from openpyxl's read-only mode, which parses the sheet XML as it
+goes instead of building every cell in memory (pd.read_excel loads the whole
+sheet). The first row is the header. Headers like "Account Number" are
+matched to the canonical column names, and cells are read as text, like
+every other reader. Memory is the chunk size plus the workbook's
+shared-strings table, and openpyxl keeps an emptied element per row it
+has read (~90 bytes/row). Sheets without a <dimension> element (some
+exporters leave it out) are parsed once more up front to size them.
+"""
+import datetime
+import re
+from typing import Dict, Iterator, List
+
+from openpyxl import load_workbook
+
+
+def normalize_header(name) -> str:
+    """'Account Number ' -> 'account_number'."""
+    return re.sub(r'[\s\-]+', '_', str(name if name is not None else '').strip().lower())
+
+
+def cell_text(value):
+    """A cell as the text a CSV export would hold (None stays None)."""
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        # Numeric cells come back as floats; an account number 1234567890.0 is "1234567890"
+        return str(int(value))
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _open(source):
+    # data_only: formulas yield their cached values, not the formula text
+    return load_workbook(source, read_only=True, data_only=True)
+
+
+def xlsx_header(source) -> List[str]:
+    """Normalized header of the first sheet; reads only the first row."""
+    workbook = _open(source)
+    try:
+        first = next(workbook.worksheets[0].iter_rows(max_row=1, values_only=True), ())
+        return [normalize_header(name) for name in first]
+    finally:
+        workbook.close()
+
+
+def iter_xlsx_records(source, columns: List[str]) -> Iterator[Dict]:
+    """Yield {column: text} for every non-empty data row of the first sheet, keeping only `columns`."""
+    workbook = _open(source)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [normalize_header(name) for name in next(rows, ())]
+        positions = [(col, header.index(col)) for col in columns if col in header]
+        missing = [col for col in columns if col not in header]
+        for row in rows:
+            if not any(cell is not None for cell in row):
+                continue  # blank rows (formatting left below the data)
+            record = {col: cell_text(row[i]) if i < len(row) else None for col, i in positions}
+            for col in missing:
+                record[col] = None
+            yield record
+    finally:
+        workbook.close()
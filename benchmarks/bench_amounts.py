@@ -0,0 +1,61 @@
+# benchmarks/bench_amounts.py
+"""
+Compare per-row amount conversion with the vectorized fixed-point path.
+
+float() is the old, inexact baseline; Decimal is the exact per-row equivalent.
+
+    python benchmarks/bench_amounts.py --rows 1000000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from app.amounts import parse_amount, parse_amount_column
+
+
+def per_row_float(series):
+    out = []
+    for value in series:
+        try:
+            amount = float(value)
+        except Exception:
+            amount = 0.0
+        out.append(0 < amount <= 10000000)
+    return out
+
+
+def per_row_decimal(series):
+    return [parse_amount(value) for value in series]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+    amounts = pd.Series([f"{random.uniform(-10, 2e7):.2f}" for _ in range(args.rows)])
+
+    start = time.perf_counter()
+    per_row_float(amounts)
+    float_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    per_row_decimal(amounts)
+    decimal_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parse_amount_column(amounts)
+    fixed_seconds = time.perf_counter() - start
+
+    print(f"rows: {args.rows}")
+    print(f"per-row float():        {float_seconds:.3f}s ({args.rows / float_seconds:,.0f} rows/s)")
+    print(f"per-row Decimal:        {decimal_seconds:.3f}s ({args.rows / decimal_seconds:,.0f} rows/s)")
+    print(f"vectorized fixed-point: {fixed_seconds:.3f}s ({args.rows / fixed_seconds:,.0f} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
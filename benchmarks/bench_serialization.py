@@ -0,0 +1,79 @@
+# benchmarks/bench_serialization.py
+"""
+Per-record encode/decode cost of the JSON paths: /validate bodies, results and token segments.
+
+Every available backend is timed (the standard library always, orjson and
+msgspec when installed); pydantic is the old /validate request path.
+
+    python benchmarks/bench_serialization.py --records 100000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+from app import serialization
+from app.records import AccountRecord
+
+
+class AccountData(BaseModel):
+    account_number: str
+    bank_code: str
+    amount: Decimal
+    reference_id: str
+
+
+def backends():
+    found = {}
+    for name in ('json', 'orjson', 'msgspec'):
+        try:
+            found[name] = serialization._select(name)[1:]
+        except ImportError:
+            pass
+    return found
+
+
+def per_record(fn, items):
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - start) / len(items) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--records', type=int, default=100_000)
+    args = parser.parse_args()
+    n = args.records
+
+    bodies = [json.dumps({"account_number": f"{i:010d}", "bank_code": "044", "amount": "1250.50",
+                          "reference_id": f"TX-{i}"}).encode() for i in range(n)]
+    results = [{"status": "Invalid", "errors": [{"type": "luhn_checksum", "code": "AC01", "message": "Incorrect account number/IBAN format"}],
+                "account_number": f"{i:010d}", "bank_code": "044", "amount": "1250.50", "reference_id": f"TX-{i}"} for i in range(n)]
+    # One token segment: ~64 tokens (a 1000-row chunk over 16 segments)
+    segment = {f"ACC-{i:016x}": f"{i:010d}" for i in range(64)}
+    segments = [segment] * max(1, n // 100)
+
+    print(f"records: {n}  (microseconds per record; token segments hold 64 tokens)")
+    print(f"{'/validate body -> dict':36s} pydantic (old): {per_record(lambda b: AccountData.model_validate_json(b).model_dump(), bodies):7.2f}")
+    for name, (dumps, loads) in backends().items():
+        print(f"--- {name}")
+        print(f"{'  /validate body -> dict':36s} {per_record(lambda b: AccountRecord.from_dict(loads(b)).to_dict(), bodies):7.2f}")
+        print(f"{'  result encode':36s} {per_record(dumps, results):7.2f}")
+        print(f"{'  token segment encode':36s} {per_record(dumps, segments):7.2f}")
+        encoded = dumps(segment)
+        print(f"{'  token segment decode':36s} {per_record(loads, [encoded] * len(segments)):7.2f}")
+    print("--- baseline")
+    print(f"{'  result encode, FastAPI default':36s} {per_record(lambda r: json.dumps(jsonable_encoder(r)).encode(), results):7.2f}")
+    print(f"{'  segment encode, json.dumps().encode':36s} {per_record(lambda s: json.dumps(s).encode(), segments):7.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# benchmarks/bench_startup.py
+"""
+Measure CLI cold start: a fresh interpreter up to the point where the
+command has parsed its arguments.
+
+Each command runs --repeat times in a new process; the best time is kept,
+since slower runs mostly measure noise from other processes. Exits 1 if a
+CLI command is slower than --target-ms.
+
+    python benchmarks/bench_startup.py --repeat 10 --target-ms 150
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (label, argv after the interpreter, held to the target)
+COMMANDS = [
+    ("interpreter only", ["-c", "pass"], False),
+    ("import bulk_validator.core", ["-c", "import bulk_validator.core"], True),
+    ("batch_ingest.py --help", ["batch_ingest.py", "--help"], True),
+    ("run.py --help", ["run.py", "--help"], True),
+    ("run.py batch --help", ["run.py", "batch", "--help"], True),
+    # For reference: what every CLI run used to pay before argument parsing
+    ("import app.main (web app)", ["-c", "import app.main"], False),
+    ("import bulk_validator.core.ingest", ["-c", "import bulk_validator.core.ingest"], False),
+]
+
+
+def cold_start(argv, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + argv, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--target-ms', type=float, default=150.0)
+    args = parser.parse_args()
+
+    slow = []
+    for label, argv, held in COMMANDS:
+        ms = cold_start(argv, args.repeat) * 1000
+        flag = ""
+        if held:
+            flag = "ok" if ms <= args.target_ms else f"over {args.target_ms:.0f} ms"
+            if ms > args.target_ms:
+                slow.append(label)
+        print(f"{label:36s} {ms:7.1f} ms  {flag}")
+    if slow:
+        print(f"Slower than {args.target_ms:.0f} ms: {', '.join(slow)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,2 @@
+# bulk_validator/__init__.py
+"""Bulk Validator library code; the web app lives in `app`."""
@@ -0,0 +1,51 @@
+# bulk_validator/core/__init__.py
+"""
+Validation, ingest, tokenization and reporting, without the web app.
+
+Names are loaded on first access, so `import bulk_validator.core` costs
+nothing: pandas, the validators and cryptography arrive with the first
+name that needs them. Nothing here imports FastAPI.
+
+    from bulk_validator.core import READERS, run_batch
+    aggregator, chunks, _, _ = run_batch(READERS['csv']('accounts.csv'), 'csv')
+"""
+import importlib
+
+_EXPORTS = {
+    # Validation
+    'AccountValidator': 'app.validators.account_validator',
+    'validate_accounts_parallel': 'bulk_validator.core.chunks',
+    'prepare_chunk': 'bulk_validator.core.chunks',
+    'validate_chunk': 'bulk_validator.core.chunks',
+    'summarize_chunk': 'bulk_validator.core.chunks',
+    'write_chunk': 'bulk_validator.core.chunks',
+    # Ingest
+    'preflight': 'app.schema',
+    'READERS': 'bulk_validator.core.ingest',
+    'run_batch': 'bulk_validator.core.ingest',
+    'run_scan': 'bulk_validator.core.ingest',
+    'main': 'bulk_validator.core.cli',
+    # Tokenization
+    'tokenize_value': 'bulk_validator.core.chunks',
+    'write_batch': 'app.token_vault',
+    'lookup_token': 'app.token_vault',
+    # Reporting
+    'RunAggregator': 'app.reporting',
+    'write_run_report': 'bulk_validator.core.ingest',
+    'render_reports': 'app.summary_reports',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
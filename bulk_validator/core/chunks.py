@@ -0,0 +1,236 @@
+# bulk_validator/core/chunks.py
+"""
+Chunk stages shared by the API uploads and the batch CLI.
+
+validate_and_output() (app.main) runs these in order for one chunk; the
+batch pipeline (bulk_validator.core.ingest) runs them as separate stages
+so consecutive chunks overlap. Each stage takes and returns the chunk
+dict; a chunk with a 'result' set (an error) passes through the remaining
+stages untouched. An error meant for an HTTP caller also sets
+'status_code'. Nothing here imports the web app.
+"""
+import asyncio
+import hashlib
+import logging
+from collections import Counter
+
+from app import fingerprints
+from app.abort import ABORT_CHECK_ROWS, check_policies
+from app.metrics import METRICS
+from app.normalize import normalize_records
+from app.reporting import error_breakdown_by_field, error_code_counts, per_bank_stats, write_outputs
+from app.schema import REQUIRED_COLUMNS
+from app.validators.account_validator import AccountValidator, RULES
+
+logger = logging.getLogger(__name__)
+
+TOKENIZATION_NOTICE = "Sensitive fields (account_number, reference_id) have been tokenized in all outputs. Real values are never logged or exposed via API."
+
+
+def tokenize_value(value, prefix):
+    # Simple deterministic tokenization using hash (not reversible, but unique per value)
+    h = hashlib.sha256(str(value).encode()).hexdigest()[:8]
+    return f"{prefix}-{h}"
+
+
+# === Parallel Validation Logic ===
+async def validate_accounts_parallel(df, validator=None, records=None, use_cache=None):
+    """Process accounts concurrently with 8 workers"""
+    validator = validator or AccountValidator()
+    use_cache = fingerprints.FINGERPRINT_CACHE if use_cache is None else use_cache
+
+    async def process_row(record):
+        try:
+            return await validator.validate(record)
+        except Exception as e:
+            logger.error(f"Validation error: {str(e)}")
+            return {
+                "status": "Invalid",
+                "errors": [{"type": "processing_error", "code": "PE01", "message": str(e)}],
+                "account_number": record['account_number'],
+                "bank_code": record['bank_code'],
+                "amount": record['amount'],
+                "reference_id": record['reference_id']
+            }
+
+    # Normalize the whole chunk once; rules only read the precomputed fields
+    if records is None:
+        with METRICS.stage("normalize", rows=len(df)):
+            records = normalize_records(df)
+
+    # Rows already validated under this rule set (e.g. in a resubmitted file) reuse their result
+    cached = {}
+    if use_cache:
+        with METRICS.stage("fingerprint_lookup", rows=len(records)):
+            hashes = fingerprints.row_hashes(records)
+            cached = fingerprints.lookup(hashes, validator.ruleset)
+    todo = [i for i, row_hash in enumerate(hashes) if row_hash not in cached] if cached else range(len(records))
+
+    # A validator reused across calls (abort slices, profiled uploads) keeps
+    # cumulative rule_stats; only this call's share goes to the metrics
+    before = {rule: tuple(counts) for rule, counts in validator.rule_stats.items()}
+
+    # Process in parallel
+    tasks = [process_row(records[i]) for i in todo]
+    METRICS.set_gauge("bv_queue_depth", len(tasks), queue="validate_inflight")
+    with METRICS.stage("validate", rows=len(tasks)):
+        fresh = await asyncio.gather(*tasks)
+    METRICS.set_gauge("bv_queue_depth", 0, queue="validate_inflight")
+    if use_cache:
+        fingerprints.store([hashes[i] for i in todo], fresh, validator.ruleset)
+        METRICS.inc("bv_fingerprint_cache_total", len(records) - len(tasks), result="hit")
+        METRICS.inc("bv_fingerprint_cache_total", len(tasks), result="miss")
+    if cached:
+        results = [None] * len(records)
+        for i, result in zip(todo, fresh):
+            results[i] = result
+        for i, row_hash in enumerate(hashes):
+            if results[i] is None:
+                results[i] = {**cached[row_hash], "cached": True}
+    else:
+        results = fresh
+    # Fold per-rule timings; bank validators and the bank API mock make up the bank lookup stage
+    stats = {
+        rule: [count - base for count, base in zip(counts, before.get(rule, (0, 0.0, 0)))]
+        for rule, counts in validator.rule_stats.items()
+    }
+    METRICS.record_rules(stats)
+    for name, schedule in RULES.stats().items():
+        METRICS.set_gauge("bv_rule_rejection_rate", schedule["rejection_rate"], rule=name)
+    bank_lookups = [stats[name] for name in ("bank_account_format", "bank_api_check") if name in stats]
+    if bank_lookups:
+        METRICS.record_stage(
+            "bank_lookup",
+            sum(s[1] for s in bank_lookups),
+            rows=sum(s[0] for s in bank_lookups)
+        )
+    return results
+
+
+# === Chunk stages ===
+def prepare_chunk(records, source_type="csv"):
+    """Build the chunk frame, tokenize it, append its tokens to the vault and normalize it."""
+    import pandas as pd
+    import uuid
+    # The vault pulls in cryptography; runs that never tokenize (--scan) skip it
+    from app import token_vault
+    logger.debug(f"Validating {len(records)} records from {source_type}")
+    job_id = uuid.uuid4().hex
+    chunk = {"job_id": job_id, "base_filename": f"accounts_{job_id}", "source_type": source_type}
+    with METRICS.stage("parse"):
+        df = pd.DataFrame(records)
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing_columns:
+        logger.error(f"Missing required columns: {', '.join(missing_columns)}")
+        chunk["result"] = {"detail": f"Input must contain these columns: {', '.join(REQUIRED_COLUMNS)}", "missing_columns": missing_columns}
+        return chunk
+    # Tokenize sensitive columns
+    with METRICS.stage("tokenize", rows=len(df)):
+        df['account_token'] = df['account_number'].apply(lambda x: tokenize_value(x, 'ACC'))
+        df['reference_token'] = df['reference_id'].apply(lambda x: tokenize_value(x, 'REF'))
+        # Mapping for this chunk only (not exposed); released once it is in the vault
+        account_tokens = dict(zip(df['account_token'], df['account_number']))
+        reference_tokens = dict(zip(df['reference_token'], df['reference_id']))
+    # Append this chunk's tokens to the encrypted vault
+    with METRICS.stage("vault_write", rows=len(df)):
+        token_vault.write_batch(account_tokens, reference_tokens)
+    del account_tokens, reference_tokens
+    with METRICS.stage("normalize", rows=len(df)):
+        chunk["normalized"] = normalize_records(df)
+    chunk["df"] = df
+    return chunk
+
+
+async def validate_until_abort(df, records, policies, validator=None):
+    """
+    Validate ABORT_CHECK_ROWS rows at a time, checking the abort policies after
+    each slice. Returns (results for the rows validated, trip details or None).
+    """
+    validator = validator or AccountValidator()
+    results, invalid, error_codes = [], 0, Counter()
+    for start in range(0, len(records), ABORT_CHECK_ROWS):
+        stop = start + ABORT_CHECK_ROWS
+        part = await validate_accounts_parallel(df.iloc[start:stop], validator=validator, records=records[start:stop])
+        results.extend(part)
+        for result in part:
+            if result['status'] != 'Valid':
+                invalid += 1
+                error_codes.update({err.get('code', 'unknown') for err in result['errors']})
+        tripped = check_policies(policies, len(results), invalid, error_codes)
+        if tripped is not None:
+            return results, tripped
+    return results, None
+
+
+async def validate_chunk(chunk, validator=None, policies=None):
+    """Validate the chunk frame in place; with abort `policies` it may stop early (chunk['aborted'])."""
+    if "result" in chunk:
+        return chunk
+    df = chunk["df"]
+    try:
+        if policies:
+            results, tripped = await validate_until_abort(df, chunk.pop("normalized"), policies, validator=validator)
+            if tripped is not None:
+                # Only the rows validated before the trip are summarized
+                df = chunk["df"] = df.iloc[:len(results)].copy()
+                chunk["aborted"] = tripped
+        else:
+            results = await validate_accounts_parallel(df, validator=validator, records=chunk.pop("normalized"))
+    except Exception as e:
+        logger.error(f"Parallel processing error: {str(e)}")
+        chunk["result"] = {"detail": "Validation system error"}
+        chunk["status_code"] = 500
+        return chunk
+    df['status'] = [result['status'] for result in results]
+    df['errors'] = [result['errors'] for result in results]
+    chunk["reused"] = sum(1 for result in results if result.get('cached'))
+    return chunk
+
+
+def summarize_chunk(chunk):
+    """Split the validated chunk into valid/invalid frames and build its summary."""
+    if "result" in chunk:
+        return chunk
+    df = chunk.pop("df")
+    output_cols = ['account_token', 'bank_code', 'amount', 'reference_token', 'status', 'errors']
+    valid_df = df[df['status'] == 'Valid'][output_cols].copy()
+    invalid_df = df[df['status'] == 'Invalid'][output_cols].copy()
+    total_accounts = len(df)
+    valid_accounts = len(valid_df)
+    invalid_accounts = len(invalid_df)
+    logger.info(f"Validation completed for {total_accounts} accounts")
+    logger.info(f"Valid accounts: {valid_accounts}")
+    logger.info(f"Invalid accounts: {invalid_accounts}")
+    with METRICS.stage("aggregate", rows=total_accounts):
+        error_breakdown = error_breakdown_by_field(invalid_df)
+        error_codes = error_code_counts(invalid_df)
+        per_bank = per_bank_stats(df)
+    chunk["summary"] = {
+        "total_accounts": total_accounts,
+        "valid_accounts": valid_accounts,
+        "invalid_accounts": invalid_accounts,
+        "invalid_error_types": error_breakdown,
+        "invalid_error_codes": error_codes,
+        "per_bank_stats": per_bank,
+        "reused_results": chunk.pop("reused", 0)
+    }
+    chunk["valid_df"] = valid_df
+    chunk["invalid_df"] = invalid_df
+    return chunk
+
+
+def write_chunk(chunk, output_formats=['csv', 'json', 'xlsx']):
+    """Write the chunk's output files; sets chunk['result'] to the API response body."""
+    if "result" in chunk:
+        return chunk
+    summary = chunk["summary"]
+    with METRICS.stage("write_outputs", rows=summary["total_accounts"]):
+        output_paths = write_outputs(chunk.pop("valid_df"), chunk.pop("invalid_df"), summary, chunk["base_filename"], formats=output_formats)
+    METRICS.inc("bv_rows_total", summary["valid_accounts"], status="valid")
+    METRICS.inc("bv_rows_total", summary["invalid_accounts"], status="invalid")
+    chunk["result"] = {
+        "validation_summary": summary,
+        "files": output_paths,
+        "tokenization_notice": TOKENIZATION_NOTICE
+    }
+    return chunk
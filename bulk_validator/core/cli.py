@@ -0,0 +1,57 @@
+# bulk_validator/core/cli.py
+"""
+Batch ingest command line.
+
+Only argparse and a few config modules are imported up front, so --help
+and argument errors answer at interpreter speed. pandas, the validators
+and the token vault (cryptography) are loaded with
+bulk_validator.core.ingest once there is a file to process.
+
+    python -m bulk_validator.core.cli accounts.csv --type csv
+"""
+import argparse
+import sys
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from app.abort import ABORT_POLICIES
+from app.partitioning import DEFAULT_MEMORY_ROWS
+from app.sampling import SCAN_SAMPLE_ROWS
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Bulk Validator Batch Ingest')
+    parser.add_argument('file', help='Input file path (CSV, JSON, XML or XLSX; CSV/JSON/XML may be gzip, zstd, bz2 or zip compressed)')
+    parser.add_argument('--type', choices=['csv', 'json', 'xml', 'xlsx'], required=True)
+    parser.add_argument('--notify', help='Notification email address (overrides EMAIL_NOTIFY_TO env var)', default=None)
+    parser.add_argument('--workers', type=int, default=1, help='Validation worker threads (default: 1)')
+    parser.add_argument('--queue-depth', type=int, default=2, help='Chunks buffered between pipeline stages (default: 2)')
+    parser.add_argument('--chunk-rows', type=int, default=None, help='Fixed rows per chunk (default: adapt from 1000 on observed throughput)')
+    parser.add_argument('--chunk-bytes', type=int, default=None, help='Memory ceiling per chunk in bytes (default: CHUNK_MAX_BYTES or 64MB)')
+    parser.add_argument('--target-rows-per-sec', type=float, default=None, help='Stop growing chunks once this throughput is reached')
+    parser.add_argument('--no-metrics', action='store_true', help='Disable per-stage instrumentation for this run')
+    parser.add_argument('--profile', action='store_true', help='Sample the run and write flamegraph/speedscope output next to the run report')
+    parser.add_argument('--no-fingerprint-cache', action='store_true', help='Revalidate every row instead of reusing results for unchanged rows')
+    parser.add_argument('--partition-by-bank', action='store_true', help='Write results as one partition per bank and status instead of per-chunk files')
+    parser.add_argument('--partition-mode', choices=['sorted', 'append'], default='sorted', help='sorted: sorted and deduplicated (external merge sort); append: input order (default: sorted)')
+    parser.add_argument('--partition-format', choices=['csv', 'parquet'], default='csv', help='Partition file format; parquet needs pyarrow (default: csv)')
+    parser.add_argument('--partition-memory-rows', type=int, default=DEFAULT_MEMORY_ROWS, help=f'Rows buffered before sorted runs spill to disk (default: {DEFAULT_MEMORY_ROWS})')
+    parser.add_argument('--profile-interval', type=float, default=5.0, help='Profiler sampling interval in milliseconds (default: 5)')
+    parser.add_argument('--abort-on', default=ABORT_POLICIES, help='Abort policies, e.g. "invalid>90%%@1000,BE04>50%%" (default: ABORT_POLICIES env var)')
+    parser.add_argument('--scan', action='store_true', help='Only validate a random sample and estimate invalid rates with confidence intervals')
+    parser.add_argument('--scan-rows', type=int, default=SCAN_SAMPLE_ROWS, help=f'Sample size for --scan (default: {SCAN_SAMPLE_ROWS})')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for --scan, for a reproducible sample')
+    return parser
+
+
+def main(argv=None) -> int:
+    """Parse `argv` (default: sys.argv[1:]) and run the ingest in this process. Returns the exit code."""
+    args = build_parser().parse_args(argv)
+    from bulk_validator.core import ingest
+    ingest.run(args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
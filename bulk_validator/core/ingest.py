@@ -0,0 +1,536 @@
+# bulk_validator/core/ingest.py
+"""
+Batch ingest: stream a CSV, JSON, XML or XLSX file through the chunk
+pipeline in bounded memory and write per-chunk outputs, a run report and a
+summary report. The command line (argument parsing) is
+bulk_validator.core.cli, which imports this module only once it has work
+to do.
+"""
+import os
+from dotenv import load_dotenv
+load_dotenv()
+import sys
+import csv
+import random
+import shutil
+import pandas as pd
+import ijson
+import xml.etree.ElementTree as ET
+from bulk_validator.core.chunks import prepare_chunk, validate_chunk, summarize_chunk, write_chunk, validate_accounts_parallel
+from app.normalize import normalize_records
+from app.sampling import SCAN_SAMPLE_ROWS, SCAN_SEEK_BYTES, csv_offset_sample, estimate, reservoir_sample
+from app.schema import REQUIRED_COLUMNS, COLUMN_DTYPES, SchemaError, preflight
+from app.metrics import METRICS
+from app.validators.account_validator import RULES
+from app.profiling import SamplingProfiler, format_rule_stats
+from app.reporting import RunAggregator, run_output_files
+from app.abort import parse_policies, describe as describe_abort
+from app.partitioning import BankPartitionWriter
+from app.pipeline import Pipeline, Stage
+from app.chunking import ChunkSizer, DEFAULT_CHUNK_ROWS
+from app.compression import detect_compression, open_input
+from app import job_store, fingerprints
+from app.email_notify import NOTIFIER, smtp_settings
+from app.summary_reports import REPORTS
+from app.validators.account_validator import AccountValidator
+import asyncio
+import json
+import logging
+import time
+import uuid
+
+logger = logging.getLogger()  # Get the root logger
+
+def setup_logging():
+    # Ensure the output directory exists
+    os.makedirs('output', exist_ok=True)
+
+    # Configure logging
+    log_file_path = os.path.abspath('output/batch_processing.log')
+    logger.setLevel(logging.INFO)
+
+    # Create a file handler
+    file_handler = logging.FileHandler(log_file_path)
+    file_handler.setLevel(logging.INFO)
+
+    # Create a console handler (optional, for debugging)
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+
+    # Define a log format
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    file_handler.setFormatter(formatter)
+    console_handler.setFormatter(formatter)
+
+    # Add handlers to the logger
+    logger.addHandler(file_handler)
+    logger.addHandler(console_handler)
+
+    # Test logging
+    logger.info("Logging initialized successfully.")
+
+# Starting chunk size; ChunkSizer adapts it per run unless --chunk-rows is given
+CHUNK_SIZE = DEFAULT_CHUNK_ROWS
+
+# Readers take plain or compressed files (gzip, zstd, bz2, single-member zip);
+# open_input() inflates on a background thread while the parser runs
+
+def process_csv(path, sizer=None, columns=None):
+    sizer = sizer or ChunkSizer(rows=CHUNK_SIZE)
+    # With `columns` (from preflight) every other column is skipped by the parser
+    dtype = {col: COLUMN_DTYPES.get(col, str) for col in columns} if columns else str
+    with open_input(path) as f, pd.read_csv(f, usecols=columns, dtype=dtype, iterator=True) as reader:
+        while True:
+            try:
+                chunk = reader.get_chunk(sizer.next_rows())
+            except StopIteration:
+                return
+            yield chunk.to_dict(orient='records')
+
+def process_json(path, sizer=None, columns=None):
+    sizer = sizer or ChunkSizer(rows=CHUNK_SIZE)
+    with open_input(path) as f:
+        parser = ijson.items(f, 'item')
+        batch = []
+        for rec in parser:
+            if columns:
+                rec = {col: rec.get(col) for col in columns}
+            batch.append(rec)
+            if len(batch) >= sizer.next_rows():
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+def process_xml(path, sizer=None, columns=None):
+    sizer = sizer or ChunkSizer(rows=CHUNK_SIZE)
+    columns = columns or REQUIRED_COLUMNS
+    with open_input(path) as f:
+        batch = []
+        # Open elements, so each finished record can be dropped from its parent
+        # (clearing only the record would leave an empty child per row behind)
+        open_elems = []
+        for event, elem in ET.iterparse(f, events=("start", "end")):
+            if event == 'start':
+                open_elems.append(elem)
+                continue
+            open_elems.pop()
+            if elem.tag == 'record':
+                record = {col: elem.findtext(col, default='') for col in columns}
+                batch.append(record)
+                if len(batch) >= sizer.next_rows():
+                    yield batch
+                    batch = []
+                if open_elems:
+                    open_elems[-1].clear()
+                else:
+                    elem.clear()
+        if batch:
+            yield batch
+
+def process_xlsx(path, sizer=None, columns=None):
+    # Rows stream from openpyxl's read-only mode; the sheet is never loaded whole
+    from app.xlsx_reader import iter_xlsx_records
+    sizer = sizer or ChunkSizer(rows=CHUNK_SIZE)
+    batch = []
+    for record in iter_xlsx_records(path, columns or REQUIRED_COLUMNS):
+        batch.append(record)
+        if len(batch) >= sizer.next_rows():
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+READERS = {'csv': process_csv, 'json': process_json, 'xml': process_xml, 'xlsx': process_xlsx}
+
+def write_run_report(run_id, report):
+    """Write the machine-readable report for a CLI run next to its outputs."""
+    report_path = f"output/run_{run_id}_report.json"
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return report_path
+
+REPORT_FIELDS = ['chunk', 'records', 'valid', 'invalid', 'files']
+
+def run_scan(path, ext, columns=None, sample_rows=SCAN_SAMPLE_ROWS, seed=None):
+    """
+    Validate a uniform random sample of `path` and estimate its invalid rates.
+    Large CSVs are sampled by byte offset; everything else by reservoir over
+    the streaming reader. Nothing is written and no tokens reach the vault.
+    """
+    start = time.perf_counter()
+    rng = random.Random(seed)
+    # Byte offsets only mean something in an uncompressed file
+    if ext == 'csv' and os.path.getsize(path) > SCAN_SEEK_BYTES and detect_compression(path) is None:
+        sample = csv_offset_sample(path, sample_rows, rng, columns)
+        df, weights, estimated_rows = sample['df'], sample['weights'], sample['estimated_rows']
+        method, rejected = 'byte_offset', sample['rejected']
+    else:
+        records = (rec for chunk in READERS[ext](path, ChunkSizer(rows=10000), columns) for rec in chunk)
+        sampled, estimated_rows = reservoir_sample(records, sample_rows, rng)
+        df, weights, method, rejected = pd.DataFrame(sampled, columns=columns), None, 'reservoir', 0
+    sample_seconds = time.perf_counter() - start
+    results = asyncio.run(validate_accounts_parallel(df, records=normalize_records(df), use_cache=False))
+    banks = ['' if pd.isna(code) else str(code) for code in df['bank_code']]
+    report = estimate(banks, results, weights, estimated_rows)
+    report.update({
+        'file': path,
+        'method': method,
+        'rejected_lines': rejected,
+        'seed': seed,
+        'sample_seconds': round(sample_seconds, 3),
+        'elapsed_seconds': round(time.perf_counter() - start, 3),
+    })
+    return report
+
+def print_scan(report, top_banks=20):
+    def pct(r):
+        return f"{r['rate']:.2%} ({r['ci_low']:.2%} - {r['ci_high']:.2%})"
+    print(f"Scanned {report['sample_rows']} sampled rows ({report['method']}) in {report['elapsed_seconds']}s; "
+          f"~{report['estimated_rows']:,} rows in file")
+    print(f"Invalid: {pct(report['invalid'])} at {report['confidence']:.0%} confidence, "
+          f"~{report['estimated_invalid_rows']:,} rows")
+    if report['by_error_code']:
+        print("By error code:")
+        for code, r in sorted(report['by_error_code'].items(), key=lambda kv: -kv[1]['rate']):
+            print(f"  {code:<8} {pct(r)}")
+    banks = sorted(report['by_bank'].items(), key=lambda kv: -kv[1]['share']['rate'])
+    if banks:
+        print(f"By bank (top {min(top_banks, len(banks))} of {len(banks)} by share):")
+        for bank, r in banks[:top_banks]:
+            print(f"  {bank or '(none)':<12} share {r['share']['rate']:.2%}  invalid {pct(r['invalid'])}")
+
+# How long the CLI waits at exit for queued notification emails
+EMAIL_FLUSH_TIMEOUT = float(os.getenv('EMAIL_FLUSH_TIMEOUT', '300'))
+
+def notify(recipient, run_id, run_summary, artifact_paths):
+    """Queue the completion email; the zipped run artifact is built by the email worker."""
+    try:
+        smtp_settings()
+    except RuntimeError as e:
+        logger.warning(f"Notification to {recipient} skipped: {e}")
+        print(f"Notification skipped: {e}")
+        return None
+    print(f"Sending notification to {recipient} ...")
+    return NOTIFIER.submit(
+        recipient=recipient,
+        subject="Bulk Validation Complete",
+        body=(
+            "Dear User,\n\n"
+            "Your batch validation request has been completed successfully. "
+            f"{run_summary['total_accounts']} records were validated: {run_summary['valid_accounts']} valid, "
+            f"{run_summary['invalid_accounts']} invalid. "
+            "Please find the results attached to this email.\n\n"
+            "Best regards,\nBulk Validator System"
+        ),
+        artifact_paths=artifact_paths,
+        artifact_zip=f"output/run_{run_id}_artifact.zip",
+        run_id=run_id,
+    )
+
+def wait_for_reports(rendering):
+    """Wait for the background summary report render before the CLI exits."""
+    try:
+        paths = rendering.result()
+    except Exception as e:
+        logger.warning(f"Summary report not rendered: {e}")
+        print(f"Summary report not rendered: {e}")
+        return None
+    print(f"Summary report: {paths['html']} / {paths['pdf']}")
+    return paths
+
+def timed_chunks(batcher):
+    """Yield chunks from `batcher`, recording the time spent parsing each one."""
+    while True:
+        parse_start = time.perf_counter()
+        records = next(batcher, None)
+        if records is None:
+            return
+        METRICS.record_stage("parse", time.perf_counter() - parse_start, rows=len(records))
+        yield records
+
+def build_pipeline(ext, aggregator, output_formats=('csv', 'json', 'xlsx'), workers=1, depth=2, partitioner=None):
+    """
+    reader -> prepare (tokenize, vault, normalize) -> validate -> aggregate -> write.
+
+    Only validation may run on several workers; the other stages keep chunk
+    order (the token vault and report are appended in input order). With a
+    `partitioner` (BankPartitionWriter) the write stage also routes every row
+    to its bank's partition. If the aggregator has abort policies and one
+    trips, the pipeline is cancelled: chunks ahead of the tripping chunk are
+    still written, the tripping chunk and everything behind it are not.
+    """
+    chunk_num = [0]
+
+    def prepare(records):
+        start = time.perf_counter()
+        chunk_num[0] += 1
+        print(f"Processing chunk {chunk_num[0]} ({len(records)} records)...")
+        logger.info(f"Processing chunk {chunk_num[0]} ({len(records)} records)...")
+        chunk = prepare_chunk(records, source_type=ext)
+        chunk['chunk'] = chunk_num[0]
+        chunk['rows'] = len(records)
+        if 'df' in chunk:
+            # Frame size feeds the chunk sizer's memory ceiling
+            chunk['nbytes'] = int(chunk['df'].memory_usage(deep=True).sum())
+        chunk['busy_seconds'] = time.perf_counter() - start
+        return chunk
+
+    def timed(fn):
+        # Per-chunk processing time summed over stages (queue waits excluded)
+        def run(chunk):
+            start = time.perf_counter()
+            chunk = fn(chunk)
+            chunk['busy_seconds'] += time.perf_counter() - start
+            return chunk
+        return run
+
+    def validate(chunk):
+        # One short-lived event loop per chunk, so validation workers share nothing
+        return asyncio.run(validate_chunk(chunk))
+
+    def aggregate(chunk):
+        chunk = summarize_chunk(chunk)
+        if 'summary' in chunk:
+            aggregator.add(chunk['summary'])
+            if aggregator.aborted is not None and not pipeline.cancelled:
+                # An abort policy tripped: stop reading and drop this chunk and those behind it
+                logger.warning(f"Aborting run after chunk {chunk['chunk']}: {describe_abort(aggregator.aborted)}")
+                pipeline.cancel()
+        return chunk
+
+    def write(chunk):
+        if partitioner is not None and 'valid_df' in chunk:
+            with METRICS.stage("partition", rows=chunk['summary']['total_accounts']):
+                partitioner.add(chunk['valid_df'])
+                partitioner.add(chunk['invalid_df'])
+        return write_chunk(chunk, list(output_formats))
+
+    pipeline = Pipeline([
+        Stage('prepare', prepare),
+        Stage('validate', timed(validate), workers=workers),
+        Stage('aggregate', timed(aggregate)),
+        Stage('write', timed(write)),
+    ], depth=depth)
+    return pipeline
+
+def run_batch(batcher, ext, report_path="output/report.csv", output_formats=('csv', 'json', 'xlsx'),
+              workers=1, depth=2, sizer=None, partitioner=None, policies=None):
+    """
+    Validate every chunk from `batcher` in bounded memory.
+
+    Chunks flow through a staged pipeline (see build_pipeline) with at most
+    `depth` chunks queued between stages, so parsing, validation and writing
+    overlap. Each chunk's result is written to `report_path` as soon as it is
+    done and folded into a RunAggregator; nothing row-level outlives its chunk.
+    If `sizer` is the ChunkSizer the batcher reads with, every finished chunk
+    is fed back to it so later chunks are resized. A `partitioner` receives
+    every chunk's rows in input order; the caller closes it. Abort `policies`
+    (app.abort) are checked after every chunk; if one trips the run stops
+    early and `aggregator.aborted` says why.
+    Returns the aggregator, the number of chunks, the last chunk's files and
+    the pipeline's per-stage utilization.
+    """
+    aggregator = RunAggregator(policies=policies)
+    pipeline = build_pipeline(ext, aggregator, output_formats, workers=workers, depth=depth, partitioner=partitioner)
+    chunk_num = 0
+    last_files = {}
+    with open(report_path, 'w', newline='') as report_file:
+        report = csv.DictWriter(report_file, fieldnames=REPORT_FIELDS)
+        report.writeheader()
+        for chunk in pipeline.run(timed_chunks(batcher)):
+            chunk_num += 1
+            result = chunk['result']
+            validation_summary = result.get("validation_summary", {}) if isinstance(result, dict) else {}
+            last_files = result.get("files", {}) if isinstance(result, dict) else {}
+            report.writerow({
+                'chunk': chunk['chunk'],
+                'records': validation_summary.get("total_accounts", 0),
+                'valid': validation_summary.get("valid_accounts", 0),
+                'invalid': validation_summary.get("invalid_accounts", 0),
+                'files': json.dumps(last_files),
+            })
+            report_file.flush()
+            if sizer is not None:
+                sizer.observe(chunk['rows'], chunk['busy_seconds'], chunk.get('nbytes', 0), chunk=chunk['chunk'])
+            del chunk, result, validation_summary
+    return aggregator, chunk_num, last_files, pipeline.utilization()
+
+def run(args):
+    """Run one batch ingest (or --scan) for parsed command-line `args` (see bulk_validator.core.cli)."""
+    setup_logging()
+    ext = args.type
+    path = args.file
+    run_id = uuid.uuid4().hex
+    try:
+        policies = parse_policies(args.abort_on)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        sys.exit(2)
+    if args.no_metrics:
+        METRICS.enabled = False
+    if args.no_fingerprint_cache:
+        fingerprints.FINGERPRINT_CACHE = False
+    elif fingerprints.FINGERPRINT_CACHE:
+        # Results from older rule sets can never be reused again
+        pruned = fingerprints.prune(AccountValidator().ruleset)
+        if pruned:
+            logger.info(f"Pruned {pruned} stale fingerprint cache entries")
+    if args.profile:
+        # Per-rule timings are needed to attribute cost to specific checks
+        METRICS.enabled = True
+
+    # Start timer
+    start_time = time.time()
+    profiler = SamplingProfiler(interval=args.profile_interval / 1000).start() if args.profile else None
+
+    # Pre-flight: check the first record's columns before any chunk is processed
+    try:
+        schema = preflight(path, ext)
+    except SchemaError as e:
+        logger.error(f"Schema check failed for {path}: {e}")
+        print(f"ERROR: {e}")
+        sys.exit(2)
+    if schema['ignored']:
+        ignored = ', '.join(schema['ignored'][:10]) + (' ...' if len(schema['ignored']) > 10 else '')
+        logger.info(f"Reading {len(schema['projected'])} of {len(schema['columns'])} columns; ignoring: {ignored}")
+    columns = schema['projected']
+
+    if args.scan:
+        report = run_scan(path, ext, columns, sample_rows=args.scan_rows, seed=args.seed)
+        report_file = write_run_report(f"{run_id}_scan", report)
+        print_scan(report)
+        print(f"Scan report: {report_file}")
+        return
+
+    sizer = ChunkSizer(rows=args.chunk_rows, max_bytes=args.chunk_bytes, target_rows_per_sec=args.target_rows_per_sec)
+    if ext not in READERS:
+        raise ValueError('Unsupported file type')
+    batcher = READERS[ext](path, sizer, columns)
+
+    partitioner = None
+    output_formats = ('csv', 'json', 'xlsx')
+    if args.partition_by_bank:
+        try:
+            partitioner = BankPartitionWriter(
+                f"output/run_{run_id}_partitions", mode=args.partition_mode,
+                fmt=args.partition_format, memory_rows=args.partition_memory_rows,
+            )
+        except RuntimeError as e:
+            print(f"ERROR: {e}")
+            sys.exit(2)
+        # Partitions replace the per-chunk row files; chunk summaries are still written
+        output_formats = ()
+
+    job_store.record_job(run_id, kind=f"batch_{ext}", detail=path)
+    aggregator, chunk_num, last_files, utilization = run_batch(
+        batcher, ext, output_formats=output_formats, workers=args.workers, depth=args.queue_depth,
+        sizer=sizer, partitioner=partitioner, policies=policies,
+    )
+    partitions = None
+    if partitioner is not None:
+        partitions = partitioner.close()
+        logger.info(f"Wrote {sum(len(p) for p in partitions.values())} partitions for {len(partitions)} banks to {partitioner.root}")
+        print(f"Partitions: {partitioner.root}")
+    run_summary = aggregator.summary()
+    total_records = run_summary['total_accounts']
+    total_valid = run_summary['valid_accounts']
+    total_invalid = run_summary['invalid_accounts']
+
+    aborted = aggregator.aborted
+    if aborted is not None:
+        METRICS.inc("bv_aborted_runs_total", 1, source="batch")
+        print(f"Batch processing ABORTED: {describe_abort(aborted)}. The totals below cover the rows validated until then.")
+        logger.warning(f"Batch processing aborted: {describe_abort(aborted)}")
+    else:
+        print("Batch processing complete.")
+        logger.info("Batch processing complete.")
+
+    # End timer and log total time
+    end_time = time.time()
+    total_time = end_time - start_time
+    profile_files = None
+    if profiler is not None:
+        profiler.stop()
+        rules = {
+            rule: [stats.get("evaluations", 0), stats.get("seconds", 0.0), stats.get("failures", 0)]
+            for rule, stats in METRICS.snapshot()["rules"].items()
+        }
+        profile_files = profiler.write(f"output/run_{run_id}", rules=format_rule_stats(rules))
+        print(f"Profile written: {profile_files['profile_speedscope']}")
+    logger.info(f"Total chunks processed: {chunk_num}")
+    logger.info(f"Total records processed: {total_records}")
+    logger.info(f"Total valid records: {total_valid}")
+    logger.info(f"Total invalid records: {total_invalid}")
+    logger.info(f"Total processing time: {total_time:.2f} seconds")
+    print(f"Total chunks processed: {chunk_num}")
+    print(f"Total records processed: {total_records}")
+    print(f"Total valid records: {total_valid}")
+    print(f"Total invalid records: {total_invalid}")
+    if run_summary['reused_results']:
+        logger.info(f"Results reused for unchanged rows: {run_summary['reused_results']}")
+        print(f"Results reused for unchanged rows: {run_summary['reused_results']}")
+    print(f"Total processing time: {total_time:.2f} seconds")
+    stage_line = ", ".join(
+        f"{name} {stats['utilization']:.0%}" for name, stats in utilization['stages'].items()
+    )
+    logger.info(f"Stage utilization: {stage_line} (bottleneck: {utilization['bottleneck']})")
+    print(f"Stage utilization: {stage_line} (bottleneck: {utilization['bottleneck']})")
+
+    run_report = {
+        "run_id": run_id,
+        "input": path,
+        "type": ext,
+        "chunks": chunk_num,
+        "total_records": total_records,
+        "valid_records": total_valid,
+        "invalid_records": total_invalid,
+        "summary": run_summary,
+        "pipeline": utilization,
+        "chunking": sizer.report(),
+        "schema": schema,
+        "partitions": partitions,
+        "aborted": aborted,
+        "elapsed_seconds": round(total_time, 3),
+        "rows_per_sec": round(total_records / total_time, 1) if total_time else None,
+        "metrics": METRICS.snapshot() if METRICS.enabled else None,
+        "profile": profile_files,
+        "rule_schedule": RULES.stats(),
+    }
+    report_file = write_run_report(run_id, run_report)
+    # output/report.csv is overwritten by the next run; keep this run's copy for /runs/{run_id}/...
+    chunk_report = f"output/run_{run_id}_chunks.csv"
+    shutil.copyfile("output/report.csv", chunk_report)
+    run_files = {"chunk_report": chunk_report, "run_report": report_file}
+    if partitioner is not None:
+        run_files["partitions"] = partitioner.root
+    job_store.record_job(run_id, kind=f"batch_{ext}", status="aborted" if aborted else "done", summary=run_summary,
+                         files=run_files, detail=describe_abort(aborted) if aborted else None)
+    logger.info(f"Run report written to {report_file}")
+    print(f"Run report: {report_file}")
+    # HTML/PDF summary from the aggregate, rendered while the notification goes out
+    rendering = REPORTS.submit(run_id)
+    if aborted is not None:
+        # No completion email for a run that was cut short
+        wait_for_reports(rendering)
+        sys.exit(3)
+
+    # Email notification, sent in the background; the run is already recorded as done
+    notify_to = args.notify or os.getenv('EMAIL_NOTIFY_TO')
+    if notify_to:
+        artifact_paths = [chunk_report, report_file] + run_output_files(chunk_report)
+        if partitioner is not None:
+            artifact_paths.append(partitioner.root)
+        sent = notify(notify_to, run_id, run_summary, artifact_paths)
+        if sent is not None:
+            if not NOTIFIER.flush(EMAIL_FLUSH_TIMEOUT):
+                print(f"Notification still pending after {EMAIL_FLUSH_TIMEOUT:.0f}s; giving up.")
+            elif sent.exception() is not None:
+                print(f"Notification failed: {sent.exception()}")
+            else:
+                outcome = sent.result()
+                job_store.record_job(run_id, kind=f"batch_{ext}", status="done",
+                                     files={**run_files, "artifact": outcome['artifact']['path']})
+                print("Notification sent" + (f" with a download link ({outcome['link']})." if outcome.get('link') else "."))
+    wait_for_reports(rendering)
+
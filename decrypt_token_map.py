@@ -1,36 +1,158 @@
+"""
+Export decrypted tokens from the token vault as NDJSON.
+
+One line per token: {"batch_id", "timestamp", "field", "token", "value"}.
+Batches are filtered on their plaintext metadata before anything is
+decrypted, decrypted in parallel across processes, and written as they
+finish, so memory stays bounded by a few batches regardless of vault size.
+
+    python decrypt_token_map.py --out tokens.ndjson --since 2024-06-01 --prefix ACC-
+"""
 import os
+import sys
 import json
-from cryptography.fernet import Fernet
 import argparse
+from collections import deque
+from datetime import datetime, timezone
+from json.encoder import encode_basestring_ascii as _quote
+from multiprocessing import Pool
+
+from dotenv import load_dotenv
+
+from app.serialization import loads
+from app.token_crypto import load_keyring
+from app.token_vault import iter_batch_lines, decrypt_batch, TOKEN_MAP_PATH
+
+FIELD_PREFIXES = {'account_tokens': 'ACC-', 'reference_tokens': 'REF-'}
+
+# Set in each worker process by _init_worker
+_worker = {}
+
+
+def parse_time(value):
+    """Epoch seconds, or an ISO date/datetime (UTC when no offset is given)."""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        moment = datetime.fromisoformat(value)
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return moment.timestamp()
+
+
+def fields_for_prefix(prefix):
+    """Only the fields whose tokens can start with `prefix` need decrypting."""
+    if not prefix:
+        return None
+    return [
+        field for field, field_prefix in FIELD_PREFIXES.items()
+        if field_prefix.startswith(prefix) or prefix.startswith(field_prefix)
+    ]
+
+
+def _init_worker(keys, batch_ids, since, until, prefix):
+    _worker.update(
+        keyring=load_keyring(keys),
+        batch_ids=set(batch_ids) if batch_ids else None,
+        since=since,
+        until=until,
+        prefix=prefix or '',
+        fields=fields_for_prefix(prefix),
+    )
+
+
+def export_batch(line):
+    """Decrypt one raw vault line; returns its NDJSON output (empty if filtered out)."""
+    entry = loads(line)
+    if _worker['batch_ids'] is not None and entry.get('batch_id') not in _worker['batch_ids']:
+        return ''
+    timestamp = entry.get('timestamp', 0)
+    if _worker['since'] is not None and timestamp < _worker['since']:
+        return ''
+    if _worker['until'] is not None and timestamp > _worker['until']:
+        return ''
+    if _worker['fields'] == []:
+        return ''
+    prefix = _worker['prefix']
+    out = []
+    for field, tokens in decrypt_batch(entry, _worker['keyring'], _worker['fields']).items():
+        # Everything but token and value is shared by the batch; encode it once
+        head = '{"batch_id": %s, "timestamp": %s, "field": %s, "token": ' % (
+            json.dumps(entry.get('batch_id')), json.dumps(timestamp), json.dumps(field)
+        )
+        for token, value in tokens.items():
+            if token.startswith(prefix):
+                value = _quote(value) if isinstance(value, str) else json.dumps(value)
+                out.append(f'{head}{_quote(token)}, "value": {value}}}')
+    return '\n'.join(out) + '\n' if out else ''
+
+
+def export_tokens(path, out, keys, batch_ids=None, since=None, until=None, prefix=None, workers=None):
+    """
+    Stream decrypted tokens from `path` to the text file `out`. Returns the number of batches read.
+
+    Output keeps vault order. At most 4 batches per worker are in flight.
+    """
+    workers = workers or os.cpu_count() or 1
+    init_args = (keys, batch_ids, since, until, prefix)
+    lines = iter_batch_lines(path)
+    count = 0
+    if workers == 1:
+        _init_worker(*init_args)
+        for line in lines:
+            out.write(export_batch(line))
+            count += 1
+        return count
+    with Pool(workers, initializer=_init_worker, initargs=init_args) as pool:
+        pending = deque()
+        for line in lines:
+            pending.append(pool.apply_async(export_batch, (line,)))
+            count += 1
+            if len(pending) >= workers * 4:
+                out.write(pending.popleft().get())
+        while pending:
+            out.write(pending.popleft().get())
+    return count
+
 
-def main():
-    parser = argparse.ArgumentParser(description="Decrypt an encrypted token_map.json file.")
-    parser.add_argument("--file", default="output/token_map.json", help="Path to encrypted token_map.json")
-    parser.add_argument("--key", default=None, help="Fernet key (if not set, will read TOKEN_MAP_KEY from env)")
-    parser.add_argument("--out", default=None, help="Output file for decrypted JSON (prints to stdout if not set)")
-    args = parser.parse_args()
+def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Export decrypted tokens from the token vault as NDJSON.")
+    parser.add_argument("--file", default=TOKEN_MAP_PATH, help="Path to token_map.jsonl (legacy token_map.json also works)")
+    parser.add_argument("--key", default=None, help="Fernet key(s), comma-separated newest first (default: TOKEN_MAP_KEY env var)")
+    parser.add_argument("--out", default=None, help="Output NDJSON file (streams to stdout if not set)")
+    parser.add_argument("--batch-id", action="append", default=None, help="Only export this batch (repeatable)")
+    parser.add_argument("--since", default=None, help="Only batches written at or after this time (epoch or ISO 8601)")
+    parser.add_argument("--until", default=None, help="Only batches written at or before this time (epoch or ISO 8601)")
+    parser.add_argument("--prefix", default=None, help="Only tokens starting with this prefix, e.g. ACC- or REF-1a")
+    parser.add_argument("--workers", type=int, default=None, help="Decryption processes (default: CPU count)")
+    args = parser.parse_args(argv)
 
     key = args.key or os.getenv("TOKEN_MAP_KEY")
     if not key:
-        print("ERROR: Fernet key must be supplied via --key or TOKEN_MAP_KEY env var.")
-        exit(1)
-
-    with open(args.file, "rb") as f:
-        data = f.read()
-        try:
-            fernet = Fernet(key.encode())
-            decrypted = fernet.decrypt(data)
-            token_map = json.loads(decrypted.decode())
-        except Exception as e:
-            print(f"ERROR: Failed to decrypt. {e}")
-            exit(2)
+        print("ERROR: Fernet key must be supplied via --key or TOKEN_MAP_KEY env var.", file=sys.stderr)
+        sys.exit(1)
 
+    out = open(args.out, "w") if args.out else sys.stdout
+    try:
+        batches = export_tokens(
+            args.file, out, key,
+            batch_ids=args.batch_id,
+            since=parse_time(args.since),
+            until=parse_time(args.until),
+            prefix=args.prefix,
+            workers=args.workers,
+        )
+    except Exception as e:
+        print(f"ERROR: Failed to decrypt. {e}", file=sys.stderr)
+        sys.exit(2)
+    finally:
+        if args.out:
+            out.close()
     if args.out:
-        with open(args.out, "w") as out_f:
-            json.dump(token_map, out_f, indent=2)
-        print(f"Decrypted token map written to {args.out}")
-    else:
-        print(json.dumps(token_map, indent=2))
+        print(f"Scanned {batches} batches; decrypted tokens written to {args.out}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,27 @@
+# gunicorn.conf.py
+"""
+Production serve mode: N preloaded uvicorn workers.
+
+Workers share nothing in memory. Uploads are tracked in the SQLite (WAL)
+job store, and vault appends are serialized with a file lock, so any
+worker can serve any request.
+"""
+import os
+import multiprocessing
+
+bind = os.getenv('BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'uvicorn.workers.UvicornWorker'
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '90'))
+# Import the app (and warm it up) once in the master; workers fork from it
+preload_app = True
+
+
+def when_ready(server):
+    from app.main import warmup
+    warmup()
+
+
+def post_fork(server, worker):
+    from app.main import after_fork
+    after_fork()
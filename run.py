@@ -2,27 +2,59 @@ import typer
 import subprocess
 import sys
 
-app = typer.Typer(help="Unified CLI for Bulk Validator")
+# Plain help output: formatting help with Rich costs ~200ms of imports on every invocation
+app = typer.Typer(help="Unified CLI for Bulk Validator", rich_markup_mode=None)
 
 @app.command()
 def api():
     """Start the API server (dev mode)"""
     subprocess.run([sys.executable, "-m", "uvicorn", "app.main:app", "--reload"])
 
+@app.command()
+def serve(workers: int = 0, host: str = "0.0.0.0", port: int = 8000):
+    """Start the API in production mode with N preloaded workers (default: CPU count)"""
+    import os
+    env = dict(os.environ, BIND=f"{host}:{port}")
+    if workers:
+        env["WEB_CONCURRENCY"] = str(workers)
+    try:
+        import gunicorn  # noqa: F401
+        subprocess.run([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app"], env=env)
+    except ImportError:
+        # No gunicorn (e.g. Windows): uvicorn workers warm themselves up on import
+        env["BV_WARMUP"] = "1"
+        subprocess.run([sys.executable, "-m", "uvicorn", "app.main:app", "--host", host, "--port", str(port),
+                        "--workers", str(workers or os.cpu_count() or 1)], env=env)
+
+# The commands below run in this process; each imports only what it needs
 @app.command()
 def seed():
     """Seed demo account data"""
-    subprocess.run([sys.executable, "seed_accounts.py"])
+    import seed_accounts
+    seed_accounts.main()
 
 @app.command()
 def batch(file: str = "seed_accounts.json", type: str = "json"):
     """Run batch ingest on a file"""
-    subprocess.run([sys.executable, "batch_ingest.py", file, "--type", type])
+    from bulk_validator.core.cli import main
+    raise typer.Exit(main([file, "--type", type]))
 
 @app.command()
-def view_tokens(file: str = "output/token_map.json"):
+def view_tokens(file: str = "output/token_map.jsonl"):
     """View decrypted tokens from the token map"""
-    subprocess.run([sys.executable, "view_decrypted_token_map.py", "--file", file])
+    import view_decrypted_token_map
+    view_decrypted_token_map.main(["--file", file])
+
+@app.command()
+def export_tokens(file: str = "output/token_map.jsonl", out: str = "output/tokens_export.ndjson", prefix: str = None, since: str = None):
+    """Export decrypted tokens as NDJSON"""
+    import decrypt_token_map
+    argv = ["--file", file, "--out", out]
+    if prefix:
+        argv += ["--prefix", prefix]
+    if since:
+        argv += ["--since", since]
+    decrypt_token_map.main(argv)
 
 @app.command()
 def docker():
@@ -1,26 +1,173 @@
-import json
-from motor.motor_asyncio import AsyncIOMotorClient
+"""
+Load the valid-accounts allowlist (a JSON array of account objects) into MongoDB.
+
+The file is streamed with ijson and written in batches of unordered bulk
+upserts, a few batches in flight at a time, into a staging collection that
+already carries the unique (account_number, bank_code) index. When every
+batch has landed the staging collection is renamed over the live one, so
+readers see either the old allowlist or the new one, never an empty or
+half-loaded collection. Every account carries its position in the file
+(import_seq) and an upsert only replaces an account read earlier, so when
+a key repeats across batches the last one in the file wins, whichever
+batch lands first.
+
+    python scripts/import_valid_accounts_to_mongo.py [app/valid_accounts.json] [--batch-size N] [--concurrency N]
+"""
+import argparse
 import asyncio
 import os
+import time
+import uuid
+from typing import Dict, Iterator, List
+
+import ijson
 from dotenv import load_dotenv
 
 load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 COLLECTION_NAME = "valid_accounts"
 DB_NAME = "bulk_validator"
+IMPORT_BATCH_SIZE = int(os.getenv("MONGO_IMPORT_BATCH_SIZE", "5000"))
+IMPORT_CONCURRENCY = int(os.getenv("MONGO_IMPORT_CONCURRENCY", "4"))
+KEY_FIELDS = ("account_number", "bank_code")
+SEQ_FIELD = "import_seq"
+_DUPLICATE_KEY = 11000
+
+
+# === Reading ===
+def iter_batches(json_path: str, batch_size: int = IMPORT_BATCH_SIZE, stats: Dict = None) -> Iterator[List[Dict]]:
+    """
+    Yield lists of up to `batch_size` accounts from the file without loading it.
+    Accounts missing a key field are counted in stats['skipped']; a repeated
+    key within a batch keeps its last occurrence. Each account gets its
+    position in the file as SEQ_FIELD.
+    """
+    stats = stats if stats is not None else {}
+    stats.setdefault("read", 0)
+    stats.setdefault("skipped", 0)
+    batch = {}
+    read = skipped = position = 0
+    with open(json_path, "rb") as f:
+        for account in ijson.items(f, "item", use_float=True, buf_size=64 * 1024):
+            read += 1
+            position += 1
+            account_number = account.get("account_number") if isinstance(account, dict) else None
+            bank_code = account.get("bank_code") if account_number is not None else None
+            if account_number in (None, "") or bank_code in (None, ""):
+                skipped += 1
+                continue
+            # Keys are always matched as strings, whatever type the file used
+            if type(account_number) is not str:
+                account["account_number"] = account_number = str(account_number)
+            if type(bank_code) is not str:
+                account["bank_code"] = bank_code = str(bank_code)
+            account[SEQ_FIELD] = position
+            batch[account_number, bank_code] = account
+            if len(batch) >= batch_size:
+                stats["read"] += read
+                stats["skipped"] += skipped
+                read = skipped = 0
+                yield list(batch.values())
+                batch = {}
+    stats["read"] += read
+    stats["skipped"] += skipped
+    if batch:
+        yield list(batch.values())
+
+
+# === Writing ===
+async def _bulk_write(collection, ops) -> List[Dict]:
+    """Unordered bulk write; returns the duplicate-key errors, raises on any other."""
+    from pymongo.errors import BulkWriteError
+
+    try:
+        await collection.bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(err["code"] != _DUPLICATE_KEY for err in errors):
+            raise
+        return errors
+    return []
+
+
+async def upsert_batch(collection, accounts: List[Dict]) -> int:
+    from pymongo import UpdateOne
+
+    # Only an account read earlier in the file matches; a later one already
+    # stored turns the upsert into a duplicate-key insert, which is skipped
+    ops = [
+        UpdateOne({**{field: account[field] for field in KEY_FIELDS}, SEQ_FIELD: {"$lt": account[SEQ_FIELD]}},
+                  {"$set": account}, upsert=True)
+        for account in accounts
+    ]
+    errors = await _bulk_write(collection, ops)
+    if errors:
+        # Either a later account is stored (skip it), or two in-flight batches
+        # raced to insert the same new key: retried, the loser now matches it
+        # as an update or finds the winner was later
+        await _bulk_write(collection, [ops[err["index"]] for err in errors])
+    return len(ops)
+
+
+async def import_accounts(json_path, db=None, collection_name=COLLECTION_NAME,
+                          batch_size=IMPORT_BATCH_SIZE, concurrency=IMPORT_CONCURRENCY) -> Dict:
+    """Stream `json_path` into a staging collection and swap it in for `collection_name`."""
+    if db is None:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        db = AsyncIOMotorClient(MONGO_URI)[DB_NAME]
+
+    started = time.perf_counter()
+    stats = {"upserted": 0}
+    staging = db[f"{collection_name}_import_{uuid.uuid4().hex[:12]}"]
+    # Index first: every upsert looks its key up, and the live collection gets it with the rename
+    await staging.create_index([(field, 1) for field in KEY_FIELDS], unique=True, name="account_bank_unique")
+
+    slots = asyncio.Semaphore(concurrency)
+    tasks = []
+
+    async def write(accounts):
+        try:
+            stats["upserted"] += await upsert_batch(staging, accounts)
+        finally:
+            slots.release()
+
+    try:
+        for accounts in iter_batches(json_path, batch_size, stats):
+            # At most `concurrency` batches are in memory or on the wire at once
+            await slots.acquire()
+            failed = [task for task in tasks if task.done() and task.exception()]
+            if failed:
+                slots.release()
+                raise failed[0].exception()
+            tasks = [task for task in tasks if not task.done()]
+            tasks.append(asyncio.create_task(write(accounts)))
+        await asyncio.gather(*tasks)
+        await staging.rename(collection_name, dropTarget=True)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await staging.drop()
+        raise
+
+    elapsed = time.perf_counter() - started
+    stats["accounts"] = await db[collection_name].count_documents({})
+    stats["elapsed_seconds"] = round(elapsed, 3)
+    stats["docs_per_sec"] = round(stats["read"] / elapsed, 1) if elapsed else None
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import the valid-accounts allowlist into MongoDB.")
+    parser.add_argument("json_path", nargs="?", default="app/valid_accounts.json")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=IMPORT_CONCURRENCY)
+    args = parser.parse_args()
+    stats = asyncio.run(import_accounts(args.json_path, batch_size=args.batch_size, concurrency=args.concurrency))
+    print(f"Imported {stats['accounts']} accounts to MongoDB collection '{COLLECTION_NAME}' "
+          f"({stats['read']} read, {stats['skipped']} skipped) in {stats['elapsed_seconds']}s "
+          f"({stats['docs_per_sec']} docs/s)")
 
-async def import_accounts(json_path):
-    with open(json_path) as f:
-        accounts = json.load(f)
-    client = AsyncIOMotorClient(MONGO_URI)
-    db = client[DB_NAME]
-    collection = db[COLLECTION_NAME]
-    await collection.delete_many({})  # Optional: clear existing
-    if accounts:
-        await collection.insert_many(accounts)
-    print(f"Imported {len(accounts)} accounts to MongoDB collection '{COLLECTION_NAME}'")
 
 if __name__ == "__main__":
-    import sys
-    json_path = sys.argv[1] if len(sys.argv) > 1 else "app/valid_accounts.json"
-    asyncio.run(import_accounts(json_path))
+    main()
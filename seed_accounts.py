@@ -75,26 +75,23 @@ def generate_valid_iban():
     check = iban_checksum(temp_iban)
     return country + check + bban
 
+def generate_invalid_iban():
+    # Valid structure, wrong check digits
+    iban = generate_valid_iban()
+    bad_check = f"{(int(iban[2:4]) + random.randint(1, 96)) % 97:02d}"
+    return iban[:2] + bad_check + iban[4:]
+
 def make_valid_account(idx, used_refs):
     # 20% chance to generate valid IBAN
     if random.random() < 0.2:
         acct = generate_valid_iban()
         bank = ""  # IBANs may not use local bank_code
     else:
-<<<<<<< HEAD
         bank = random.choice(BANK_CODES)
         if bank in BANK_GENERATORS:
             acct = BANK_GENERATORS[bank]()
         else:
             acct = generate_account_number()
-=======
-        acct = generate_account_number()
-        bank = random.choice(["001", "002", "003", "044", "058", "070", "232"])
-    # Simulate special accounts for mock bank API
-    if random.random() < 0.3:  # 30% chance of special accounts
-        acct = "X" + acct  # For regulatory checks
-        acct += "000"  # For blocked accounts
->>>>>>> 712d468fcd2dfc328a93acfc9751f42a6b479770
     amt = round(random.uniform(50, 500000), 2)
     ref = f"TX{random.randint(100000, 999999)}"
     # Ensure unique reference_id
@@ -112,7 +109,6 @@ def make_invalid_account(idx, used_refs):
     error_type = random.choice([
         "short_account", "long_account", "symbols", "bad_bank", "bad_amount", "empty_ref", "dup_ref", "invalid_iban"])
     # Account number
-<<<<<<< HEAD
     if error_type == "invalid_iban":
         acct = generate_invalid_iban()
         bank = ""
@@ -122,11 +118,6 @@ def make_invalid_account(idx, used_refs):
             acct = BANK_GENERATORS[bank]()[:random.randint(5, 7)]
         else:
             acct = generate_account_number()[:random.randint(5, 7)]
-=======
-    if error_type == "short_account":
-        acct = random_alphanum_strict(random.randint(5, 7))
-        bank = random.choice(["001", "002", "003", "044", "058", "070", "232"])
->>>>>>> 712d468fcd2dfc328a93acfc9751f42a6b479770
     elif error_type == "long_account":
         bank = random.choice(BANK_CODES)
         if bank in BANK_GENERATORS:
@@ -0,0 +1,113 @@
+# tests/test_abort.py
+
+import os
+
+import pytest
+from cryptography.fernet import Fernet
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app import job_store
+from app.abort import parse_policies
+from app.reporting import RunAggregator
+from bulk_validator.core import chunks
+
+client = TestClient(main.app)
+
+
+def test_policy_spec():
+    invalid, code = parse_policies("invalid>90%@1000, be04 > 50")
+    assert (invalid.target, invalid.threshold, invalid.min_rows) == ("invalid", 0.9, 1000)
+    assert (code.target, code.threshold) == ("BE04", 0.5)
+    assert invalid.check(999, 999, {}) is None
+    assert invalid.check(1000, 901, {})["rate"] == 0.901
+    assert code.check(2000, 1500, {"BE04": 1000}) is None
+    assert parse_policies("") == []
+    for bad in ("invalid>", "invalid<5%", "invalid>100%"):
+        with pytest.raises(ValueError):
+            parse_policies(bad)
+
+
+def test_aggregator_trips_on_error_code():
+    aggregator = RunAggregator(policies=parse_policies("BE04>50%@100"))
+    chunk = {"total_accounts": 100, "valid_accounts": 40, "invalid_accounts": 60, "invalid_error_codes": {"BE04": 45}}
+    aggregator.add(chunk)
+    assert aggregator.aborted is None
+    aggregator.add({**chunk, "invalid_error_codes": {"BE04": 60, "AM09": 10}})
+    assert aggregator.aborted["failing_rows"] == 105 and aggregator.aborted["target"] == "BE04"
+    assert aggregator.summary()["invalid_error_codes"] == {"BE04": 105, "AM09": 10}
+
+
+def _bad_chunks(read, chunks=50, rows=200):
+    # Every row fails the bank code check (999 isn't a known bank)
+    for c in range(chunks):
+        read.append(c)
+        yield [
+            {"account_number": f"{c:04d}{n:06d}", "bank_code": "999", "amount": "10.00", "reference_id": f"TX{c}-{n}"}
+            for n in range(rows)
+        ]
+
+
+def test_batch_run_stops_reading_when_a_policy_trips(tmp_path, monkeypatch):
+    import batch_ingest
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("TOKEN_MAP_KEY", Fernet.generate_key().decode())
+    os.makedirs("output")
+    read = []
+    aggregator, chunks, _, _ = batch_ingest.run_batch(
+        _bad_chunks(read), "csv", report_path="output/report.csv", output_formats=("csv",),
+        policies=parse_policies("invalid>90%@400"),
+    )
+    assert aggregator.aborted["policy"] == "invalid>90%@400"
+    # Chunk 2 trips the policy: it is counted but not written, nothing after it is
+    # aggregated or written, and reading stops with only the in-flight chunks read
+    assert aggregator.total == 400 and chunks == 1
+    assert len(read) < 25
+    with open("output/report.csv") as f:
+        assert [line.split(",")[0] for line in f][1:] == ["1"]
+
+
+def test_upload_is_aborted_with_a_partial_summary(tmp_path, monkeypatch):
+    monkeypatch.setenv("TOKEN_MAP_KEY", Fernet.generate_key().decode())
+    monkeypatch.setattr(job_store, "JOB_STORE_PATH", str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(main, "UPLOAD_ABORT_POLICIES", parse_policies("BE04>80%@20"))
+    monkeypatch.setattr(chunks, "ABORT_CHECK_ROWS", 20)
+    records = "".join(
+        f"<record><account_number>{n:010d}</account_number><bank_code>999</bank_code>"
+        f"<amount>10.00</amount><reference_id>TX{n}</reference_id></record>"
+        for n in range(200)
+    )
+    response = client.post("/upload-xml", files={"file": ("bad.xml", f"<records>{records}</records>", "application/xml")})
+    assert response.status_code == 422
+    body = response.json()
+    assert body["aborted"]["target"] == "BE04"
+    assert body["validation_summary"]["total_accounts"] == 20
+    job = job_store.get_job(body["job_id"])
+    assert job["status"] == "aborted" and "BE04" in job["detail"]
+
+
+def test_sliced_validation_counts_each_rule_evaluation_once(monkeypatch):
+    import asyncio
+
+    import pandas as pd
+
+    from app import fingerprints
+    from app.metrics import MetricsRegistry
+    from app.normalize import normalize_records
+    from app.validators.account_validator import AccountValidator
+
+    monkeypatch.setattr(fingerprints, "FINGERPRINT_CACHE", False)
+    monkeypatch.setattr(chunks, "ABORT_CHECK_ROWS", 1000)
+    rows = [{"account_number": f"{n:010d}", "bank_code": "044", "amount": "10.00", "reference_id": f"TX{n}"} for n in range(3000)]
+    df = pd.DataFrame(rows)
+    registry = MetricsRegistry(enabled=True)
+    monkeypatch.setattr(chunks, "METRICS", registry)
+    results, tripped = asyncio.run(chunks.validate_until_abort(
+        df, normalize_records(df), parse_policies("BE04>99%@100000"), validator=AccountValidator(collect_timings=True)))
+    assert tripped is None and len(results) == 3000
+    evaluations = {labels[0][1]: value for (name, labels), value in registry._counters.items()
+                   if name == "bv_rule_evaluations_total"}
+    # The same validator serves all three slices; its cumulative stats must not be re-counted
+    assert evaluations["length_error"] == 3000
+    assert all(count <= 3000 for count in evaluations.values())
@@ -0,0 +1,151 @@
+# tests/test_admission.py
+
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app import admission
+from app.admission import AdmissionController, AdmissionMiddleware, TokenBucket, parse_quotas
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_app(controller):
+    app = FastAPI()
+    app.add_middleware(AdmissionMiddleware, controller=controller)
+
+    @app.post("/upload-csv")
+    async def upload(delay: float = 0):
+        await asyncio.sleep(delay)
+        return {"ok": True}
+
+    @app.post("/validate")
+    async def validate():
+        return {"ok": True}
+
+    @app.get("/health")
+    async def health():
+        return {"ok": True}
+
+    return app
+
+
+async def post_all(app, *requests):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        async def send(path, delay=0, headers=None):
+            return await client.post(path, params={"delay": delay}, headers=headers)
+        return await asyncio.gather(*(send(*r) for r in requests))
+
+
+def test_token_bucket_refills_at_rate():
+    clock = Clock()
+    bucket = TokenBucket(rate=2, burst=3, clock=clock)
+    assert [bucket.take() for _ in range(3)] == [0, 0, 0]
+    assert bucket.take() == pytest.approx(0.5)
+    clock.now = 0.5
+    assert bucket.take() == 0
+    clock.now = 100
+    assert [bucket.take() for _ in range(4)][-1] > 0  # never more than the burst
+
+
+def test_parse_quotas():
+    quotas = parse_quotas("user.bulk=0.2/5/1, anonymous.interactive=5/10/2")
+    assert quotas[("user", "bulk")] == (0.2, 5, 1)
+    assert quotas[("admin", "bulk")] == admission.DEFAULT_QUOTAS[("admin", "bulk")]
+    for bad in ("user.bulk=1/2", "user.nightly=1/2/3"):
+        with pytest.raises(ValueError):
+            parse_quotas(bad)
+
+
+def test_rate_limit_per_key_with_retry_after(monkeypatch):
+    monkeypatch.setenv("API_KEYS_USER", "alice,bob")
+    clock = Clock()
+    controller = AdmissionController(parse_quotas("user.interactive=1/2/4,anonymous.interactive=1/1/4"), clock=clock)
+    app = make_app(controller)
+    alice, bob, stranger = ({"x-api-key": k} for k in ("alice", "bob", "made-up"))
+    responses = asyncio.run(post_all(app, *[("/validate", 0, alice)] * 3, ("/validate", 0, bob)))
+    assert [r.status_code for r in responses] == [200, 200, 429, 200]
+    assert responses[2].headers["Retry-After"] == "1"
+
+    # Unknown keys share the client address's anonymous bucket instead of getting their own
+    responses = asyncio.run(post_all(app, ("/validate", 0, stranger), ("/validate", 0, None)))
+    assert sorted(r.status_code for r in responses) == [200, 429]
+
+    # Unclassified paths are never limited
+    transport = httpx.ASGITransport(app=app)
+    async def health():
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [(await client.get("/health")).status_code for _ in range(5)]
+    assert asyncio.run(health()) == [200] * 5
+
+    clock.now = 1
+    assert asyncio.run(post_all(app, ("/validate", 0, alice)))[0].status_code == 200
+    usage = controller.usage()["callers"]
+    key = next(c for c in usage.values() if c["role"] == "user" and c["requests"] == 4)
+    assert (key["admitted"], key["rate_limited"], key["in_flight"]) == (3, 1, {"interactive": 0})
+
+
+def test_concurrency_quota_per_caller():
+    controller = AdmissionController(parse_quotas("anonymous.bulk=100/100/1"))
+    responses = asyncio.run(post_all(make_app(controller), ("/upload-csv", 0.3), ("/upload-csv", 0)))
+    assert sorted(r.status_code for r in responses) == [200, 429]
+    assert controller.usage()["callers"]["ip:127.0.0.1"]["over_quota"] == 1
+
+
+def test_over_quota_rejection_keeps_rate_tokens():
+    clock = Clock()
+    controller = AdmissionController(parse_quotas("anonymous.bulk=1/2/1"), clock=clock)
+    # One upload holds the caller's only slot; the retries arriving meanwhile are over quota
+    responses = asyncio.run(post_all(make_app(controller), ("/upload-csv", 0.3), *[("/upload-csv", 0)] * 3))
+    assert sorted(r.status_code for r in responses) == [200, 429, 429, 429]
+    caller = controller.usage()["callers"]["ip:127.0.0.1"]
+    assert (caller["over_quota"], caller["rate_limited"]) == (3, 0)
+    # Only the admitted upload spent a token, so the next one still fits the burst
+    assert asyncio.run(post_all(make_app(controller), ("/upload-csv", 0)))[0].status_code == 200
+
+
+def test_bulk_queue_sheds_while_interactive_stays_open():
+    controller = AdmissionController(parse_quotas("anonymous.bulk=100/100/10"),
+                                     pools={"bulk": (1, 1, 0.2), "interactive": (8, 8, 1)})
+    app = make_app(controller)
+
+    async def scenario():
+        slow = asyncio.ensure_future(post_all(app, ("/upload-csv", 0.6)))
+        await asyncio.sleep(0.05)
+        queued = asyncio.ensure_future(post_all(app, ("/upload-csv", 0)))
+        await asyncio.sleep(0.05)
+        # Slot busy and queue full: shed immediately; /validate has its own pool
+        full, interactive = await post_all(app, ("/upload-csv", 0), ("/validate", 0))
+        return (await slow)[0], (await queued)[0], full, interactive
+
+    slow, queued, full, interactive = asyncio.run(scenario())
+    assert slow.status_code == 200 and interactive.status_code == 200
+    assert queued.status_code == 503 and full.status_code == 503
+    assert int(full.headers["Retry-After"]) >= 1
+    assert "queue is full" in full.json()["detail"] and "no capacity" in queued.json()["detail"]
+    pool = controller.usage()["pools"]["bulk"]
+    assert (pool["active"], pool["queued"]) == (0, 0)
+
+
+def test_queued_request_gets_released_slot():
+    controller = AdmissionController(parse_quotas("anonymous.bulk=100/100/10"),
+                                     pools={"bulk": (1, 4, 5), "interactive": (8, 8, 1)})
+    responses = asyncio.run(post_all(make_app(controller), *[("/upload-csv", 0.05)] * 4))
+    assert [r.status_code for r in responses] == [200] * 4
+    assert controller.usage()["pools"]["bulk"]["active"] == 0
+
+
+def test_disabled_lets_everything_through(monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_ENABLED", False)
+    controller = AdmissionController(parse_quotas("anonymous.interactive=1/1/1"))
+    responses = asyncio.run(post_all(make_app(controller), *[("/validate",)] * 3))
+    assert [r.status_code for r in responses] == [200] * 3
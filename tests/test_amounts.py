@@ -0,0 +1,42 @@
+# tests/test_amounts.py
+
+import pandas as pd
+from decimal import Decimal
+from app.amounts import parse_amount, parse_amount_column, format_minor
+
+
+def test_column_parse_is_exact_and_flags_bad_amounts():
+    amounts = pd.Series(["10.10", "0.1", "1000.5", "abc", "", None, "-5", "10000000.00", "10000000.01", "1e3", "1.234"])
+    parsed = parse_amount_column(amounts)
+    assert parsed["amount_minor"].tolist()[:3] == [1010, 10, 100050]
+    assert parsed["amount_valid"].tolist() == [True, True, True, False, False, False, True, True, True, True, False]
+    assert parsed["amount_ok"].tolist() == [True, True, True, False, False, False, False, True, False, True, False]
+    assert parsed["amount_minor"][9] == 100000
+
+
+def test_currency_scale_applies_per_row():
+    parsed = parse_amount_column(pd.Series(["1500", "1.5", "2.125"]), pd.Series(["JPY", "JPY", "KWD"]))
+    assert parsed["amount_minor"].tolist() == [1500, 0, 2125]
+    assert parsed["amount_valid"].tolist() == [True, False, True]
+
+
+def test_single_value_parse_matches_column_path():
+    for value in ["12.30", 12.3, Decimal("12.30"), 7, "x", None]:
+        column = parse_amount_column(pd.Series([value], dtype=object))
+        assert parse_amount(value) == (int(column["amount_minor"][0]), bool(column["amount_valid"][0]))
+    assert format_minor(-1205, 2) == "-12.05"
+
+
+def test_oversized_cell_is_rejected_without_widening_the_chunk():
+    import tracemalloc
+
+    amounts = pd.Series(["12.50"] * 5000 + ["9" * 200_000], dtype=object)
+    tracemalloc.start()
+    parsed = parse_amount_column(amounts)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    # A 200k-wide code-point matrix would need ~4 GB; the short cells need a few hundred KB
+    assert peak < 20_000_000
+    assert parsed["amount_valid"][:5000].all() and not parsed["amount_valid"][5000]
+    assert parse_amount("9" * 200_000) == (0, False)
+    assert parse_amount(" " * 40 + "1.00") == (0, False)
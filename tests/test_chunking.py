@@ -0,0 +1,31 @@
+# tests/test_chunking.py
+
+from app.chunking import ChunkSizer
+
+
+def _feed(sizer, fixed_cost, per_row, n=40, bytes_per_row=400):
+    for i in range(n):
+        rows = sizer.next_rows()
+        sizer.observe(rows, fixed_cost + per_row * rows, nbytes=rows * bytes_per_row, chunk=i + 1)
+    return sizer
+
+
+def test_grows_while_fixed_costs_dominate_then_settles():
+    sizer = _feed(ChunkSizer(), fixed_cost=0.5, per_row=0.0001)
+    assert sizer.next_rows() > 1000
+    assert sizer.settled
+    # Growth stopped once doubling no longer paid off
+    assert sizer.adjustments[-1]["reason"] == "converged"
+
+
+def test_memory_ceiling_caps_chunk_size():
+    sizer = _feed(ChunkSizer(max_bytes=2_000_000), fixed_cost=1.0, per_row=0.00001)
+    assert sizer.next_rows() <= 2_000_000 // 400
+
+
+def test_fixed_rows_are_not_tuned_but_respect_memory():
+    sizer = _feed(ChunkSizer(rows=5000), fixed_cost=1.0, per_row=0.0001)
+    assert sizer.next_rows() == 5000
+    sizer = _feed(ChunkSizer(rows=5000, max_bytes=400 * 1000), fixed_cost=1.0, per_row=0.0001)
+    assert sizer.next_rows() == 1000
+    assert sizer.report()["mode"] == "fixed"
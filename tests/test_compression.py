@@ -0,0 +1,92 @@
+# tests/test_compression.py
+
+import bz2
+import gzip
+import json
+import struct
+import zipfile
+import zlib
+
+import pytest
+
+from app import compression
+from app.compression import detect_compression, open_input
+from app.schema import preflight
+from batch_ingest import process_csv, process_json
+
+ROWS = "".join(f"{n:010d},044,{n}.00,TX{n}\n" for n in range(5000))
+CSV = ("account_number,bank_code,amount,reference_id\n" + ROWS).encode()
+
+
+def _bgzf(data, block=20000):
+    """bgzip's layout: independent gzip members with their size in a BC extra field."""
+    out = b""
+    for start in range(0, len(data) + 1, block):
+        part = data[start:start + block]
+        deflate = zlib.compressobj(6, zlib.DEFLATED, -15)
+        body = deflate.compress(part) + deflate.flush()
+        header = b"\x1f\x8b\x08\x04\0\0\0\0\0\xff" + struct.pack("<H", 6) + b"BC" + struct.pack("<HH", 2, 25 + len(body))
+        out += header + body + struct.pack("<II", zlib.crc32(part), len(part))
+    return out
+
+
+def _write(tmp_path, kind):
+    path = tmp_path / f"accounts.csv.{kind}"
+    if kind == "gz":
+        path.write_bytes(gzip.compress(CSV))
+    elif kind == "bz2":
+        path.write_bytes(bz2.compress(CSV))
+    elif kind == "zip":
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("export/accounts.csv", CSV)
+    elif kind == "zst":
+        zstandard = pytest.importorskip("zstandard")
+        path.write_bytes(zstandard.ZstdCompressor().compress(CSV))
+    elif kind == "bgzf":
+        path.write_bytes(_bgzf(CSV))
+    return str(path)
+
+
+@pytest.mark.parametrize("kind", ["gz", "bz2", "zip", "zst", "bgzf"])
+def test_compressed_csv_reads_like_plain(tmp_path, monkeypatch, kind):
+    monkeypatch.setattr(compression, "INPUT_DECOMPRESS_THREADS", 4)
+    plain = tmp_path / "accounts.csv"
+    plain.write_bytes(CSV)
+    path = _write(tmp_path, kind)
+    assert detect_compression(path) == {"gz": "gzip", "bgzf": "gzip", "zst": "zstd"}.get(kind, kind)
+    columns = preflight(path, "csv")["projected"]
+    expected = [row for chunk in process_csv(str(plain), columns=columns) for row in chunk]
+    assert [row for chunk in process_csv(path, columns=columns) for row in chunk] == expected
+
+
+def test_bgzf_is_inflated_in_parallel_blocks(tmp_path, monkeypatch):
+    monkeypatch.setattr(compression, "INPUT_DECOMPRESS_THREADS", 3)
+    path = _write(tmp_path, "bgzf")
+    assert compression._is_bgzf(path) and not compression._is_bgzf(_write(tmp_path, "gz"))
+    # Every member is a complete gzip stream, so the plain reader agrees
+    assert gzip.decompress(open(path, "rb").read()) == CSV
+    assert b"".join(compression._bgzf_blocks(path, 3)) == CSV
+
+
+def test_json_and_zip_errors(tmp_path):
+    path = tmp_path / "accounts.json.gz"
+    path.write_bytes(gzip.compress(json.dumps([{"account_number": "1", "bank_code": "044", "amount": "1", "reference_id": "a"}]).encode()))
+    assert preflight(str(path), "json")["ignored"] == []
+    assert next(process_json(str(path)))[0]["bank_code"] == "044"
+
+    archive = tmp_path / "two.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("a.csv", CSV)
+        zf.writestr("b.csv", CSV)
+    with pytest.raises(ValueError, match="exactly one"):
+        open_input(str(archive)).read()
+
+
+def test_closing_early_stops_the_decompression_thread(tmp_path):
+    path = tmp_path / "big.csv.gz"
+    path.write_bytes(gzip.compress(CSV * 200))
+    f = open_input(str(path))
+    assert f.read(14) == b"account_number"
+    thread = f.raw._thread
+    f.close()
+    assert not thread.is_alive()
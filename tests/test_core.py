@@ -0,0 +1,43 @@
+# tests/test_core.py
+
+import subprocess
+import sys
+import textwrap
+
+import bulk_validator.core as core
+
+
+def _loaded_after(code):
+    """Modules a fresh interpreter has imported after running `code`."""
+    probe = textwrap.dedent(code) + "\nimport sys\nprint(' '.join(sorted(sys.modules)))\n"
+    out = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True).stdout
+    return set(out.split())
+
+
+def test_core_and_cli_import_no_web_or_heavy_modules():
+    loaded = _loaded_after("import bulk_validator.core")
+    assert not {"fastapi", "pandas", "cryptography"} & loaded
+
+    # Parsing arguments (and --help) happens before the ingest module is loaded
+    loaded = _loaded_after("""
+        from bulk_validator.core.cli import build_parser
+        build_parser().parse_args(['accounts.csv', '--type', 'csv', '--scan'])
+    """)
+    assert not {"fastapi", "pandas", "cryptography", "openpyxl", "bulk_validator.core.ingest"} & loaded
+
+    loaded = _loaded_after("import bulk_validator.core.ingest")
+    assert "pandas" in loaded and "fastapi" not in loaded and "cryptography" not in loaded
+
+
+def test_lazy_exports():
+    from bulk_validator.core import chunks, ingest
+
+    assert core.run_batch is ingest.run_batch and core.tokenize_value is chunks.tokenize_value
+    assert core.tokenize_value("0123456789", "ACC").startswith("ACC-")
+    assert set(core.__all__) <= set(dir(core))
+    try:
+        core.no_such_name
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError("unknown names must raise AttributeError")
@@ -0,0 +1,82 @@
+# tests/test_downloads.py
+
+import csv
+import gzip
+import io
+import json
+import zipfile
+import zlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import downloads, job_store
+from app.main import app
+
+client = TestClient(app)
+
+CSV = b"account_number,bank_code,status\n" + b"ACC-1,044,Valid\n" * 5000
+
+
+@pytest.fixture
+def run(tmp_path, monkeypatch):
+    """A finished run with a chunk report, one chunk output and a partition dir, all under a temp output dir."""
+    out = tmp_path / "output"
+    (out / "run_r1_partitions" / "bank_code=044").mkdir(parents=True)
+    (out / "run_r1_partitions" / "bank_code=044" / "part-00000.csv").write_bytes(CSV)
+    (out / "chunk_1.csv").write_bytes(CSV)
+    (out / "chunk_1.xlsx").write_bytes(b"PK\x03\x04 not really a workbook")
+    with open(out / "run_r1_chunks.csv", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["chunk", "files"])
+        writer.writerow([1, json.dumps({"csv": str(out / "chunk_1.csv"), "xlsx": str(out / "chunk_1.xlsx")})])
+    (tmp_path / "secret.txt").write_text("not an output")
+    monkeypatch.setattr(downloads, "OUTPUT_DIR", str(out))
+    monkeypatch.setattr(job_store, "JOB_STORE_PATH", str(tmp_path / "jobs.sqlite3"))
+    job_store.record_job("r1", kind="batch_csv", status="done", files={
+        "chunk_report": str(out / "run_r1_chunks.csv"),
+        "partitions": str(out / "run_r1_partitions"),
+        "stray": str(tmp_path / "secret.txt"),
+    })
+    return out
+
+
+def test_run_files_are_listed_and_confined_to_output(run):
+    names = [f["name"] for f in client.get("/runs/r1/files").json()["files"]]
+    assert sorted(names) == ["chunk_1.csv", "chunk_1.xlsx", "run_r1_chunks.csv", "run_r1_partitions/bank_code=044/part-00000.csv"]
+    assert client.get("/runs/r1/files/../secret.txt").status_code == 404
+    assert client.get("/runs/missing/files").status_code == 404
+    assert client.get("/download/..%2Fsecret.txt").status_code == 404
+
+
+def test_range_etag_and_compression(run):
+    whole = client.get("/runs/r1/files/chunk_1.csv", headers={"accept-encoding": "identity"})
+    assert whole.content == CSV and "content-encoding" not in whole.headers
+
+    part = client.get("/runs/r1/files/chunk_1.csv", headers={"range": "bytes=100-199", "accept-encoding": "gzip"})
+    assert part.status_code == 206 and part.content == CSV[100:200]
+
+    raw = client.stream("GET", "/runs/r1/files/chunk_1.csv", headers={"accept-encoding": "gzip"})
+    with raw as response:
+        assert response.headers["content-encoding"] == "gzip"
+        body = b"".join(response.iter_raw())
+    assert len(body) < len(CSV) // 10 and gzip.decompress(body) == CSV
+
+    # Each encoding has its own tag; a matching one short-circuits to 304
+    etag = whole.headers["etag"]
+    assert client.get("/runs/r1/files/chunk_1.csv", headers={"if-none-match": etag, "accept-encoding": "identity"}).status_code == 304
+    assert client.get("/runs/r1/files/chunk_1.csv", headers={"if-none-match": etag, "accept-encoding": "gzip"}).status_code == 200
+
+
+def test_bundle_streams_every_run_file(run):
+    response = client.get("/runs/r1/bundle.zip")
+    assert response.headers["content-type"] == "application/zip"
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert archive.testzip() is None
+    assert archive.read("run_r1_partitions/bank_code=044/part-00000.csv") == CSV
+    # Text is deflated; already-compressed formats are stored as is
+    assert archive.getinfo("chunk_1.csv").compress_type == zipfile.ZIP_DEFLATED
+    assert archive.getinfo("chunk_1.xlsx").compress_type == zipfile.ZIP_STORED
+    # Deflated at DOWNLOAD_COMPRESSLEVEL, not zlib's default
+    raw = zlib.compressobj(downloads.DOWNLOAD_COMPRESSLEVEL, zlib.DEFLATED, -15)
+    assert archive.getinfo("chunk_1.csv").compress_size == len(raw.compress(CSV) + raw.flush())
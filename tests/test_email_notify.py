@@ -0,0 +1,113 @@
+# tests/test_email_notify.py
+"""
+Notification queue against a local SMTP stub (the same role mailhog plays
+in docker-compose): messages are captured in memory, connections counted.
+"""
+import email
+import io
+import socketserver
+import threading
+import zipfile
+
+import pytest
+
+from app.email_notify import Notifier, send_validation_report_email
+
+
+class _SMTPStub(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _SMTPHandler)
+        self.messages = []
+        self.connections = 0
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply("220 stub")
+        while True:
+            line = self.rfile.readline().decode().strip()
+            if not line:
+                return
+            verb = line.split(" ")[0].upper()
+            if verb == "EHLO":
+                self.reply("250 stub")
+            elif verb == "DATA":
+                self.reply("354 go ahead")
+                data = []
+                while True:
+                    chunk = self.rfile.readline()
+                    if chunk == b".\r\n":
+                        break
+                    data.append(chunk)
+                self.server.messages.append(email.message_from_bytes(b"".join(data)))
+                self.reply("250 queued")
+            elif verb == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+@pytest.fixture
+def smtp_stub():
+    server = _SMTPStub()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _notifier(server):
+    host, port = server.server_address
+    return Notifier(settings={"host": host, "port": port, "user": None, "password": None, "sender": "bv@test"})
+
+
+def _attachments(message):
+    return {part.get_filename(): part.get_payload(decode=True) for part in message.walk() if part.get_filename()}
+
+
+def test_queued_emails_share_one_connection_and_attach_a_zip(smtp_stub, tmp_path):
+    (tmp_path / "report.csv").write_text("chunk,records\n1,10\n")
+    (tmp_path / "parts").mkdir()
+    (tmp_path / "parts" / "part-00000.csv").write_text("a,b\n" * 1000)
+    notifier = _notifier(smtp_stub)
+
+    first = notifier.submit("ops@example.com", "Run done", "body", artifact_paths=[
+        str(tmp_path / "report.csv"), str(tmp_path / "parts"), str(tmp_path / "missing.csv"),
+    ], artifact_zip=str(tmp_path / "run.zip"), run_id="abc")
+    second = notifier.submit("ops@example.com", "Plain", "no files")
+    assert first.result(timeout=10)["artifact"]["files"] == 2
+    second.result(timeout=10)
+    notifier.close(timeout=10)
+
+    assert smtp_stub.connections == 1
+    assert [m["Subject"] for m in smtp_stub.messages] == ["Run done", "Plain"]
+    archive = zipfile.ZipFile(io.BytesIO(_attachments(smtp_stub.messages[0])["run.zip"]))
+    assert sorted(archive.namelist()) == ["parts/part-00000.csv", "report.csv"]
+
+
+def test_oversized_artifact_is_linked_instead(smtp_stub, tmp_path):
+    (tmp_path / "report.csv").write_text("x" * 10000)
+    notifier = _notifier(smtp_stub)
+    outcome = notifier.submit("ops@example.com", "Big run", "body", artifact_paths=[str(tmp_path / "report.csv")],
+                              artifact_zip=str(tmp_path / "run.zip"), run_id="abc", max_bytes=10).result(timeout=10)
+    notifier.close(timeout=10)
+
+    message = smtp_stub.messages[0]
+    assert _attachments(message) == {}
+    assert outcome["link"] in message.get_payload(decode=True).decode()
+    assert "/runs/abc/artifact.zip" in outcome["link"]
+
+
+def test_unconfigured_email_fails_fast(monkeypatch):
+    for var in ("EMAIL_HOST", "EMAIL_USER", "EMAIL_PASS"):
+        monkeypatch.delenv(var, raising=False)
+    with pytest.raises(RuntimeError):
+        send_validation_report_email("ops@example.com", "s", "b")
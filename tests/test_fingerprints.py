@@ -0,0 +1,71 @@
+# tests/test_fingerprints.py
+
+import asyncio
+
+import pandas as pd
+
+from app import fingerprints
+from app.main import validate_accounts_parallel
+from app.normalize import normalize_records
+from app.validators.account_validator import AccountValidator
+from app.validators.rules import Rule, RuleEngine
+
+ROWS = [
+    {"account_number": "0123456789", "bank_code": "999", "amount": "10.00", "reference_id": "TX1"},
+    {"account_number": "12", "bank_code": "044", "amount": "-1", "reference_id": "TX2"},
+    {"account_number": "0000000000", "bank_code": "044", "amount": "5.00", "reference_id": "TX3"},
+]
+
+
+def _validate(rows, validator=None):
+    df = pd.DataFrame(rows)
+    return asyncio.run(validate_accounts_parallel(df, validator=validator, use_cache=True))
+
+
+def test_resubmission_only_revalidates_changed_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(fingerprints, "FINGERPRINT_PATH", str(tmp_path / "fp.sqlite3"))
+    first = _validate(ROWS)
+    assert not any(result.get("cached") for result in first)
+
+    changed = [dict(ROWS[0]), dict(ROWS[1], amount="7.00"), dict(ROWS[2])]
+    second = _validate(changed)
+    assert [bool(result.get("cached")) for result in second] == [True, False, True]
+    assert second[0]["status"] == first[0]["status"] == "Invalid"
+    assert second[0]["errors"] == first[0]["errors"]
+
+
+def test_expired_bank_checks_and_other_rulesets_miss(tmp_path, monkeypatch):
+    path = str(tmp_path / "fp.sqlite3")
+    records = normalize_records(pd.DataFrame(ROWS))
+    hashes = fingerprints.row_hashes(records)
+    results = [
+        {"status": "Invalid", "errors": [{"type": "bank_code_validation", "code": "BE04", "message": "Invalid bank code"}]},
+        {"status": "Valid", "errors": []},
+        {"status": "Invalid", "errors": [{"type": "processing_error", "code": "PE01", "message": "boom"}]},
+    ]
+    fingerprints.store(hashes, results, "v1", path=path)
+    found = fingerprints.lookup(hashes, "v1", path=path)
+    # Processing errors are transient and never cached
+    assert set(found) == {hashes[0], hashes[1]}
+    assert found[hashes[1]] == {"status": "Valid", "errors": []}
+    assert fingerprints.lookup(hashes, "v2", path=path) == {}
+
+    # Results that depended on the bank API expire; pure rule failures don't
+    monkeypatch.setattr(fingerprints, "BANK_CHECK_TTL", -1)
+    assert set(fingerprints.lookup(hashes, "v1", path=path)) == {hashes[0]}
+    assert fingerprints.prune("v1", path=path) == 1
+
+
+def test_ruleset_changes_with_rules_and_registries():
+    def engine(codes):
+        return RuleEngine([Rule(name="bank", code="BE04", message="m", check=lambda ctx: ctx["bank_code"] not in codes)])
+
+    base = engine({"044"}).fingerprint()
+    assert engine({"044"}).fingerprint() == base
+    assert engine({"044", "058"}).fingerprint() != base
+    changed = RuleEngine([Rule(name="bank", code="BE04", message="m", check=lambda ctx: ctx["bank_code"] in {"044"})])
+    assert changed.fingerprint() != base
+
+    default = AccountValidator().ruleset
+    assert AccountValidator().ruleset == default
+    assert AccountValidator(engine=engine({"044"})).ruleset != default
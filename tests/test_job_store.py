@@ -0,0 +1,45 @@
+# tests/test_job_store.py
+
+import json
+import multiprocessing
+
+from cryptography.fernet import Fernet
+
+from app import job_store, token_vault
+
+
+def _append_batches(path, worker, n):
+    for i in range(n):
+        token_vault.write_batch({f"ACC-{worker:02d}{i:06x}": "1234567890" * 50}, {}, path)
+        job_store.record_job(f"job-{worker}-{i}", kind="upload_csv", status="done", summary={"total_accounts": i})
+
+
+def test_workers_share_vault_and_job_store(tmp_path, monkeypatch):
+    monkeypatch.setenv("TOKEN_MAP_KEY", Fernet.generate_key().decode())
+    monkeypatch.setattr(job_store, "JOB_STORE_PATH", str(tmp_path / "jobs.sqlite3"))
+    path = str(tmp_path / "token_map.jsonl")
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=_append_batches, args=(path, w, 25)) for w in range(4)]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join()
+        assert p.exitcode == 0
+
+    # Every append landed as one whole line
+    with open(path) as f:
+        entries = [json.loads(line) for line in f]
+    assert len(entries) == 100
+    assert token_vault.lookup_token("ACC-03000018", path)[0] == "1234567890" * 50
+
+    job = job_store.get_job("job-2-24")
+    assert job["status"] == "done" and job["summary"] == {"total_accounts": 24}
+    assert job_store.get_job("missing") is None
+
+
+def test_settings_reach_other_connections(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    job_store.set_setting("api_profiling", "1", path=path)
+    ctx = multiprocessing.get_context("fork")
+    with ctx.Pool(1) as pool:
+        assert pool.apply(job_store.get_setting, ("api_profiling", None, path)) == "1"
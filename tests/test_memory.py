@@ -0,0 +1,112 @@
+# tests/test_memory.py
+"""
+Memory ceiling for batch ingest: peak memory must not grow with row count.
+
+Generates short and long input files and compares their tracemalloc peaks:
+through each reader (csv, json, xml) on its own, and through a full CSV
+ingest. Set BV_MEMORY_TEST_ROWS=10000000 for the full 10M-row ceiling
+check.
+"""
+import json
+import os
+import tracemalloc
+
+import pytest
+from cryptography.fernet import Fernet
+
+from app.chunking import ChunkSizer
+
+ROWS = int(os.getenv("BV_MEMORY_TEST_ROWS", "24000"))
+CHUNK_SIZE = 1000
+# Enough chunks to fill every pipeline queue in the baseline run
+BASELINE_ROWS = 8 * CHUNK_SIZE
+# Allowed growth of the long run's peak over the short run's peak
+HEADROOM_BYTES = 4 * 1024 * 1024
+# Readers alone hold one chunk; anything kept per row shows up well above this.
+# The short file is larger than pandas' CSV read buffer, which fills up to ~900KB.
+READER_BASELINE_ROWS = 24 * CHUNK_SIZE
+READER_ROWS = max(ROWS, 3 * READER_BASELINE_ROWS)
+READER_HEADROOM_BYTES = 512 * 1024
+
+
+def _row(n):
+    return {"account_number": f"{n:010d}", "bank_code": "044", "amount": f"{n % 5000}.50", "reference_id": f"TX{n}"}
+
+
+def write_input(path, ext, rows):
+    """Stream `rows` generated accounts to `path` as csv, json or xml."""
+    with open(path, "w") as f:
+        if ext == "csv":
+            f.write("account_number,bank_code,amount,reference_id\n")
+            for n in range(rows):
+                row = _row(n)
+                f.write(",".join(row.values()) + "\n")
+        elif ext == "json":
+            f.write("[")
+            for n in range(rows):
+                f.write(("," if n else "") + json.dumps(_row(n)))
+            f.write("]")
+        else:
+            f.write("<records>")
+            for n in range(rows):
+                f.write("<record>" + "".join(f"<{k}>{v}</{k}>" for k, v in _row(n).items()) + "</record>")
+            f.write("</records>")
+    return str(path)
+
+
+def _read_peak(ext, path, rows):
+    from bulk_validator.core.ingest import READERS
+
+    tracemalloc.reset_peak()
+    count = 0
+    for batch in READERS[ext](path, sizer=ChunkSizer(rows=CHUNK_SIZE)):
+        count += len(batch)
+        del batch
+    assert count == rows
+    return tracemalloc.get_traced_memory()[1]
+
+
+def _ingest_peak(ext, path, rows, tmp_path):
+    from bulk_validator.core.ingest import READERS, run_batch
+
+    tracemalloc.reset_peak()
+    aggregator, chunks, _, _ = run_batch(
+        READERS[ext](path, sizer=ChunkSizer(rows=CHUNK_SIZE)), ext,
+        report_path=str(tmp_path / "output" / "report.csv"),
+        output_formats=("csv",),
+    )
+    assert aggregator.total == rows
+    return tracemalloc.get_traced_memory()[1]
+
+
+@pytest.mark.parametrize("ext", ["csv", "json", "xml"])
+def test_reader_memory_does_not_grow_with_rows(ext, tmp_path):
+    warmup = write_input(tmp_path / f"warmup.{ext}", ext, 2 * CHUNK_SIZE)
+    short = write_input(tmp_path / f"short.{ext}", ext, READER_BASELINE_ROWS)
+    long = write_input(tmp_path / f"long.{ext}", ext, READER_ROWS)
+    tracemalloc.start()
+    try:
+        _read_peak(ext, warmup, 2 * CHUNK_SIZE)
+        short_peak = _read_peak(ext, short, READER_BASELINE_ROWS)
+        long_peak = _read_peak(ext, long, READER_ROWS)
+    finally:
+        tracemalloc.stop()
+    assert long_peak <= short_peak + READER_HEADROOM_BYTES, (short_peak, long_peak)
+
+
+def test_batch_ingest_memory_does_not_grow_with_rows(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("TOKEN_MAP_KEY", Fernet.generate_key().decode())
+    os.makedirs("output")
+    warmup = write_input(tmp_path / "warmup.csv", "csv", 2 * CHUNK_SIZE)
+    short = write_input(tmp_path / "short.csv", "csv", BASELINE_ROWS)
+    long = write_input(tmp_path / "long.csv", "csv", ROWS)
+    tracemalloc.start()
+    try:
+        # Warm up imports and caches before measuring
+        _ingest_peak("csv", warmup, 2 * CHUNK_SIZE, tmp_path)
+        short_peak = _ingest_peak("csv", short, BASELINE_ROWS, tmp_path)
+        long_peak = _ingest_peak("csv", long, ROWS, tmp_path)
+    finally:
+        tracemalloc.stop()
+    assert long_peak <= short_peak + HEADROOM_BYTES, (short_peak, long_peak)
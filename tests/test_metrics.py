@@ -0,0 +1,28 @@
+# tests/test_metrics.py
+
+from app.metrics import MetricsRegistry
+
+
+def test_stage_timer_renders_prometheus_histogram():
+    registry = MetricsRegistry(enabled=True)
+    with registry.stage("validate", rows=10):
+        pass
+    registry.set_gauge("bv_queue_depth", 3, queue="validate_inflight")
+    text = registry.render_prometheus()
+    assert "# TYPE bv_stage_seconds histogram" in text
+    assert 'bv_stage_seconds_count{stage="validate"} 1' in text
+    assert 'bv_stage_rows_total{stage="validate"} 10' in text
+    assert 'bv_queue_depth{queue="validate_inflight"} 3' in text
+    snapshot = registry.snapshot()
+    assert snapshot["stages"]["validate"]["rows"] == 10
+
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry(enabled=False)
+    with registry.stage("parse", rows=5):
+        pass
+    registry.inc("bv_rows_total", 5, status="valid")
+    registry.record_rules({"length_error": [1, 0.1, 1]})
+    assert registry.render_prometheus() == "\n"
+    assert registry.snapshot()["stages"] == {}
+
@@ -0,0 +1,74 @@
+# tests/test_mongo_import.py
+
+import asyncio
+import json
+
+import pytest
+
+from scripts import import_valid_accounts_to_mongo as importer
+from scripts.import_valid_accounts_to_mongo import import_accounts, iter_batches
+
+
+def _write_accounts(path, n):
+    accounts = [{"account_number": f"{i:010d}", "bank_code": "044"} for i in range(n)]
+    accounts += [{"account_number": "0000000001", "bank_code": "044", "name": "updated"}, {"bank_code": "044"}]
+    path.write_text(json.dumps(accounts))
+
+
+def test_batches_stream_dedupe_and_skip(tmp_path):
+    path = tmp_path / "accounts.json"
+    _write_accounts(path, 25)
+    stats = {}
+    batches = list(iter_batches(str(path), batch_size=10, stats=stats))
+    assert [len(b) for b in batches] == [10, 10, 6]
+    assert stats == {"read": 27, "skipped": 1}
+
+
+def test_import_swaps_in_a_complete_indexed_collection(tmp_path):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    db = mongomock_motor.AsyncMongoMockClient()["bulk_validator"]
+    path = tmp_path / "accounts.json"
+
+    async def run():
+        await db["valid_accounts"].insert_one({"account_number": "stale", "bank_code": "000"})
+        _write_accounts(path, 25)
+        stats = await import_accounts(str(path), db=db, batch_size=4, concurrency=3)
+        names = await db.list_collection_names()
+        docs = await db["valid_accounts"].find({"account_number": "0000000001"}).to_list(None)
+        indexes = await db["valid_accounts"].index_information()
+        return stats, names, docs, indexes
+
+    stats, names, docs, indexes = asyncio.run(run())
+    assert stats["accounts"] == 25 and stats["skipped"] == 1
+    assert names == ["valid_accounts"]
+    assert len(docs) == 1 and docs[0]["name"] == "updated"
+    assert indexes["account_bank_unique"]["unique"]
+
+
+def test_later_record_wins_when_its_batch_lands_first(tmp_path, monkeypatch):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    db = mongomock_motor.AsyncMongoMockClient()["bulk_validator"]
+    path = tmp_path / "accounts.json"
+    accounts = [{"account_number": "0000000001", "bank_code": "044", "name": "old"}]
+    accounts += [{"account_number": f"{i:010d}", "bank_code": "044"} for i in range(2, 6)]
+    accounts += [{"account_number": "0000000001", "bank_code": "044", "name": "new"}]
+    path.write_text(json.dumps(accounts))
+    upsert_batch = importer.upsert_batch
+    finished = []
+
+    async def first_batch_lands_last(collection, batch):
+        if any(account.get("name") == "old" for account in batch):
+            await asyncio.sleep(0.05)
+        result = await upsert_batch(collection, batch)
+        finished.append(batch[0]["account_number"])
+        return result
+
+    monkeypatch.setattr(importer, "upsert_batch", first_batch_lands_last)
+
+    async def run():
+        await import_accounts(str(path), db=db, batch_size=3, concurrency=2)
+        return await db["valid_accounts"].find({"account_number": "0000000001"}).to_list(None)
+
+    docs = asyncio.run(run())
+    assert finished == ["0000000004", "0000000001"]
+    assert len(docs) == 1 and docs[0]["name"] == "new"
@@ -0,0 +1,81 @@
+# tests/test_partitioning.py
+
+import csv
+import os
+
+import pandas as pd
+import pytest
+
+from app.partitioning import BankPartitionWriter, partition_dir
+
+
+def _chunk(rows):
+    return pd.DataFrame([
+        {
+            "account_token": f"ACC-{acct}",
+            "bank_code": bank,
+            "amount": amount,
+            "reference_token": f"REF-{ref}",
+            "status": status,
+            "errors": [] if status == "Valid" else [{"field": "amount", "type": "invalid_amount"}],
+        }
+        for bank, acct, ref, amount, status in rows
+    ])
+
+
+CHUNKS = [
+    _chunk([("044", "a1", "r3", 100, "Valid"), ("058", "a2", "r1", 200, "Valid"), ("044", "a3", "r1", -5, "Invalid")]),
+    _chunk([("044", "a4", "r2", 300, "Valid"), ("044", "a1", "r3", 100, "Valid"), ("058", "a5", "r0", 50, "Valid")]),
+    _chunk([("044", "a6", "r0", 400, "Valid"), ("../x", "a7", "r9", 1, "Invalid")]),
+]
+
+
+def _read(root, bank, status):
+    directory = partition_dir(root, bank, status)
+    rows = []
+    for name in sorted(os.listdir(directory)):
+        with open(os.path.join(directory, name), newline="") as f:
+            rows.extend(csv.DictReader(f))
+    return rows
+
+
+def _write(root, **kwargs):
+    writer = BankPartitionWriter(str(root), **kwargs)
+    for chunk in CHUNKS:
+        writer.add(chunk)
+    return writer.close()
+
+
+@pytest.mark.parametrize("memory_rows", [100, 1])
+def test_sorted_partitions_are_sorted_and_deduplicated(tmp_path, memory_rows):
+    # memory_rows=1 spills after every chunk and exercises the external merge
+    manifest = _write(tmp_path, memory_rows=memory_rows)
+    rows = _read(tmp_path, "044", "Valid")
+    assert [r["reference_token"] for r in rows] == ["REF-r0", "REF-r2", "REF-r3"]
+    assert manifest["044"]["valid"] == {
+        "path": partition_dir(str(tmp_path), "044", "Valid"), "rows": 3, "duplicates_dropped": 1,
+    }
+    assert [r["account_token"] for r in _read(tmp_path, "058", "Valid")] == ["ACC-a5", "ACC-a2"]
+    assert _read(tmp_path, "044", "Invalid")[0]["errors"] == '[{"field": "amount", "type": "invalid_amount"}]'
+    assert not os.path.exists(tmp_path / "_spill")
+
+
+def test_bank_codes_cannot_escape_the_dataset(tmp_path):
+    _write(tmp_path / "ds")
+    assert os.path.isdir(tmp_path / "ds" / "bank_code=..%2Fx" / "status=invalid")
+    assert not os.path.exists(tmp_path / "x")
+
+
+def test_append_mode_keeps_input_order(tmp_path):
+    manifest = _write(tmp_path, mode="append")
+    assert [r["reference_token"] for r in _read(tmp_path, "044", "Valid")] == ["REF-r3", "REF-r2", "REF-r3", "REF-r0"]
+    assert manifest["044"]["valid"]["rows"] == 4
+
+
+def test_parquet_dataset_round_trips(tmp_path):
+    pytest.importorskip("pyarrow")
+    import pyarrow.dataset as ds
+
+    _write(tmp_path, fmt="parquet")
+    table = ds.dataset(str(tmp_path), format="parquet", partitioning="hive").to_table()
+    assert table.num_rows == 7
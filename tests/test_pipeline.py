@@ -0,0 +1,59 @@
+# tests/test_pipeline.py
+
+import time
+
+import pytest
+
+from app.pipeline import Pipeline, Stage
+
+
+def test_pipeline_keeps_order_and_reports_bottleneck():
+    def slow(x):
+        time.sleep(0.005)
+        return x * 2
+
+    pipeline = Pipeline([
+        Stage("inc", lambda x: x + 1),
+        Stage("double", slow, workers=3),
+        Stage("collect", lambda x: x),
+    ], depth=2)
+    out = list(pipeline.run(range(50)))
+    assert out == [(i + 1) * 2 for i in range(50)]
+
+    report = pipeline.utilization()
+    assert report["bottleneck"] == "double"
+    assert report["stages"]["read"]["items"] == 50
+    assert all(size <= 2 for size in report["max_queue_depth"].values())
+
+
+def test_pipeline_reraises_stage_errors():
+    def boom(x):
+        if x == 3:
+            raise ValueError("bad chunk")
+        return x
+
+    pipeline = Pipeline([Stage("check", boom), Stage("write", lambda x: x)], depth=1)
+    with pytest.raises(ValueError, match="bad chunk"):
+        list(pipeline.run(range(100)))
+
+
+def test_cancel_drops_queued_items_and_closes_the_source():
+    closed, written = [], []
+
+    def source():
+        try:
+            for i in range(1000):
+                yield i
+        finally:
+            closed.append(True)
+
+    def check(x):
+        if x == 5:
+            pipeline.cancel()
+        return x
+
+    pipeline = Pipeline([Stage("check", check), Stage("pad", lambda x: x), Stage("write", written.append)], depth=2)
+    list(pipeline.run(source()))
+    # Neither the item that tripped the cancel nor anything behind it reaches a later stage
+    assert written == [0, 1, 2, 3, 4]
+    assert closed == [True]
@@ -0,0 +1,45 @@
+# tests/test_profiling.py
+
+import asyncio
+import json
+import time
+
+from app import main
+from app.profiling import SamplingProfiler, format_rule_stats
+
+
+def test_sampling_profiler_writes_flamegraph_outputs(tmp_path):
+    with SamplingProfiler(interval=0.001) as profiler:
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            sum(range(1000))
+    paths = profiler.write(str(tmp_path / "run_test"), rules=format_rule_stats({"length_error": [4, 0.002, 1]}))
+    collapsed = open(paths["profile_collapsed"]).read()
+    # Every live thread is sampled (idle pool threads from earlier tests too)
+    assert any(line.startswith("thread:MainThread;") for line in collapsed.splitlines())
+    speedscope = json.load(open(paths["profile_speedscope"]))
+    assert speedscope["profiles"][0]["type"] == "sampled"
+    summary = json.load(open(paths["profile_summary"]))
+    assert summary["rules"]["length_error"]["mean_us"] == 500.0
+    assert summary["scope"] == "process" and "thread:MainThread" in summary["threads"]
+
+
+def test_profiled_uploads_run_one_at_a_time(monkeypatch):
+    running, peak = 0, 0
+
+    async def upload(records, source_type, output_formats, profile=False):
+        nonlocal running, peak
+        assert profile
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return source_type
+
+    monkeypatch.setattr(main, "api_profiling_enabled", lambda: True)
+    monkeypatch.setattr(main, "_validate_and_output", upload)
+
+    async def both():
+        return await asyncio.gather(main.validate_and_output([], "csv"), main.validate_and_output([], "xml"))
+    assert asyncio.run(both()) == ["csv", "xml"]
+    assert peak == 1
@@ -0,0 +1,109 @@
+# tests/test_rules.py
+
+import asyncio
+from app.validators.rules import Rule, RuleEngine
+from app.validators.account_validator import AccountValidator
+
+
+def _validate(record, **kwargs):
+    return asyncio.run(AccountValidator(collect_timings=False).validate(record, **kwargs))
+
+
+def test_iban_skips_local_rules():
+    validator = AccountValidator(collect_timings=True)
+    result = asyncio.run(validator.validate({
+        "account_number": "GB82WEST12345698765432",
+        "bank_code": "nan",
+        "amount": 100.0,
+        "reference_id": "TX1",
+    }))
+    assert not [e for e in result["errors"] if e["type"] != "bank_api_error"]
+    assert "length_error" not in validator.rule_stats
+    assert "iban_format_or_checksum" in validator.rule_stats
+
+
+def test_bank_validator_errors_share_rule_shape_and_keep_other_checks():
+    result = _validate({"account_number": "1234", "bank_code": "001", "amount": -5, "reference_id": "TX1"})
+    assert [e["type"] for e in result["errors"]] == ["bank_account_format", "amount_validation"]
+    assert all({"type", "code", "message"} <= set(e) for e in result["errors"])
+
+
+def test_generic_format_rules_still_run_after_bank_validator_passes():
+    validator = AccountValidator(collect_timings=True)
+    asyncio.run(validator.validate({"account_number": "MF389117", "bank_code": "002", "amount": 5, "reference_id": "TX1"}))
+    assert {"bank_account_format", "length_error", "alphanumeric_format"} <= set(validator.rule_stats)
+    assert validator.rule_stats["bank_account_format"][2] == 0
+
+
+def test_bank_validator_also_checks_ibans():
+    result = _validate({"account_number": "GB82WEST12345698765432", "bank_code": "001", "amount": 5, "reference_id": "TX1"})
+    assert [e["type"] for e in result["errors"]] == ["bank_account_format"]
+
+
+def test_missing_fields_are_a_format_error():
+    base = {"account_number": "GB82WEST12345698765432", "bank_code": "001", "amount": 5, "reference_id": "TX1"}
+    for missing in ({"bank_code": ""}, {"amount": None}, {"reference_id": None}, {"account_number": " "}):
+        result = _validate({**base, **missing})
+        assert [e["type"] for e in result["errors"]] == ["format_error"], missing
+    # Present but bad values still go to their rules
+    assert [e["type"] for e in _validate({**base, "account_number": "1234567890", "amount": "x", "reference_id": ""})["errors"]] == [
+        "bank_account_format", "amount_validation", "reference_id_validation"]
+
+
+def test_fail_fast_stops_at_first_failure():
+    record = {"account_number": "12#4", "bank_code": "999", "amount": -5, "reference_id": ""}
+    assert len(_validate(record)["errors"]) == 5
+    assert len(_validate(record, fail_fast=True)["errors"]) == 1
+
+
+def test_engine_reorders_by_observed_rejection_and_respects_requires():
+    engine = RuleEngine([
+        Rule("rarely_fails", "X1", "x", check=lambda ctx: False, cost=1),
+        Rule("often_fails", "X2", "x", check=lambda ctx: True, cost=2),
+        Rule("dependent", "X3", "x", check=lambda ctx: True, requires=("often_fails",), cost=0.1),
+    ], reorder_every=10)
+    for _ in range(50):
+        failed = engine.evaluate({}, fail_fast=False)
+        assert [r.name for r in failed] == ["often_fails"]
+    assert engine.order == ["often_fails", "dependent", "rarely_fails"]
+
+
+def test_normalize_frame_matches_single_record_path():
+    import pandas as pd
+    from app.normalize import normalize_frame, normalize_record
+
+    df = pd.DataFrame({
+        "account_number": [" gb82west12345698765432 ", "1234567890", "MF389117", "12#4", None],
+        "bank_code": ["", "001", "002", "001", "003"],
+        "amount": ["10.50", "abc", "3", None, "7"],
+        "reference_id": ["TX1", "TX2", None, "TX4", "TX5"],
+    })
+    frame = normalize_frame(df)
+    assert frame["account_kind"].tolist() == ["iban", "numeric", "alnum", "invalid_charset", "empty"]
+    assert frame["account_number"].iloc[0] == "GB82WEST12345698765432"
+    assert frame["account_length"].tolist() == [22, 10, 8, 4, 0]
+    assert frame["amount_minor"].tolist()[:3] == [1050, 0, 300]
+    assert frame["amount_ok"].tolist() == [True, False, True, False, True]
+    for (_, row), raw in zip(frame.iterrows(), df.to_dict(orient="records")):
+        single = normalize_record(raw)
+        assert single["account_kind"] == row["account_kind"]
+        assert single["account_number"] == row["account_number"]
+        assert single["amount_ok"] == row["amount_ok"]
+
+
+def test_engine_counters_and_schedule_survive_concurrent_evaluation():
+    from concurrent.futures import ThreadPoolExecutor
+
+    engine = RuleEngine([
+        Rule("first", "X1", "x", check=lambda ctx: ctx["n"] % 2 == 0, cost=1),
+        Rule("second", "X2", "x", check=lambda ctx: ctx["n"] % 3 == 0, cost=1),
+        Rule("third", "X3", "x", check=lambda ctx: False, requires=("first",), cost=1),
+    ], reorder_every=7)
+    calls = 20000
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda n: engine.evaluate({"n": n}), range(calls)))
+    assert engine.evaluations["first"] == engine.evaluations["second"] == calls
+    assert engine.evaluations["third"] == calls // 2
+    assert engine.failures["first"] == sum(1 for failed in results if failed and failed[0].name == "first")
+    assert engine.failures["second"] == len([n for n in range(calls) if n % 3 == 0])
+    assert sorted(engine.order) == ["first", "second", "third"]
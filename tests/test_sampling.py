@@ -0,0 +1,64 @@
+# tests/test_sampling.py
+
+import random
+
+import pytest
+
+from app import sampling
+from app.bank_strategies import BANK_GENERATORS
+from batch_ingest import run_scan
+
+
+def test_wilson_interval():
+    low, high = sampling.wilson_interval(0.5, 100, 0.95)
+    assert low == pytest.approx(0.4038, abs=1e-4) and high == pytest.approx(0.5962, abs=1e-4)
+    assert sampling.wilson_interval(0.0, 50, 0.95)[0] == 0.0
+
+
+def test_reservoir_is_uniform():
+    hits = [0] * 100
+    for seed in range(2000):
+        sample, seen = sampling.reservoir_sample(range(100), 10, random.Random(seed))
+        assert seen == 100 and len(set(sample)) == 10
+        for item in sample:
+            hits[item] += 1
+    # Every item is kept ~10% of the time, early and late ones alike
+    assert min(hits) > 140 and max(hits) < 270
+    assert sampling.reservoir_sample(range(3), 10)[0] == [0, 1, 2]
+
+
+def test_offset_sample_weights_long_and_short_lines(tmp_path):
+    path = tmp_path / "wide.csv"
+    rng = random.Random(0)
+    with open(path, "w") as f:
+        f.write("account_number,bank_code,amount,reference_id,note\n")
+        for i in range(20000):
+            # Every 4th row is long; a length-biased sampler would overcount them
+            note = "x" * 200 if i % 4 == 0 else ""
+            f.write(f"{i:010d},044,{rng.uniform(1, 9):.2f},TX{i},{note}\n")
+            if i % 500 == 0:
+                # Neither half of a quoted newline is a usable row
+                f.write(f'{i:010d},044,1.00,TXQ,"split\nacross lines"\n')
+    sample = sampling.csv_offset_sample(str(path), 4000, random.Random(1), columns=["account_number", "bank_code"])
+    assert list(sample["df"].columns) == ["account_number", "bank_code"]
+    assert sample["df"]["account_number"].str.len().eq(10).all()
+    assert sample["rejected"] > 0
+    assert sample["estimated_rows"] == pytest.approx(20080, rel=0.05)
+    long_rows = [int(acc) % 4 == 0 for acc in sample["df"]["account_number"]]
+    assert sampling._rate(long_rows, sample["weights"], 0.95)["rate"] == pytest.approx(0.25, abs=0.03)
+
+
+def test_scan_estimates_error_and_bank_rates(tmp_path):
+    path = tmp_path / "accounts.csv"
+    bank = next(iter(BANK_GENERATORS))
+    with open(path, "w") as f:
+        f.write("account_number,bank_code,amount,reference_id\n")
+        for i in range(400):
+            code = "999" if i % 4 == 0 else bank
+            f.write(f"{BANK_GENERATORS[bank]()},{code},10.00,TX{i}\n")
+    report = run_scan(str(path), "csv", sample_rows=1000, seed=3)
+    # A sample larger than the file is the whole file, so the rates are exact
+    assert report["method"] == "reservoir" and report["estimated_rows"] == 400
+    assert report["by_error_code"]["BE04"]["rate"] == 0.25
+    assert report["by_bank"]["999"]["invalid"]["rate"] == 1.0
+    assert report["by_bank"]["999"]["share"]["rate"] == 0.25
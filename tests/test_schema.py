@@ -0,0 +1,40 @@
+# tests/test_schema.py
+
+import json
+
+import pytest
+
+import batch_ingest
+from app.schema import SchemaError, preflight
+
+
+def test_preflight_projects_wide_csv_to_required_columns(tmp_path):
+    path = tmp_path / "wide.csv"
+    path.write_text(
+        "customer,account_number,bank_code,notes,amount,currency,reference_id\n"
+        "Ann,0123456789,001,x,10.50,KES,TX1\n"
+        "Bob,0987654321,044,y,7.00,JPY,TX2\n"
+    )
+    schema = preflight(str(path), "csv")
+    assert schema["projected"] == ["account_number", "bank_code", "amount", "reference_id", "currency"]
+    assert schema["ignored"] == ["customer", "notes"]
+
+    records = next(batch_ingest.process_csv(str(path), columns=schema["projected"]))
+    assert set(records[0]) == set(schema["projected"])
+    # Leading zeros survive: projected columns are read as text
+    assert records[0]["account_number"] == "0123456789" and records[0]["bank_code"] == "001"
+
+
+def test_preflight_fails_fast_on_missing_columns(tmp_path):
+    json_path = tmp_path / "accounts.json"
+    json_path.write_text(json.dumps([{"account_number": "1", "amount": "2", "extra": 3}]))
+    with pytest.raises(SchemaError) as err:
+        preflight(str(json_path), "json")
+    assert err.value.missing == ["bank_code", "reference_id"]
+
+    xml_path = tmp_path / "accounts.xml"
+    xml_path.write_text(
+        "<records><record><account_number>1</account_number><bank_code>001</bank_code>"
+        "<amount>1</amount><reference_id>R</reference_id><memo>m</memo></record></records>"
+    )
+    assert preflight(str(xml_path), "xml")["ignored"] == ["memo"]
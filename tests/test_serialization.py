@@ -0,0 +1,70 @@
+# tests/test_serialization.py
+
+import json
+from decimal import Decimal
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app import serialization
+from app.api import app
+from app.records import AccountRecord, RecordError
+
+client = TestClient(app)
+
+VALUE = {"amount": Decimal("12.50"), "count": np.int64(3), "name": "Zoë", "errors": [{"code": "AC01"}], "none": None}
+
+
+@pytest.mark.parametrize("name", ["json", "orjson", "msgspec"])
+def test_backends_write_the_same_json(name):
+    try:
+        _, dumps, loads = serialization._select(name)
+    except ImportError:
+        pytest.skip(f"{name} not installed")
+    encoded = dumps(VALUE)
+    assert encoded == '{"amount":"12.50","count":3,"name":"Zoë","errors":[{"code":"AC01"}],"none":null}'.encode()
+    assert loads(encoded) == loads(encoded.decode()) == json.loads(encoded)
+    with pytest.raises(ValueError):
+        loads(b"{nope")
+    with pytest.raises(TypeError):
+        dumps({"x": object()})
+
+
+@pytest.mark.parametrize("name", ["json", "orjson", "msgspec"])
+def test_backends_agree_on_non_str_keys(name):
+    try:
+        _, dumps, _ = serialization._select(name)
+    except ImportError:
+        pytest.skip(f"{name} not installed")
+    # Bank codes read as numbers, or missing, key per_bank_stats with ints and NaN
+    summary = {"total": 2, "per_bank_stats": {44: {"total": 1}, np.int64(58): {"total": 1}, float("nan"): {"total": 0}}}
+    assert dumps(summary) == b'{"total":2,"per_bank_stats":{"44":{"total":1},"58":{"total":1},"NaN":{"total":0}}}'
+
+
+def test_account_record():
+    record = AccountRecord.decode(b'{"account_number": "0123456789", "bank_code": "044", "amount": 12.5, "reference_id": "R1", "extra": 1}')
+    assert record.to_dict() == {"account_number": "0123456789", "bank_code": "044", "amount": 12.5, "reference_id": "R1"}
+    assert not hasattr(record, "__dict__")
+    assert AccountRecord.from_dict({**record.to_dict(), "currency": "JPY"}).to_dict()["currency"] == "JPY"
+    with pytest.raises(RecordError) as e:
+        AccountRecord.from_dict({"account_number": 123, "bank_code": "044", "amount": True})
+    assert [(err["loc"][-1], err["type"]) for err in e.value.errors] == [
+        ("account_number", "string_type"), ("amount", "decimal_type"), ("reference_id", "missing")]
+
+
+def test_validate_endpoint():
+    body = {"account_number": "12345678", "bank_code": "044", "amount": "1.234", "reference_id": "R1"}
+    response = client.post("/validate", json=body)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["status"] == "Invalid" and result["amount"] == "1.234"
+    assert "AM09" in {err["code"] for err in result["errors"]}
+
+    response = client.post("/validate", json={"bank_code": "044"})
+    assert response.status_code == 422
+    assert {err["loc"][-1] for err in response.json()["detail"]} == {"account_number", "amount", "reference_id"}
+    assert client.post("/validate", content=b"not json").status_code == 422
+
+    schema = client.get("/openapi.json").json()["paths"]["/validate"]["post"]["requestBody"]
+    assert schema["content"]["application/json"]["schema"]["required"] == ["account_number", "bank_code", "amount", "reference_id"]
@@ -0,0 +1,90 @@
+# tests/test_summary_reports.py
+
+import threading
+
+from cryptography.fernet import Fernet
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app import job_store, summary_reports
+from app.summary_reports import ReportRenderer, render_reports, report_context
+
+client = TestClient(main.app)
+
+
+def _summary(banks, rows_per_bank):
+    return {
+        "total_accounts": banks * rows_per_bank,
+        "valid_accounts": banks * (rows_per_bank - 1),
+        "invalid_accounts": banks,
+        "invalid_error_types": {"amount": {"count": banks, "examples": ["Invalid amount <b>"]}},
+        "invalid_error_codes": {"AM09": banks},
+        "per_bank_stats": {
+            f"{n:03d}": {"total": rows_per_bank, "valid": rows_per_bank - 1, "invalid": 1, "error_types": {"amount": 1}}
+            for n in range(banks)
+        },
+    }
+
+
+def test_report_is_built_from_the_aggregate(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_store, "JOB_STORE_PATH", str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(summary_reports, "REPORT_DIR", str(tmp_path / "reports"))
+    monkeypatch.setattr(summary_reports, "REPORT_TOP_BANKS", 50)
+    # A billion-row run is rendered from the same handful of numbers as a tiny one
+    job_store.record_job("big", kind="batch_csv", status="done", summary=_summary(200, 5_000_000))
+    context = report_context(job_store.get_job("big"))
+    assert len(context["banks"]) == 51 and context["banks"][-1][0] == "150 more banks"
+    assert context["totals"][0] == ["Records", 1_000_000_000]
+
+    paths = render_reports("big")
+    page = open(paths["html"]).read()
+    assert "AM09" in page and "1,000,000,000" in page and "&lt;b&gt;" in page
+    assert open(paths["pdf"], "rb").read(5) == b"%PDF-"
+
+
+def test_renderer_dedupes_and_caches(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_store, "JOB_STORE_PATH", str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(summary_reports, "REPORT_DIR", str(tmp_path / "reports"))
+    job_store.record_job("r1", kind="batch_csv", status="done", summary=_summary(3, 10))
+    release = threading.Event()
+    calls = []
+
+    def slow_render(run_id):
+        calls.append(run_id)
+        release.wait(5)
+        return render_reports(run_id)
+
+    monkeypatch.setattr(summary_reports, "render_reports", slow_render)
+    renderer = ReportRenderer()
+    first, second = renderer.submit("r1"), renderer.submit("r1")
+    assert first is second
+    release.set()
+    assert first.result(5)["pdf"].endswith("run_r1_summary.pdf")
+    # Cached: resolved without queueing another render
+    assert renderer.submit("r1").done() and calls == ["r1"]
+
+
+def test_report_endpoint(tmp_path, monkeypatch):
+    monkeypatch.setenv("TOKEN_MAP_KEY", Fernet.generate_key().decode())
+    monkeypatch.setattr(job_store, "JOB_STORE_PATH", str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(summary_reports, "REPORT_DIR", str(tmp_path / "reports"))
+    records = "".join(
+        f"<record><account_number>012345678{n}</account_number><bank_code>044</bank_code>"
+        f"<amount>{amount}</amount><reference_id>TX{n}</reference_id></record>"
+        for n, amount in enumerate(["10.00", "abc"])
+    )
+    upload = client.post("/upload-xml", files={"file": ("a.xml", f"<records>{records}</records>", "application/xml")})
+    job_id = upload.json()["job_id"]
+
+    response = client.get(f"/runs/{job_id}/report.html")
+    assert response.status_code == 200 and "AM09" in response.text
+    cached = client.get(f"/runs/{job_id}/report.html", headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
+    pdf = client.get(f"/runs/{job_id}/report.pdf")
+    assert pdf.headers["content-type"] == "application/pdf" and pdf.content.startswith(b"%PDF-")
+    assert client.get(f"/runs/{job_id}/files").json()["reports"]["pdf"] == f"/runs/{job_id}/report.pdf"
+
+    assert client.get(f"/runs/{job_id}/report.docx").status_code == 404
+    assert client.get("/runs/nope/report.html").status_code == 404
+    job_store.record_job("running", kind="batch_csv")
+    assert client.get("/runs/running/report.pdf").status_code == 409
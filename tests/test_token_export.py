@@ -0,0 +1,48 @@
+# tests/test_token_export.py
+
+import io
+import json
+
+from cryptography.fernet import Fernet
+
+import decrypt_token_map
+from app import token_vault
+
+
+def _vault(tmp_path, monkeypatch):
+    key = Fernet.generate_key().decode()
+    monkeypatch.setenv("TOKEN_MAP_KEY", key)
+    path = str(tmp_path / "token_map.jsonl")
+    batches = [
+        token_vault.write_batch({f"ACC-{b}{i:07x}": f"{b}{i:09d}" for i in range(50)},
+                                {f"REF-{b}{i:07x}": f"TX{b}{i}" for i in range(50)}, path)
+        for b in range(3)
+    ]
+    return key, path, batches
+
+
+def test_export_streams_ndjson_in_vault_order_with_filters(tmp_path, monkeypatch):
+    key, path, batches = _vault(tmp_path, monkeypatch)
+
+    out = io.StringIO()
+    assert decrypt_token_map.export_tokens(path, out, key, workers=2) == 3
+    rows = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert len(rows) == 300
+    assert [r["batch_id"] for r in rows[::100]] == [b["batch_id"] for b in batches]
+
+    out = io.StringIO()
+    decrypt_token_map.export_tokens(path, out, key, batch_ids=[batches[1]["batch_id"]], prefix="ACC-", workers=1)
+    rows = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert len(rows) == 50
+    assert {r["field"] for r in rows} == {"account_tokens"}
+    assert rows[0]["value"] == token_vault.lookup_token(rows[0]["token"], path)[0]
+
+    out = io.StringIO()
+    decrypt_token_map.export_tokens(path, out, key, since=batches[0]["timestamp"] + 3600, workers=1)
+    assert out.getvalue() == ""
+
+
+def test_fields_for_prefix_skips_fields_that_cannot_match():
+    assert decrypt_token_map.fields_for_prefix("REF-1a") == ["reference_tokens"]
+    assert decrypt_token_map.fields_for_prefix("A") == ["account_tokens"]
+    assert decrypt_token_map.fields_for_prefix(None) is None
@@ -0,0 +1,45 @@
+# tests/test_token_vault.py
+
+import json
+
+from cryptography.fernet import Fernet
+
+from app import token_vault
+
+ACCOUNTS = {f"ACC-{i:08x}": f"{i:010d}" for i in range(200)}
+REFERENCES = {f"REF-{i:08x}": f"TX{i}" for i in range(200)}
+
+
+def test_lookup_reads_segmented_and_legacy_fernet_batches(tmp_path, monkeypatch):
+    monkeypatch.setenv("TOKEN_MAP_KEY", Fernet.generate_key().decode())
+    path = str(tmp_path / "token_map.jsonl")
+    monkeypatch.setattr(token_vault, "VAULT_CIPHER", "fernet")
+    token_vault.write_batch({"ACC-legacy01": "1234567890"}, {}, path)
+    monkeypatch.setattr(token_vault, "VAULT_CIPHER", "aesgcm")
+    token_vault.write_batch(ACCOUNTS, REFERENCES, path)
+
+    entries = list(token_vault.iter_batches(path))
+    assert "tokens" in entries[0] and entries[1]["cipher"] == "aesgcm"
+    # Plaintext never lands in the vault
+    assert "0000000042" not in open(path).read()
+
+    assert token_vault.lookup_token("ACC-legacy01", path)[0] == "1234567890"
+    assert token_vault.lookup_token("ACC-0000002a", path)[0] == "0000000042"
+    assert token_vault.lookup_token("REF-00000007", path)[0] == "TX7"
+    assert token_vault.lookup_token("ACC-missing0", path) == (None, None)
+    assert token_vault.decrypt_batch(entries[1])["account_tokens"] == ACCOUNTS
+
+
+def test_rotate_vault_moves_batches_to_the_new_key(tmp_path, monkeypatch):
+    old_key, new_key = Fernet.generate_key().decode(), Fernet.generate_key().decode()
+    path = str(tmp_path / "token_map.jsonl")
+    monkeypatch.setenv("TOKEN_MAP_KEY", old_key)
+    token_vault.write_batch(ACCOUNTS, REFERENCES, path)
+
+    # Prepend the new key, rotate, then drop the old one
+    monkeypatch.setenv("TOKEN_MAP_KEY", f"{new_key},{old_key}")
+    assert token_vault.rotate_vault(path) == 1
+    monkeypatch.setenv("TOKEN_MAP_KEY", new_key)
+    assert token_vault.lookup_token("ACC-00000005", path)[0] == "0000000005"
+    with open(path) as f:
+        assert json.loads(f.readline())["batch_id"]
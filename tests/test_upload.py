@@ -34,21 +34,9 @@ def test_upload_csv():
         response = client.post("/upload-csv", files={"file": ("seed_accounts.csv", file, "text/csv")})
     assert response.status_code == 200
     data = response.json()
-<<<<<<< HEAD
-    assert "files" in data
-    from app.bank_strategies import BANK_GENERATORS
-    found_valid = False
-    for code in BANK_GENERATORS:
-        if code in data and "valid" in data[code] and data[code]["valid"] > 0:
-            found_valid = True
-            break
-    assert found_valid, "No valid accounts found in any bank code stats in response"
-    os.remove(file_path)
-=======
     assert "summary" in data
-    assert data["summary"]["total_rows"] == 10000
+    assert data["summary"]["total_rows"] == len(pd.read_csv("seed_accounts.csv"))
     assert "columns" in data["summary"]
->>>>>>> 712d468fcd2dfc328a93acfc9751f42a6b479770
 
 def test_download_report():
     response = client.get("/download-report")
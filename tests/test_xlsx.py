@@ -0,0 +1,64 @@
+# tests/test_xlsx.py
+
+import io
+
+from cryptography.fernet import Fernet
+from fastapi.testclient import TestClient
+from openpyxl import Workbook
+
+from app import job_store
+from app.main import app
+from app.schema import preflight
+from batch_ingest import process_xlsx
+
+client = TestClient(app)
+
+
+def _workbook(header, rows):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Payments")
+    ws.append(header)
+    for row in rows:
+        ws.append(row)
+    out = io.BytesIO()
+    wb.save(out)
+    return out.getvalue()
+
+
+HEADER = ["Account Number", "Bank Code", "Amount", "Reference ID", "Beneficiary"]
+ROWS = [
+    ["0123456789", "044", 1500, "TX1", "A"],
+    [1234567890, "058", 12.5, "TX2", "B"],
+    [None, None, None, None, None],
+    ["9876543210", "044", "abc", "TX3", "C"],
+]
+
+
+def test_sheet_streams_in_chunks_with_canonical_columns(tmp_path):
+    path = tmp_path / "payments.xlsx"
+    path.write_bytes(_workbook(HEADER, ROWS))
+    schema = preflight(str(path), "xlsx")
+    assert schema["ignored"] == ["beneficiary"]
+
+    class TwoRows:
+        def next_rows(self):
+            return 2
+
+    chunks = list(process_xlsx(str(path), TwoRows(), schema["projected"]))
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    # Text cells keep leading zeros; numeric cells read as their CSV text
+    assert chunks[0][0] == {"account_number": "0123456789", "bank_code": "044", "amount": "1500", "reference_id": "TX1"}
+    assert chunks[0][1]["account_number"] == "1234567890" and chunks[0][1]["amount"] == "12.5"
+
+
+def test_upload_xlsx(tmp_path, monkeypatch):
+    monkeypatch.setenv("TOKEN_MAP_KEY", Fernet.generate_key().decode())
+    monkeypatch.setattr(job_store, "JOB_STORE_PATH", str(tmp_path / "jobs.sqlite3"))
+    xlsx = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    response = client.post("/upload-xlsx", files={"file": ("payments.xlsx", _workbook(HEADER, ROWS), xlsx)})
+    assert response.status_code == 200
+    summary = response.json()["validation_summary"]
+    assert summary["total_accounts"] == 3 and summary["invalid_error_codes"]["AM09"] == 1
+
+    response = client.post("/upload-xlsx", files={"file": ("bad.xlsx", _workbook(["Account Number", "Amount"], ROWS), xlsx)})
+    assert response.status_code == 400 and response.json()["missing_columns"] == ["bank_code", "reference_id"]
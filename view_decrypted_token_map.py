@@ -4,16 +4,18 @@ import os
 import sys
 import getpass
 from dotenv import load_dotenv
-from cryptography.fernet import Fernet
 
-def main():
+from app.token_crypto import load_keyring
+from app.token_vault import iter_batches, decrypt_batch
+
+def main(argv=None):
     # Load .env if present
     load_dotenv()
-    parser = argparse.ArgumentParser(description="View decrypted tokens from token_map.json.")
-    parser.add_argument("--file", default="output/token_map.json", help="Path to token_map.json")
-    parser.add_argument("--key", default=None, help="Fernet key (if not set, will prompt interactively)")
+    parser = argparse.ArgumentParser(description="View decrypted tokens from the token vault.")
+    parser.add_argument("--file", default="output/token_map.jsonl", help="Path to token_map.jsonl (legacy token_map.json also works)")
+    parser.add_argument("--key", default=None, help="Fernet key, or comma-separated keys newest first (if not set, will prompt interactively)")
     parser.add_argument("--batch", type=int, default=None, help="Batch index to view (default: all batches)")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     key = args.key
     if not key:
@@ -22,17 +24,15 @@ def main():
         print("ERROR: Fernet key must be supplied via --key or entered interactively.")
         sys.exit(1)
 
-    with open(args.file, "r") as f:
-        all_batches = json.load(f)
-
-    fernet = Fernet(key.encode())
-    def decrypt_tokens(tokens_blob):
-        return json.loads(fernet.decrypt(tokens_blob.encode()).decode())
+    keyring = load_keyring(key)
 
     if args.batch is not None:
-        # Show only one batch
-        batch = all_batches[args.batch]
-        tokens = decrypt_tokens(batch['tokens'])
+        # Show only one batch; the vault is streamed, never loaded whole
+        batch = next((b for i, b in enumerate(iter_batches(args.file)) if i == args.batch), None)
+        if batch is None:
+            print(f"ERROR: batch {args.batch} not found in {args.file}")
+            sys.exit(1)
+        tokens = decrypt_batch(batch, keyring)
         out = {
             'batch_id': batch['batch_id'],
             'timestamp': batch['timestamp'],
@@ -40,19 +40,18 @@ def main():
         }
         print(json.dumps(out, indent=2))
     else:
-        # Show all batches
-        out = []
-        for batch in all_batches:
+        # Show all batches, one JSON document per batch as each is decrypted
+        # (use decrypt_token_map.py for bulk NDJSON exports)
+        for batch in iter_batches(args.file):
             try:
-                tokens = decrypt_tokens(batch['tokens'])
+                tokens = decrypt_batch(batch, keyring)
             except Exception as e:
                 tokens = f"ERROR decrypting: {e}"
-            out.append({
+            print(json.dumps({
                 'batch_id': batch['batch_id'],
                 'timestamp': batch['timestamp'],
                 'tokens': tokens
-            })
-        print(json.dumps(out, indent=2))
+            }, indent=2))
 
 if __name__ == "__main__":
     main()